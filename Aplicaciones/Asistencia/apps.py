@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AsistenciaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Aplicaciones.Asistencia'
+
+    def ready(self):
+        from . import kiosko  # noqa: F401  (registra las señales que refrescan el mapa de cédulas)
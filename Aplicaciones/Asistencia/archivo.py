@@ -0,0 +1,55 @@
+"""Archivo de asistencias antiguas.
+
+``archivar`` mueve mes a mes las asistencias anteriores al corte a
+``AsistenciaArchivada`` (con el mismo id) y las borra de la tabla activa,
+que así guarda solo los meses recientes. Las consultas de historial cuyo
+rango llega a fechas archivadas leen de ``AsistenciaHistorica``, la vista
+que une ambas tablas; las demás siguen usando solo la tabla activa.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import Asistencia, AsistenciaArchivada, AsistenciaHistorica
+
+CAMPOS = ['id', 'empleado_id', 'fecha', 'hora_entrada', 'hora_salida',
+          'minutos_trabajados', 'observaciones', 'fecha_registro']
+
+
+def consulta(fecha_inicio=None):
+    """Asistencias desde ``fecha_inicio``: la tabla activa, o la vista histórica si el rango llega al archivo."""
+    archivadas = AsistenciaArchivada.objects.order_by()
+    if fecha_inicio:
+        archivadas = archivadas.filter(fecha__gte=fecha_inicio)
+    modelo = AsistenciaHistorica if archivadas.exists() else Asistencia
+    return modelo.objects.all()
+
+
+def archivadas(filas):
+    """Ids de ``filas`` que están en el archivo; son de solo lectura."""
+    if not filas or not isinstance(filas[0], AsistenciaHistorica):
+        return set()
+    return set(AsistenciaArchivada.objects.filter(id__in=[a.id for a in filas]).values_list('id', flat=True))
+
+
+def pendientes(corte):
+    """Cuántas asistencias activas tienen fecha anterior a ``corte``."""
+    return Asistencia.objects.filter(fecha__lt=corte).count()
+
+
+def archivar(corte):
+    """Mueve las asistencias con fecha anterior a ``corte``, un mes por transacción. Devuelve cuántas."""
+    total = 0
+    while True:
+        primera = (Asistencia.objects.filter(fecha__lt=corte)
+                   .order_by('fecha').values_list('fecha', flat=True).first())
+        if primera is None:
+            return total
+        mes = primera.replace(day=1)
+        hasta = min((mes + timedelta(days=32)).replace(day=1), corte)
+        with transaction.atomic():
+            filas = Asistencia.objects.filter(fecha__gte=mes, fecha__lt=hasta)
+            archivadas = AsistenciaArchivada.objects.bulk_create(
+                [AsistenciaArchivada(**v) for v in filas.values(*CAMPOS)], batch_size=2000)
+            filas.delete()
+        total += len(archivadas)
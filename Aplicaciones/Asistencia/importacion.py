@@ -0,0 +1,179 @@
+"""Importación masiva de empleados desde XLSX o CSV.
+
+El archivo se lee en flujo (``Recuperadora.planillas``). Cada bloque de
+filas válidas se guarda en una transacción con un ``bulk_create`` de las
+cédulas nuevas y un ``bulk_update`` de las existentes. Las filas con
+errores se saltan y quedan en el informe, fila por fila. Si otra operación
+registra una de las cédulas nuevas mientras tanto, esas filas quedan como
+error y el resto del bloque se guarda de nuevo.
+
+En una actualización, las celdas vacías de campos opcionales (correo,
+activo) conservan el valor actual. ``bulk_create``/``bulk_update`` no emiten
+señales: al final se invalida el mapa de cédulas del kiosco.
+"""
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from Recuperadora import planillas
+from Recuperadora.planillas import ArchivoInvalido  # noqa: F401
+
+from . import kiosko
+from .models import Empleado
+
+TAMANO_BLOQUE = 500
+CAMPOS = ['cedula', 'nombres', 'apellidos', 'cargo', 'telefono', 'email', 'fecha_ingreso', 'activo']
+OBLIGATORIOS = ['cedula', 'nombres', 'apellidos', 'cargo', 'telefono', 'fecha_ingreso']
+ENCABEZADOS = {
+    'cedula': 'cedula', 'identificacion': 'cedula',
+    'nombres': 'nombres', 'nombre': 'nombres',
+    'apellidos': 'apellidos', 'apellido': 'apellidos',
+    'cargo': 'cargo',
+    'telefono': 'telefono', 'celular': 'telefono',
+    'email': 'email', 'correo': 'email', 'correo electronico': 'email',
+    'fecha ingreso': 'fecha_ingreso', 'fecha de ingreso': 'fecha_ingreso', 'ingreso': 'fecha_ingreso',
+    'activo': 'activo', 'estado': 'activo',
+}
+FORMATOS_FECHA = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y']
+
+
+def leer(archivo, nombre):
+    """Genera ``(número de fila, {campo: valor})`` de la planilla de empleados."""
+    return planillas.leer(archivo, nombre, ENCABEZADOS, OBLIGATORIOS)
+
+
+# ── Validación ──────────────────────────────────────────────────────────────
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValueError
+
+
+def validar(fila):
+    """Convierte una fila leída a valores de Empleado. Devuelve ``(datos, errores)``."""
+    datos, errores = {}, []
+    for campo in OBLIGATORIOS:
+        if not planillas.texto(fila.get(campo)):
+            errores.append(f'{campo}: obligatorio')
+
+    cedula = planillas.texto(fila.get('cedula'))
+    if cedula:
+        if isinstance(fila['cedula'], (int, float)):
+            cedula = cedula.zfill(10)  # Excel guarda la cédula como número y pierde el cero inicial
+        if not cedula.isdigit() or len(cedula) > 10:
+            errores.append('cedula: hasta 10 dígitos')
+        datos['cedula'] = cedula
+    for campo in ('nombres', 'apellidos', 'cargo'):
+        valor = planillas.texto(fila.get(campo))
+        if len(valor) > 100:
+            errores.append(f'{campo}: máximo 100 caracteres')
+        datos[campo] = valor
+    telefono = planillas.texto(fila.get('telefono'))
+    if len(telefono) > 10:
+        errores.append('telefono: máximo 10 caracteres')
+    datos['telefono'] = telefono
+
+    email = planillas.texto(fila.get('email'))
+    if email:
+        try:
+            validate_email(email)
+            datos['email'] = email
+        except ValidationError:
+            errores.append('email: no es válido')
+    if planillas.texto(fila.get('fecha_ingreso')):
+        try:
+            datos['fecha_ingreso'] = _fecha(fila['fecha_ingreso'])
+        except ValueError:
+            errores.append('fecha_ingreso: use AAAA-MM-DD o DD/MM/AAAA')
+    try:
+        activo = planillas.booleano(fila.get('activo'))
+        if activo is not None:
+            datos['activo'] = activo
+    except ValueError:
+        errores.append('activo: use sí o no')
+    return datos, errores
+
+
+# ── Guardado ────────────────────────────────────────────────────────────────
+
+def _guardar(bloque, informe, simular):
+    filas, nuevas = [], []
+    try:
+        with transaction.atomic():
+            existentes = Empleado.objects.in_bulk([d['cedula'] for _, d in bloque], field_name='cedula')
+            nuevos, cambiados = [], []
+            for numero, datos in bloque:
+                empleado = existentes.get(datos['cedula'])
+                if empleado is None:
+                    nuevos.append(Empleado(**datos))
+                    nuevas.append(datos['cedula'])
+                    estado = 'creado'
+                elif any(getattr(empleado, c) != v for c, v in datos.items()):
+                    for campo, valor in datos.items():
+                        setattr(empleado, campo, valor)
+                    cambiados.append(empleado)
+                    estado = 'actualizado'
+                else:
+                    estado = 'sin_cambios'
+                filas.append({'fila': numero, 'cedula': datos['cedula'], 'estado': estado, 'errores': []})
+            if not simular:
+                Empleado.objects.bulk_create(nuevos)
+                Empleado.objects.bulk_update(cambiados, CAMPOS[1:])
+                kiosko.invalidar()
+    except IntegrityError:
+        # Otra operación creó alguna de las cédulas nuevas después de leerlas
+        ocupadas = set(Empleado.objects.filter(cedula__in=nuevas).values_list('cedula', flat=True)) or set(nuevas)
+        for numero, datos in bloque:
+            if datos['cedula'] in ocupadas:
+                informe.append({'fila': numero, 'cedula': datos['cedula'], 'estado': 'error',
+                                'errores': ['cedula: registrada por otra operación durante la importación']})
+        resto = [(n, d) for n, d in bloque if d['cedula'] not in ocupadas]
+        if resto:
+            _guardar(resto, informe, simular)
+        return
+    informe.extend(filas)
+
+
+def importar(filas, simular=False, tamano=TAMANO_BLOQUE):
+    """Crea o actualiza por cédula los empleados de ``filas`` (ver ``leer``).
+
+    Devuelve el informe ``[{'fila', 'cedula', 'estado', 'errores'}]``, con
+    estado ``creado``, ``actualizado``, ``sin_cambios`` o ``error``. Con
+    ``simular`` valida y clasifica sin escribir.
+    """
+    informe, bloque, primeras = [], [], {}
+    for numero, fila in filas:
+        datos, errores = validar(fila)
+        cedula = datos.get('cedula', '')
+        if cedula in primeras:
+            errores.append(f'cedula: repetida (fila {primeras[cedula]})')
+        if errores:
+            informe.append({'fila': numero, 'cedula': cedula, 'estado': 'error', 'errores': errores})
+            continue
+        primeras[cedula] = numero  # solo las filas válidas reservan la cédula
+        bloque.append((numero, datos))
+        if len(bloque) >= tamano:
+            _guardar(bloque, informe, simular)
+            bloque = []
+    if bloque:
+        _guardar(bloque, informe, simular)
+    informe.sort(key=lambda r: r['fila'])
+    return informe
+
+
+def resumen(informe):
+    """Cuántas filas quedaron en cada estado."""
+    totales = dict.fromkeys(['creado', 'actualizado', 'sin_cambios', 'error'], 0)
+    for fila in informe:
+        totales[fila['estado']] += 1
+    return totales
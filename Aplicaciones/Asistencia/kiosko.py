@@ -0,0 +1,101 @@
+"""Marcación por escaneo de cédula/QR en la puerta.
+
+``empleado_por_cedula`` resuelve la cédula con un diccionario en memoria que
+se arma una vez por versión. La versión está en la base y guardar o
+eliminar un Empleado la cambia en la misma transacción, así que ningún
+worker marca con un mapa viejo (las altas masivas deben llamar a
+``invalidar``).
+``marcar`` registra la entrada con un INSERT o, si ya la tiene, la salida
+con un UPDATE por (empleado, fecha). Un turno que cruza la medianoche se
+cierra en la asistencia abierta del día anterior.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import qrcode
+import qrcode.image.svg
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Aplicaciones.Eventos import versiones
+
+from .models import Asistencia, Empleado
+
+CLAVE_VERSION = 'empleados:version'
+MINUTOS_ENTRE_MARCAS = 5  # un segundo escaneo seguido no cuenta como salida
+TURNO_MAXIMO = timedelta(hours=16)  # una entrada de ayer más antigua es un olvido, no un turno nocturno
+
+_mapa = (None, {})  # (versión, {cédula: (id, nombre completo)}) de este proceso
+
+
+def version():
+    return versiones.actual(CLAVE_VERSION)
+
+
+def invalidar():
+    versiones.cambiar(CLAVE_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Empleado)
+def _empleado_modificado(sender, **kwargs):
+    invalidar()
+
+
+def empleado_por_cedula(cedula):
+    """``(id, nombre completo)`` del empleado activo con esa cédula, o ``None``."""
+    global _mapa
+    actual = version()
+    if _mapa[0] != actual:
+        _mapa = (actual, {
+            cedula: (pk, f'{nombres} {apellidos}')
+            for pk, cedula, nombres, apellidos in
+            Empleado.objects.filter(activo=True).order_by().values_list('id', 'cedula', 'nombres', 'apellidos')
+        })
+    return _mapa[1].get(cedula.strip())
+
+
+def marcar(empleado_id, ahora):
+    """Registra entrada o salida para la hora local ``ahora``.
+
+    Devuelve ``(tipo, asistencia)`` con tipo ``'entrada'``, ``'salida'``,
+    ``'repetida'`` (escaneo duplicado tras la entrada) o ``'completa'``;
+    ``asistencia`` solo se consulta en los dos últimos casos.
+    """
+    hoy, hora = ahora.date(), ahora.time().replace(second=0, microsecond=0)
+    limite = ahora - timedelta(minutes=MINUTOS_ENTRE_MARCAS)
+
+    def entrada(asistencia):
+        return datetime.combine(asistencia.fecha, asistencia.hora_entrada, tzinfo=ahora.tzinfo)
+
+    def cerrar(asistencias):
+        return asistencias.filter(hora_salida__isnull=True).update(
+            hora_salida=hora, minutos_trabajados=Asistencia.minutos_hasta(hora))
+
+    nocturna = Asistencia.objects.filter(empleado_id=empleado_id, fecha=hoy - timedelta(days=1),
+                                         hora_salida__isnull=True).first()
+    if nocturna and entrada(nocturna) >= ahora - TURNO_MAXIMO:
+        if entrada(nocturna) > limite:
+            return 'repetida', nocturna
+        if cerrar(Asistencia.objects.filter(pk=nocturna.pk)):
+            return 'salida', None
+
+    try:
+        with transaction.atomic():
+            Asistencia.objects.create(empleado_id=empleado_id, fecha=hoy, hora_entrada=hora)
+        return 'entrada', None
+    except IntegrityError:
+        pass
+
+    if limite.date() == hoy and cerrar(Asistencia.objects.filter(
+            empleado_id=empleado_id, fecha=hoy, hora_entrada__lte=limite.time())):
+        return 'salida', None
+    asistencia = Asistencia.objects.get(empleado_id=empleado_id, fecha=hoy)
+    return ('completa' if asistencia.hora_salida else 'repetida'), asistencia
+
+
+@lru_cache(maxsize=2048)
+def qr_svg(cedula):
+    """Código QR de la cédula como SVG en línea."""
+    imagen = qrcode.make(cedula, image_factory=qrcode.image.svg.SvgPathImage, box_size=8, border=2)
+    return imagen.to_string(encoding='unicode')
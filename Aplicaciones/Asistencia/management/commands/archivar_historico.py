@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Aplicaciones.Asistencia import archivo as archivo_asistencia
+from Aplicaciones.Descargue import archivo as archivo_descargue
+
+
+class Command(BaseCommand):
+    help = ('Mueve a las tablas de archivo las asistencias y los días de descargue cerrados '
+            'anteriores al corte; los historiales los siguen mostrando.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.ARCHIVO_DIAS_ACTIVOS,
+                            help='Días recientes que quedan en las tablas activas '
+                                 f'(por defecto {settings.ARCHIVO_DIAS_ACTIVOS}).')
+        parser.add_argument('--antes-de', help='Corte explícito (AAAA-MM-DD): se archiva lo anterior a esta fecha.')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuánto se archivaría.')
+
+    def handle(self, *args, **o):
+        hoy = timezone.localdate()
+        if o['antes_de']:
+            try:
+                corte = date.fromisoformat(o['antes_de'])
+            except ValueError:
+                raise CommandError('Fecha inválida, use AAAA-MM-DD.')
+        else:
+            if o['dias'] < 1:
+                raise CommandError('--dias debe ser al menos 1.')
+            corte = hoy - timedelta(days=o['dias'])
+        if corte > hoy:
+            raise CommandError('El corte no puede ser posterior a hoy.')
+
+        if o['simular']:
+            n_asist = archivo_asistencia.pendientes(corte)
+            n_dias = archivo_descargue.dias_pendientes(corte).count()
+            self.stdout.write(f'Antes del {corte}: {n_asist} asistencia(s) y {n_dias} día(s) de descargue por archivar.')
+            return
+
+        n_asist = archivo_asistencia.archivar(corte)
+        n_dias, n_reg = archivo_descargue.archivar(corte)
+        self.stdout.write(self.style.SUCCESS(
+            f'Antes del {corte}: {n_asist} asistencia(s) y {n_dias} día(s) de descargue '
+            f'({n_reg} registro(s)) archivados.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Aplicaciones.Asistencia import importacion
+
+
+class Command(BaseCommand):
+    help = 'Crea o actualiza por cédula los empleados de un archivo XLSX o CSV de Talento Humano.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .xlsx o .csv (primera fila: encabezados).')
+        parser.add_argument('--simular', action='store_true', help='Solo valida e informa, sin guardar.')
+        parser.add_argument('--bloque', type=int, default=importacion.TAMANO_BLOQUE,
+                            help=f'Filas por transacción (por defecto {importacion.TAMANO_BLOQUE}).')
+
+    def handle(self, *args, **o):
+        if o['bloque'] < 1:
+            raise CommandError('--bloque debe ser al menos 1.')
+        try:
+            with open(o['archivo'], 'rb') as archivo:
+                informe = importacion.importar(importacion.leer(archivo, o['archivo']),
+                                               simular=o['simular'], tamano=o['bloque'])
+        except OSError as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+        except importacion.ArchivoInvalido as e:
+            raise CommandError(str(e))
+
+        for fila in informe:
+            if fila['errores']:
+                self.stderr.write(f"Fila {fila['fila']} ({fila['cedula'] or 'sin cédula'}): {'; '.join(fila['errores'])}")
+        totales = importacion.resumen(informe)
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Simulación: ' if o['simular'] else ''}{totales['creado']} creado(s), "
+            f"{totales['actualizado']} actualizado(s), {totales['sin_cambios']} sin cambios, "
+            f"{totales['error']} con errores."))
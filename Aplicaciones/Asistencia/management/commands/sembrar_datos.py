@@ -0,0 +1,174 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from Aplicaciones.Asistencia import kiosko
+from Aplicaciones.Asistencia.models import Asistencia, Empleado
+from Aplicaciones.Descargue import catalogos, resumenes
+from Aplicaciones.Descargue.models import CierreDia, Empresa, ItemDescargue, Producto, RegistroDescargue
+
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Rosa', 'Pedro', 'Carmen', 'José', 'Lucía',
+           'Jorge', 'Elena', 'Diego', 'Sofía', 'Miguel', 'Paola', 'Andrés', 'Gabriela', 'Fernando', 'Daniela']
+APELLIDOS = ['Pérez', 'García', 'Rodríguez', 'Zambrano', 'Mendoza', 'Vera', 'Cedeño', 'Morán', 'Torres',
+             'Castro', 'Vásquez', 'Macías', 'Intriago', 'Muñoz', 'Loor', 'Bravo', 'Chávez', 'Ponce', 'Álava', 'Reyes']
+CARGOS = ['Estibador', 'Montacarguista', 'Supervisor', 'Bodeguero', 'Chofer', 'Guardia']
+PALABRAS_EMPRESA = ['Distribuidora', 'Comercial', 'Industrias', 'Importadora', 'Alimentos', 'Grupo',
+                    'Corporación', 'Logística', 'Productos', 'Exportadora']
+LUGARES = ['Andina', 'del Pacífico', 'Costa', 'Manabí', 'Guayas', 'del Sur', 'Nacional', 'Sierra', 'Austral', 'Litoral']
+TURNOS = [(time(5, 0), time(11, 0)), (time(6, 0), time(14, 30))]
+TAMANO_LOTE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos con volúmenes realistas para pruebas de rendimiento.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empleados', type=int, default=500)
+        parser.add_argument('--dias', type=int, default=730, help='Días de historia hacia atrás desde hoy.')
+        parser.add_argument('--empresas', type=int, default=300)
+        parser.add_argument('--productos', type=int, default=2000)
+        parser.add_argument('--registros', type=int, default=100_000)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--borrar', action='store_true',
+                            help='Borra primero TODOS los empleados, asistencias y datos de descargue.')
+
+    def handle(self, *args, **o):
+        rnd = random.Random(o['semilla'])
+        hoy = timezone.localdate()
+        dias = [hoy - timedelta(days=d) for d in range(o['dias'] - 1, -1, -1)]
+
+        with transaction.atomic():
+            if o['borrar']:
+                Asistencia.objects.all().delete()
+                Empleado.objects.all().delete()
+                CierreDia.objects.all().delete()
+                Empresa.objects.all().delete()
+                Producto.objects.all().delete()
+
+            empleados = self._empleados(rnd, o['empleados'])
+            n_asist = self._asistencias(rnd, empleados, dias)
+            empresas = self._empresas(rnd, o['empresas'])
+            productos = self._productos(rnd, o['productos'])
+            cierres = self._cierres(dias, hoy)
+            n_items = self._descargues(rnd, cierres, empresas, productos, o['registros'])
+
+            for cierre in cierres:
+                resumenes.reconstruir(cierre)
+                if cierre.estado == 'cerrado':
+                    cierre.recalcular()
+            catalogos.invalidar()
+            kiosko.invalidar()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(empleados)} empleados, {n_asist} asistencias, {len(empresas)} empresas, '
+            f'{len(productos)} productos, {o["registros"]} registros, {n_items} ítems.'))
+
+    def _empleados(self, rnd, n):
+        base = Empleado.objects.count()
+        return Empleado.objects.bulk_create([
+            Empleado(
+                cedula=f'{9000000000 + base + i:010d}',
+                nombres=f'{rnd.choice(NOMBRES)} {rnd.choice(NOMBRES)}',
+                apellidos=f'{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}',
+                cargo=rnd.choice(CARGOS),
+                telefono=f'09{rnd.randrange(10**8):08d}',
+                fecha_ingreso=date(2020, 1, 1) + timedelta(days=rnd.randrange(1500)),
+                activo=rnd.random() > 0.05,
+            ) for i in range(n)
+        ], batch_size=TAMANO_LOTE)
+
+    def _asistencias(self, rnd, empleados, dias):
+        total = 0
+        lote = []
+        for dia in dias:
+            es_hoy = dia == dias[-1]
+            for emp in empleados:
+                if dia.weekday() == 6 or rnd.random() < 0.1:
+                    continue
+                entrada, salida = rnd.choice(TURNOS)
+                entrada = (datetime.combine(dia, entrada) + timedelta(minutes=rnd.randrange(-10, 20))).time()
+                salida = None if es_hoy else (datetime.combine(dia, salida) + timedelta(minutes=rnd.randrange(-5, 45))).time()
+                asistencia = Asistencia(empleado=emp, fecha=dia, hora_entrada=entrada, hora_salida=salida)
+                asistencia.calcular_minutos_trabajados()
+                lote.append(asistencia)
+                if len(lote) >= TAMANO_LOTE:
+                    total += len(Asistencia.objects.bulk_create(lote, ignore_conflicts=True))
+                    lote = []
+        total += len(Asistencia.objects.bulk_create(lote, ignore_conflicts=True))
+        return total
+
+    def _empresas(self, rnd, n):
+        existentes = set(Empresa.objects.values_list('nombre', flat=True))
+        nuevas = []
+        i = 0
+        while len(nuevas) < n:
+            i += 1
+            nombre = f'{rnd.choice(PALABRAS_EMPRESA)} {rnd.choice(LUGARES)} {i}'
+            if nombre not in existentes:
+                nuevas.append(Empresa(nombre=nombre))
+        return Empresa.objects.bulk_create(nuevas, batch_size=TAMANO_LOTE)
+
+    def _productos(self, rnd, n):
+        categorias = [c for c, _ in Producto.CATEGORIA_CHOICES]
+        return Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {i + 1:05d}',
+                categoria=rnd.choice(categorias),
+                unidades_por_capa=rnd.choice([4, 6, 8, 10, 12, 16]),
+                capas_por_palet=rnd.choice([4, 5, 6, 8, 10]),
+            ) for i in range(n)
+        ], batch_size=TAMANO_LOTE)
+
+    def _cierres(self, dias, hoy):
+        existentes = set(CierreDia.objects.filter(fecha__in=dias).values_list('fecha', flat=True))
+        CierreDia.objects.bulk_create([
+            CierreDia(
+                fecha=dia,
+                estado='abierto' if dia == hoy else 'cerrado',
+                hora_cierre=None if dia == hoy else timezone.make_aware(datetime.combine(dia, time(18, 0))),
+            ) for dia in dias if dia not in existentes
+        ], batch_size=TAMANO_LOTE)
+        return list(CierreDia.objects.filter(fecha__in=dias).order_by('fecha'))
+
+    def _descargues(self, rnd, cierres, empresas, productos, n_registros):
+        # Las empresas y productos más frecuentes concentran la mayoría de los descargues.
+        pesos_emp = [1 / (i + 1) for i in range(len(empresas))]
+        pesos_prod = [1 / (i + 1) for i in range(len(productos))]
+        n_items = 0
+        for inicio in range(0, n_registros, TAMANO_LOTE):
+            registros = []
+            for _ in range(min(TAMANO_LOTE, n_registros - inicio)):
+                cierre = rnd.choice(cierres)
+                hora = timezone.make_aware(datetime.combine(cierre.fecha, time(5, 0))
+                                           + timedelta(minutes=rnd.randrange(13 * 60)))
+                duracion = rnd.choice([20, 30, 45, 60, 90])
+                registros.append(RegistroDescargue(
+                    cierre=cierre,
+                    empresa=rnd.choices(empresas, pesos_emp)[0],
+                    chofer_nombre=f'{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}',
+                    chofer_telefono=f'09{rnd.randrange(10**8):08d}',
+                    placa=f'{rnd.choice("GMPAOU")}{rnd.choice("ABCDEFG")}{rnd.choice("ABCDEFG")}-{rnd.randrange(1000, 9999)}',
+                    tipo=rnd.choices(['completo', 'incompleto', 'especial'], [8, 3, 1])[0],
+                    hora=hora,
+                    duracion_minutos=duracion,
+                    hora_fin_estimada=hora + timedelta(minutes=duracion),
+                ))
+            registros = RegistroDescargue.objects.bulk_create(registros)
+
+            items = []
+            for reg in registros:
+                for prod in set(rnd.choices(productos, pesos_prod, k=rnd.randint(1, 3))):
+                    item = ItemDescargue(
+                        registro=reg,
+                        producto=prod,
+                        palets_completos=rnd.randint(0, 12),
+                        unidades_sueltas=rnd.choice([0, 0, 0, rnd.randint(1, 40)]),
+                    )
+                    item.calcular_palets_equivalentes()
+                    items.append(item)
+            ItemDescargue.objects.bulk_create(items, batch_size=TAMANO_LOTE)
+            n_items += len(items)
+        return n_items
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Asistencia', '0003_remove_asistencia_registro_completo_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha', 'hora_entrada', 'id'], name='asistencia_fecha_hora_idx'),
+        ),
+    ]
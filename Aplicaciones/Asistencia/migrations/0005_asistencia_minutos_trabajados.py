@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:50
+
+from django.db import migrations, models
+
+
+def calcular_minutos_trabajados(apps, schema_editor):
+    Asistencia = apps.get_model('Asistencia', 'Asistencia')
+    asistencias = list(Asistencia.objects.filter(hora_salida__isnull=False).only('hora_entrada', 'hora_salida'))
+    for a in asistencias:
+        entrada = a.hora_entrada.hour * 3600 + a.hora_entrada.minute * 60 + a.hora_entrada.second
+        salida = a.hora_salida.hour * 3600 + a.hora_salida.minute * 60 + a.hora_salida.second
+        if salida < entrada:
+            salida += 24 * 3600
+        a.minutos_trabajados = (salida - entrada) // 60
+    Asistencia.objects.bulk_update(asistencias, ['minutos_trabajados'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Asistencia', '0004_asistencia_fecha_hora_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='minutos_trabajados',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Minutos Trabajados'),
+        ),
+        migrations.RunPython(calcular_minutos_trabajados, migrations.RunPython.noop),
+    ]
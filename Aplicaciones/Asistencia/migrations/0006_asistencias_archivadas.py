@@ -0,0 +1,60 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+COLUMNAS = 'id, empleado_id, fecha, hora_entrada, hora_salida, minutos_trabajados, observaciones, fecha_registro'
+
+VISTA_HISTORICA = f'''
+CREATE VIEW "Asistencia_historica" AS
+SELECT {COLUMNAS} FROM "Asistencia_asistencia"
+UNION ALL
+SELECT {COLUMNAS} FROM "Asistencia_asistenciaarchivada"
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Asistencia', '0005_asistencia_minutos_trabajados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsistenciaHistorica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora_entrada', models.TimeField()),
+                ('hora_salida', models.TimeField(null=True)),
+                ('minutos_trabajados', models.PositiveIntegerField(null=True)),
+                ('observaciones', models.TextField(null=True)),
+                ('fecha_registro', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'Asistencia_historica',
+                'ordering': ['-fecha', '-hora_entrada'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AsistenciaArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('hora_entrada', models.TimeField(verbose_name='Hora de Entrada')),
+                ('hora_salida', models.TimeField(blank=True, null=True, verbose_name='Hora de Salida')),
+                ('minutos_trabajados', models.PositiveIntegerField(blank=True, null=True, verbose_name='Minutos Trabajados')),
+                ('observaciones', models.TextField(blank=True, null=True, verbose_name='Observaciones')),
+                ('fecha_registro', models.DateTimeField(verbose_name='Fecha de Registro')),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asistencias_archivadas', to='Asistencia.empleado')),
+            ],
+            options={
+                'verbose_name': 'Asistencia Archivada',
+                'verbose_name_plural': 'Asistencias Archivadas',
+                'ordering': ['-fecha', '-hora_entrada'],
+                'indexes': [models.Index(fields=['fecha', 'hora_entrada', 'id'], name='archivada_fecha_hora_idx')],
+            },
+        ),
+        migrations.RunSQL(VISTA_HISTORICA, 'DROP VIEW "Asistencia_historica"'),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Cast, ExtractHour, ExtractMinute, ExtractSecond, Floor
 from django.utils import timezone
 
 class Empleado(models.Model):
@@ -30,6 +32,7 @@ class Asistencia(models.Model):
     fecha = models.DateField(default=timezone.now, verbose_name="Fecha")
     hora_entrada = models.TimeField(verbose_name="Hora de Entrada")
     hora_salida = models.TimeField(null=True, blank=True, verbose_name="Hora de Salida")
+    minutos_trabajados = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Minutos Trabajados")
     observaciones = models.TextField(blank=True, null=True, verbose_name="Observaciones")
     fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
     
@@ -38,6 +41,9 @@ class Asistencia(models.Model):
         verbose_name_plural = "Asistencias"
         ordering = ['-fecha', '-hora_entrada']
         unique_together = ['empleado', 'fecha']
+        indexes = [
+            models.Index(fields=['fecha', 'hora_entrada', 'id'], name='asistencia_fecha_hora_idx'),
+        ]
     
     def __str__(self):
         return f"{self.empleado.nombre_completo} - {self.fecha}"
@@ -46,15 +52,93 @@ class Asistencia(models.Model):
     def registro_completo(self):
         return bool(self.hora_salida)
     
+    def calcular_minutos_trabajados(self):
+        """Minutos entre entrada y salida; si la salida es menor, cruzó la medianoche."""
+        if not self.hora_salida:
+            self.minutos_trabajados = None
+        else:
+            entrada = self.hora_entrada.hour * 3600 + self.hora_entrada.minute * 60 + self.hora_entrada.second
+            salida = self.hora_salida.hour * 3600 + self.hora_salida.minute * 60 + self.hora_salida.second
+            if salida < entrada:
+                salida += 24 * 3600
+            self.minutos_trabajados = (salida - entrada) // 60
+        return self.minutos_trabajados
+    
+    @staticmethod
+    def minutos_hasta(hora_salida):
+        """Expresión SQL de ``calcular_minutos_trabajados`` para usar en ``update()``.
+
+        Los segundos y la división se truncan explícitamente: PostgreSQL
+        devuelve ``numeric`` en ``EXTRACT`` y redondearía al convertir.
+        """
+        entrada = (ExtractHour('hora_entrada') * 3600 + ExtractMinute('hora_entrada') * 60
+                   + Floor(ExtractSecond('hora_entrada')))
+        salida = hora_salida.hour * 3600 + hora_salida.minute * 60 + hora_salida.second
+
+        def minutos(segundos):
+            return Cast(Floor((Value(segundos) - entrada) / Value(60.0)), IntegerField())
+
+        return Case(
+            When(hora_entrada__gt=hora_salida, then=minutos(salida + 24 * 3600)),
+            default=minutos(salida),
+        )
+    
+    def save(self, *args, **kwargs):
+        self.calcular_minutos_trabajados()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'minutos_trabajados' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['minutos_trabajados']
+        super().save(*args, **kwargs)
+    
     def duracion_jornada(self):
         if not self.hora_salida:
             return "Pendiente"
-        from datetime import datetime, timedelta
-        entrada = datetime.combine(self.fecha, self.hora_entrada)
-        salida = datetime.combine(self.fecha, self.hora_salida)
-        if salida < entrada:
-            salida += timedelta(days=1)
-        duracion = salida - entrada
-        horas = int(duracion.total_seconds() // 3600)
-        minutos = int((duracion.total_seconds() % 3600) // 60)
-        return f"{horas}h {minutos}m"
\ No newline at end of file
+        minutos = self.minutos_trabajados
+        if minutos is None:
+            minutos = self.calcular_minutos_trabajados()
+        return f"{minutos // 60}h {minutos % 60}m"
+
+class AsistenciaArchivada(models.Model):
+    """Asistencia antigua movida por ``archivar_historico``; conserva el id original."""
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='asistencias_archivadas')
+    fecha = models.DateField(verbose_name="Fecha")
+    hora_entrada = models.TimeField(verbose_name="Hora de Entrada")
+    hora_salida = models.TimeField(null=True, blank=True, verbose_name="Hora de Salida")
+    minutos_trabajados = models.PositiveIntegerField(null=True, blank=True, verbose_name="Minutos Trabajados")
+    observaciones = models.TextField(blank=True, null=True, verbose_name="Observaciones")
+    fecha_registro = models.DateTimeField(verbose_name="Fecha de Registro")
+    
+    class Meta:
+        verbose_name = "Asistencia Archivada"
+        verbose_name_plural = "Asistencias Archivadas"
+        ordering = ['-fecha', '-hora_entrada']
+        indexes = [
+            models.Index(fields=['fecha', 'hora_entrada', 'id'], name='archivada_fecha_hora_idx'),
+        ]
+    
+    __str__ = Asistencia.__str__
+
+
+class AsistenciaHistorica(models.Model):
+    """Solo lectura: vista SQL con las asistencias activas y las archivadas.
+
+    La crea la migración 0006; si cambian las columnas de ``Asistencia`` hay
+    que recrearla con ellas.
+    """
+    empleado = models.ForeignKey(Empleado, on_delete=models.DO_NOTHING, related_name='+')
+    fecha = models.DateField()
+    hora_entrada = models.TimeField()
+    hora_salida = models.TimeField(null=True)
+    minutos_trabajados = models.PositiveIntegerField(null=True)
+    observaciones = models.TextField(null=True)
+    fecha_registro = models.DateTimeField()
+    
+    class Meta:
+        managed = False
+        db_table = 'Asistencia_historica'
+        ordering = ['-fecha', '-hora_entrada']
+    
+    __str__ = Asistencia.__str__
+    registro_completo = Asistencia.registro_completo
+    calcular_minutos_trabajados = Asistencia.calcular_minutos_trabajados
+    duracion_jornada = Asistencia.duracion_jornada
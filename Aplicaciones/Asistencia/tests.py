@@ -1,3 +1,299 @@
+from datetime import date, time, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from Recuperadora import planillas
+from Recuperadora.rendimiento import Caso, RendimientoMixin
+
+from . import archivo, importacion, kiosko
+from .models import Asistencia, AsistenciaArchivada, AsistenciaHistorica, Empleado
+from .views import COLUMNAS_EXPORTACION
+
+# Volumen reducido: lo que se vigila es que las consultas no crezcan con los datos.
+VOLUMEN_PRUEBA = dict(empleados=60, dias=30, empresas=10, productos=30, registros=300)
+
+
+class RendimientoVistasTest(RendimientoMixin, TestCase):
+    modulo_urls = 'Aplicaciones.Asistencia.urls'
+    ruta_base = Path(__file__).with_name('rendimiento_base.json')
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('sembrar_datos', stdout=StringIO(), **VOLUMEN_PRUEBA)
+
+    def casos(self):
+        hoy = timezone.localdate()
+        empleado = Empleado.objects.filter(activo=True).first()
+        pendiente = Asistencia.objects.filter(fecha=hoy, hora_salida__isnull=True).first()
+        asistencia = Asistencia.objects.exclude(fecha=hoy).first()
+        activos = list(Empleado.objects.filter(activo=True).values_list('id', flat=True))
+        sin_marcar = Empleado.objects.filter(activo=True).exclude(asistencias__fecha=hoy).first()
+        rango = {'fecha_inicio': str(hoy.replace(day=1)), 'fecha_fin': str(hoy)}
+        planilla = 'cedula,nombres,apellidos,cargo,telefono,fecha_ingreso,activo\n' + ''.join(
+            [f'{e.cedula},{e.nombres},{e.apellidos},{e.cargo},{e.telefono},{e.fecha_ingreso},no\n'
+             for e in Empleado.objects.order_by('id')[:20]]
+            + [f'{1800000000 + i},Nuevo,Empleado {i},Estibador,0990000000,2024-01-15,si\n' for i in range(40)])
+        return [
+            Caso('inicio'),
+            Caso('asistencia'),
+            Caso('seleccionar_trabajadores', 'post', datos={'empleados_ids[]': activos, 'hora_entrada': '05:00'}),
+            Caso('marcar_salida', 'post', datos={'empleado_id': pendiente.empleado_id, 'hora_salida': '11:00'}),
+            Caso('marcar_salida_lote', 'post', datos={'empleados_ids[]': activos, 'hora_salida': '11:00'}),
+            Caso('kiosko'),
+            Caso('marcar_qr', 'post', datos={'cedula': sin_marcar.cedula}),
+            Caso('marcar_qr', 'post', variante='salida', datos={'cedula': pendiente.empleado.cedula}),
+            Caso('credenciales_qr', datos={'ids': ','.join(map(str, activos[:20]))}),
+            Caso('listar_empleados'),
+            Caso('obtener_empleado', kwargs={'empleado_id': empleado.id}),
+            Caso('guardar_empleado', 'post', datos={
+                'empleado_id': empleado.id, 'cedula': empleado.cedula, 'nombres': empleado.nombres,
+                'apellidos': empleado.apellidos, 'cargo': empleado.cargo, 'telefono': empleado.telefono,
+                'email': '', 'fecha_ingreso': str(empleado.fecha_ingreso), 'activo': 'true',
+            }),
+            Caso('eliminar_empleado', 'post', kwargs={'empleado_id': empleado.id}),
+            Caso('importar_empleados', 'post', datos={
+                'archivo': lambda: SimpleUploadedFile('empleados.csv', planilla.encode(), 'text/csv'),
+            }),
+            Caso('listar_asistencias', datos=rango),
+            Caso('listar_asistencias', variante='servidor', datos=dict(rango, **{
+                'draw': 1, 'start': 0, 'length': 25, 'order[0][column]': 1,
+                'order[0][dir]': 'desc', 'columns[1][data]': 'fecha', 'search[value]': 'ma',
+            })),
+            Caso('eliminar_asistencia', 'post', kwargs={'asistencia_id': asistencia.id}),
+            Caso('horas_trabajadas', datos=rango),
+            Caso('horas_trabajadas', variante='cargo', datos=dict(rango, agrupar='cargo')),
+            Caso('exportar_asistencias_csv', datos=rango),
+            Caso('exportar_asistencias_xlsx', datos=rango),
+        ]
+
+
+def _empleado(n, **campos):
+    return Empleado.objects.create(**{
+        'cedula': f'{n:010d}', 'nombres': f'Nombre{n}', 'apellidos': f'Apellido{n}', 'cargo': 'Estibador',
+        'telefono': '0990000000', 'fecha_ingreso': date(2024, 1, 1), **campos})
+
+
+class ListarAsistenciasServidorTest(TestCase):
+    """Paginación por cursor del modo servidor de DataTables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        empleados = [_empleado(n) for n in range(5)]
+        # Horas repetidas: el desempate por id es lo que evita saltos y repeticiones
+        Asistencia.objects.bulk_create([
+            Asistencia(empleado=e, fecha=date(2025, 1, 1) + timedelta(days=d), hora_entrada=time(5, n % 2))
+            for d in range(10) for n, e in enumerate(empleados)])
+
+    def pagina(self, **extra):
+        datos = {'draw': 1, 'start': 0, 'length': 7, 'order[0][column]': 1,
+                 'order[0][dir]': 'desc', 'columns[1][data]': 'fecha', **extra}
+        return self.client.get('/asistencias/listar/', datos).json()
+
+    def test_el_cursor_recorre_todo_sin_repetir_en_el_orden_del_offset(self):
+        respuesta = self.pagina()
+        self.assertEqual(respuesta['recordsTotal'], 50)
+        por_cursor = [a['id'] for a in respuesta['data']]
+        while respuesta['next_cursor']:
+            respuesta = self.pagina(cursor=respuesta['next_cursor'])
+            por_cursor += [a['id'] for a in respuesta['data']]
+        por_offset = [a['id'] for inicio in range(0, 50, 7) for a in self.pagina(start=inicio)['data']]
+
+        self.assertEqual(len(por_cursor), 50)
+        self.assertEqual(len(set(por_cursor)), 50)
+        self.assertEqual(por_cursor, por_offset)
+        filas = Asistencia.objects.in_bulk(por_cursor)
+        claves = [(filas[pk].fecha, filas[pk].hora_entrada, pk) for pk in por_cursor]
+        self.assertEqual(claves, sorted(claves, reverse=True))
+
+    def test_busqueda_y_orden_sin_cursor(self):
+        self.assertEqual(self.pagina(**{'search[value]': 'nombre3'})['recordsFiltered'], 10)
+        respuesta = self.pagina(**{'order[0][column]': 0, 'columns[0][data]': 'empleado'})
+        self.assertEqual(respuesta['next_cursor'], '')
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.get('/asistencias/listar/', {'draw': 1, 'cursor': 'x|y|z'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class ExportarAsistenciasTest(TestCase):
+    """El XLSX sale por partes y se abre igual que el CSV."""
+
+    def test_xlsx_en_streaming(self):
+        empleado = _empleado(1, nombres='Ana & <Luz>')
+        Asistencia.objects.bulk_create([Asistencia(empleado=empleado, fecha=date(2025, 1, 1) + timedelta(days=d),
+                                                   hora_entrada=time(6), hora_salida=time(14)) for d in range(5)])
+        with mock.patch.object(planillas, 'FILAS_POR_PARTE', 2):
+            respuesta = self.client.get('/asistencias/exportar/xlsx/', {'fecha_inicio': '2025-01-02'})
+            self.assertTrue(respuesta.streaming)
+            partes = [p for p in respuesta.streaming_content if p]
+        self.assertGreater(len(partes), 1)
+        self.assertIn('asistencias_2025-01-02_hoy.xlsx', respuesta['Content-Disposition'])
+
+        filas = list(load_workbook(BytesIO(b''.join(partes)))['Asistencias'].values)
+        self.assertEqual(list(filas[0]), COLUMNAS_EXPORTACION)
+        self.assertEqual([f[3] for f in filas[1:]], ['2025-01-02', '2025-01-03', '2025-01-04', '2025-01-05'])
+        self.assertEqual(filas[1][:2], ('0000000001', 'Ana & <Luz> Apellido1'))
+
+
+class SeleccionarTrabajadoresTest(TestCase):
+    """Entradas en lote: las ya registradas no se duplican ni se cuentan."""
+
+    def setUp(self):
+        self.empleados = [_empleado(n) for n in range(4)]
+        self.hoy = timezone.now().date()
+
+    def seleccionar(self, empleados):
+        return self.client.post('/seleccionar-trabajadores/', {
+            'empleados_ids[]': [e.id for e in empleados], 'hora_entrada': '06:00'}).json()
+
+    def test_informa_las_ya_registradas(self):
+        Asistencia.objects.create(empleado=self.empleados[0], fecha=self.hoy, hora_entrada=time(5))
+        respuesta = self.seleccionar(self.empleados + self.empleados[1:2])
+        self.assertTrue(respuesta['success'])
+        self.assertIn('3 empleados registrados', respuesta['message'])
+        self.assertIn('1 ya estaban registrados: Nombre0 Apellido0', respuesta['message'])
+        self.assertEqual(Asistencia.objects.filter(fecha=self.hoy).count(), 4)
+        self.assertIn('Todos los empleados', self.seleccionar(self.empleados)['message'])
+
+    def test_no_cuenta_la_fila_que_otro_kiosco_inserto_en_paralelo(self):
+        original = Asistencia.objects.bulk_create
+
+        def con_otro_kiosco(filas, **kwargs):
+            Asistencia.objects.create(empleado=self.empleados[1], fecha=self.hoy, hora_entrada=time(5, 59))
+            return original(filas, **kwargs)
+
+        with mock.patch.object(Asistencia.objects, 'bulk_create', side_effect=con_otro_kiosco):
+            respuesta = self.seleccionar(self.empleados[:3])
+        self.assertIn('2 empleados registrados', respuesta['message'])
+        self.assertIn('1 ya estaban registrados: Nombre1 Apellido1', respuesta['message'])
+        self.assertEqual(Asistencia.objects.get(empleado=self.empleados[1]).hora_entrada, time(5, 59))
+
+
+class ArchivoAsistenciasTest(TestCase):
+    """Ida y vuelta por el archivo: los historiales siguen viendo todo."""
+
+    def setUp(self):
+        self.empleado = _empleado(1)
+        self.hoy = timezone.localdate()
+        self.viejas = [Asistencia.objects.create(empleado=self.empleado, fecha=self.hoy - timedelta(days=d),
+                                                 hora_entrada=time(6), hora_salida=time(14)) for d in (400, 380)]
+        self.reciente = Asistencia.objects.create(empleado=self.empleado, fecha=self.hoy - timedelta(days=10),
+                                                  hora_entrada=time(6), hora_salida=time(14))
+
+    def test_archivar_conserva_ids_y_la_vista_historica(self):
+        self.assertEqual(archivo.pendientes(self.hoy - timedelta(days=30)), 2)
+        self.assertEqual(archivo.archivar(self.hoy - timedelta(days=30)), 2)
+        self.assertEqual(list(Asistencia.objects.values_list('id', flat=True)), [self.reciente.id])
+        self.assertEqual(set(AsistenciaArchivada.objects.values_list('id', flat=True)), {a.id for a in self.viejas})
+        historica = AsistenciaHistorica.objects.get(id=self.viejas[0].id)
+        self.assertEqual((historica.fecha, historica.minutos_trabajados), (self.viejas[0].fecha, 480))
+        self.assertEqual(AsistenciaHistorica.objects.count(), 3)
+
+        datos = self.client.get('/asistencias/listar/').json()['data']
+        self.assertEqual({a['id']: a['archivada'] for a in datos},
+                         {self.viejas[0].id: True, self.viejas[1].id: True, self.reciente.id: False})
+        desde = self.hoy - timedelta(days=20)
+        datos = self.client.get('/asistencias/listar/', {'fecha_inicio': str(desde)}).json()['data']
+        self.assertEqual([a['id'] for a in datos], [self.reciente.id])
+
+    def test_las_archivadas_son_de_solo_lectura(self):
+        archivo.archivar(self.hoy - timedelta(days=30))
+        respuesta = self.client.post(f'/asistencias/eliminar/{self.viejas[0].id}/').json()
+        self.assertFalse(respuesta['success'])
+        self.assertIn('archivada', respuesta['message'])
+        self.assertTrue(AsistenciaArchivada.objects.filter(id=self.viejas[0].id).exists())
+
+
+class KioskoTest(TestCase):
+    """El mapa de cédulas de cada worker sigue a la base, no a su propia caché."""
+
+    def marcar(self, worker, empleado):
+        # Cada worker guarda su propio mapa en memoria
+        with mock.patch.object(kiosko, '_mapa', self.mapas.get(worker, (None, {}))):
+            respuesta = self.client.post('/kiosko/marcar/', {'cedula': empleado.cedula}).json()
+            self.mapas[worker] = kiosko._mapa
+        return respuesta
+
+    def test_baja_y_alta_se_ven_en_otro_worker(self):
+        self.mapas = {}
+        presente, saliente = _empleado(1), _empleado(2)
+        self.assertTrue(self.marcar('b', presente)['success'])
+
+        # Otro worker da de baja a uno y de alta a otro
+        saliente.activo = False
+        saliente.save()
+        nuevo = _empleado(3)
+
+        self.assertIn('no registrada', self.marcar('b', saliente)['message'])
+        self.assertTrue(self.marcar('b', nuevo)['success'])
+        self.assertFalse(Asistencia.objects.filter(empleado=saliente).exists())
+
+
+def _fila(cedula, **campos):
+    return {'cedula': cedula, 'nombres': 'Ana', 'apellidos': 'Vera', 'cargo': 'Estibador',
+            'telefono': '0990000000', 'fecha_ingreso': '2024-01-15', **campos}
+
+
+class ImportarEmpleadosTest(TestCase):
+    """Informe fila por fila de la importación de empleados."""
+
+    def test_informe_por_fila(self):
+        existente = _empleado(7, email='ana@example.com')
+        informe = importacion.importar(enumerate([
+            _fila('0000000007', nombres=existente.nombres, apellidos=existente.apellidos, telefono=existente.telefono,
+                  fecha_ingreso=str(existente.fecha_ingreso), cargo='Supervisor'),
+            _fila('0000000008'),
+            _fila('0000000009', email='no-es-correo'),
+            _fila('0000000008', nombres='Otra'),
+            _fila('0000000010', fecha_ingreso='ayer'),
+            _fila(existente.cedula, cargo=existente.cargo),
+        ], start=2))
+        self.assertEqual([(f['fila'], f['estado']) for f in informe],
+                         [(2, 'actualizado'), (3, 'creado'), (4, 'error'), (5, 'error'), (6, 'error'), (7, 'error')])
+        self.assertEqual(informe[2]['errores'], ['email: no es válido'])
+        self.assertEqual(informe[3]['errores'], ['cedula: repetida (fila 3)'])
+        self.assertEqual(importacion.resumen(informe), {'creado': 1, 'actualizado': 1, 'sin_cambios': 0, 'error': 4})
+        existente.refresh_from_db()
+        self.assertEqual((existente.cargo, existente.email), ('Supervisor', 'ana@example.com'))
+
+    def test_una_fila_invalida_no_reserva_la_cedula(self):
+        informe = importacion.importar([(2, _fila('0000000001', email='x')), (3, _fila('0000000001'))])
+        self.assertEqual([f['estado'] for f in informe], ['error', 'creado'])
+
+    def test_simular_no_escribe(self):
+        informe = importacion.importar([(2, _fila('0000000001'))], simular=True)
+        self.assertEqual(informe[0]['estado'], 'creado')
+        self.assertFalse(Empleado.objects.exists())
+
+    def test_cedula_creada_en_paralelo_queda_como_error(self):
+        _empleado(2)
+        original = Empleado.objects.in_bulk
+        lecturas = []
+
+        def antes_de_la_otra_importacion(*args, **kwargs):
+            existentes = original(*args, **kwargs)
+            lecturas.append(1)
+            if len(lecturas) == 1:
+                existentes.pop('0000000002', None)  # se leyó antes de que la otra la creara
+            return existentes
+
+        with mock.patch.object(Empleado.objects, 'in_bulk', side_effect=antes_de_la_otra_importacion):
+            informe = importacion.importar([(2, _fila('0000000001')), (3, _fila('0000000002')), (4, _fila('0000000003'))])
+        self.assertEqual([f['estado'] for f in informe], ['creado', 'error', 'creado'])
+        self.assertIn('otra operación', informe[1]['errores'][0])
+        self.assertEqual(Empleado.objects.get(cedula='0000000002').nombres, 'Nombre2')
 
-# Create your tests here.
+    def test_vista_con_csv(self):
+        planilla = 'Cédula,Nombres,Apellidos,Cargo,Teléfono,Fecha de ingreso\n0000000001,Ana,Vera,Estibador,099,15/01/2024\n'
+        respuesta = self.client.post('/empleados/importar/', {
+            'archivo': SimpleUploadedFile('empleados.csv', planilla.encode(), 'text/csv')}).json()
+        self.assertTrue(respuesta['success'], respuesta)
+        self.assertEqual(respuesta['resumen']['creado'], 1)
+        self.assertEqual(Empleado.objects.get().fecha_ingreso, date(2024, 1, 15))
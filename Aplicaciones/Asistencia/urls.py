@@ -9,10 +9,18 @@ urlpatterns = [
     path('asistencia/', views.asistencia_view, name='asistencia'),
     path('seleccionar-trabajadores/', views.seleccionar_trabajadores, name='seleccionar_trabajadores'),
     path('marcar-salida/', views.marcar_salida, name='marcar_salida'),
+    path('marcar-salida/lote/', views.marcar_salida_lote, name='marcar_salida_lote'),
+    path('kiosko/', views.kiosko_view, name='kiosko'),
+    path('kiosko/marcar/', views.marcar_qr, name='marcar_qr'),
+    path('empleados/credenciales/', views.credenciales_qr, name='credenciales_qr'),
     path('empleados/listar/', views.listar_empleados, name='listar_empleados'),
     path('empleados/obtener/<int:empleado_id>/', views.obtener_empleado, name='obtener_empleado'),
     path('empleados/guardar/', views.guardar_empleado, name='guardar_empleado'),
     path('empleados/eliminar/<int:empleado_id>/', views.eliminar_empleado, name='eliminar_empleado'),
+    path('empleados/importar/', views.importar_empleados, name='importar_empleados'),
     path('asistencias/listar/', views.listar_asistencias, name='listar_asistencias'),
+    path('asistencias/horas/', views.horas_trabajadas, name='horas_trabajadas'),
+    path('asistencias/exportar/csv/', views.exportar_asistencias_csv, name='exportar_asistencias_csv'),
+    path('asistencias/exportar/xlsx/', views.exportar_asistencias_xlsx, name='exportar_asistencias_xlsx'),
     path('asistencias/eliminar/<int:asistencia_id>/', views.eliminar_asistencia, name='eliminar_asistencia'),
 ]
\ No newline at end of file
@@ -1,8 +1,16 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime
-from .models import Empleado, Asistencia
+import csv
+from Recuperadora import planillas
+from Recuperadora.enrutador import solo_lectura
+from Recuperadora.eventos import publicar
+from . import archivo, importacion, kiosko
+from .models import Empleado, Asistencia, AsistenciaArchivada
 
 def inicio(request):
     empleados = Empleado.objects.filter(activo=True)
@@ -35,6 +43,37 @@ def asistencia_view(request):
         'total_presentes': len(asistencias_dict),
     })
 
+def _registrar_entradas(empleados_ids, fecha, hora_entrada):
+    """Registra la entrada de varios empleados con un número constante de consultas.
+
+    Devuelve ``(registros_creados, nombres_ya_registrados)``. Si otro kiosco
+    inserta la misma (empleado, fecha) en paralelo, la fila se ignora gracias a
+    la clave única en lugar de hacer fallar la petición; después del INSERT se
+    releen las filas y solo cuentan como creadas las que llevan la marca
+    ``fecha_registro`` de esta llamada.
+    """
+    ids = list(dict.fromkeys(int(i) for i in empleados_ids))
+    empleados = Empleado.objects.in_bulk(ids)
+    faltantes = [pk for pk in ids if pk not in empleados]
+    if faltantes:
+        raise Empleado.DoesNotExist(f'Empleado(s) no encontrado(s): {", ".join(map(str, faltantes))}')
+    
+    with transaction.atomic():
+        ya_registrados_ids = set(Asistencia.objects
+                                 .filter(fecha=fecha, empleado_id__in=ids)
+                                 .values_list('empleado_id', flat=True))
+        nuevos = [Asistencia(empleado_id=pk, fecha=fecha, hora_entrada=hora_entrada)
+                  for pk in ids if pk not in ya_registrados_ids]
+        Asistencia.objects.bulk_create(nuevos, ignore_conflicts=True)
+        propios = {a.empleado_id: a.fecha_registro for a in nuevos}
+        creados = {pk for pk, registro in (Asistencia.objects
+                                           .filter(fecha=fecha, empleado_id__in=propios)
+                                           .values_list('empleado_id', 'fecha_registro'))
+                   if registro == propios[pk]}
+    
+    nombres = [empleados[pk].nombre_completo for pk in ids if pk not in creados]
+    return len(creados), nombres
+
 def seleccionar_trabajadores(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'Método no permitido'})
@@ -49,29 +88,10 @@ def seleccionar_trabajadores(request):
         
         hora_obj = datetime.strptime(hora_entrada, '%H:%M').time()
         
-        registros_creados = 0
-        empleados_ya_registrados = []
-        
-        for emp_id in empleados_ids:
-            empleado = Empleado.objects.get(id=emp_id)
-            
-            # Verificar si ya existe una asistencia para este empleado en este día
-            asistencia_existente = Asistencia.objects.filter(
-                empleado=empleado,
-                fecha=hoy
-            ).first()
-            
-            if asistencia_existente:
-                # Si ya existe, agregar a la lista de ya registrados
-                empleados_ya_registrados.append(empleado.nombre_completo)
-            else:
-                # Si no existe, crear nuevo registro
-                Asistencia.objects.create(
-                    empleado=empleado,
-                    fecha=hoy,
-                    hora_entrada=hora_obj
-                )
-                registros_creados += 1
+        registros_creados, empleados_ya_registrados = _registrar_entradas(empleados_ids, hoy, hora_obj)
+        if registros_creados:
+            publicar('asistencia', 'entrada', {'fecha': hoy, 'registrados': registros_creados},
+                     origen=request.headers.get('X-Cliente', ''))
         
         # Construir mensaje de respuesta
         if registros_creados > 0 and len(empleados_ya_registrados) > 0:
@@ -117,6 +137,8 @@ def marcar_salida(request):
         
         asistencia.hora_salida = datetime.strptime(hora_salida, '%H:%M').time()
         asistencia.save()
+        publicar('asistencia', 'salida', {'fecha': hoy, 'empleado_id': empleado.id, 'hora_salida': hora_salida},
+                 origen=request.headers.get('X-Cliente', ''))
         
         return JsonResponse({
             'success': True,
@@ -126,6 +148,77 @@ def marcar_salida(request):
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error: {str(e)}'})
 
+def _registrar_salidas(empleados_ids, fecha, hora_salida):
+    """Registra la misma salida a varios empleados con un número constante de consultas.
+
+    Devuelve ``(salidas, omitidos, sin_entrada)``: las asistencias abiertas
+    que se cerraron, las que ya tenían salida y los ids sin entrada hoy. Las
+    salidas se escriben con un solo UPDATE que calcula los minutos en SQL.
+    """
+    ids = list(dict.fromkeys(int(i) for i in empleados_ids))
+    with transaction.atomic():
+        asistencias = list(Asistencia.objects
+                           .select_for_update(of=('self',))
+                           .select_related('empleado')
+                           .filter(fecha=fecha, empleado_id__in=ids, empleado__activo=True)
+                           .order_by('empleado__apellidos', 'empleado__nombres'))
+        salidas = [a for a in asistencias if a.hora_salida is None]
+        omitidos = [a for a in asistencias if a.hora_salida is not None]
+        Asistencia.objects.filter(id__in=[a.id for a in salidas]).update(
+            hora_salida=hora_salida, minutos_trabajados=Asistencia.minutos_hasta(hora_salida))
+    for a in salidas:
+        a.hora_salida = hora_salida
+        a.calcular_minutos_trabajados()
+    con_entrada = {a.empleado_id for a in asistencias}
+    return salidas, omitidos, [pk for pk in ids if pk not in con_entrada]
+
+def marcar_salida_lote(request):
+    """Salida de todo un turno: ``empleados_ids[]`` con una misma ``hora_salida``."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'})
+    
+    try:
+        empleados_ids = request.POST.getlist('empleados_ids[]')
+        hora_salida = request.POST.get('hora_salida')
+        hoy = timezone.now().date()
+        
+        if not empleados_ids or not hora_salida:
+            return JsonResponse({'success': False, 'message': 'Faltan datos'})
+        
+        hora_obj = datetime.strptime(hora_salida, '%H:%M').time()
+        salidas, omitidos, sin_entrada = _registrar_salidas(empleados_ids, hoy, hora_obj)
+        if salidas:
+            publicar('asistencia', 'salida', {'fecha': hoy, 'registrados': len(salidas), 'hora_salida': hora_salida},
+                     origen=request.headers.get('X-Cliente', ''))
+        
+        mensaje = f'✓ {len(salidas)} salidas registradas a las {hora_salida}'
+        if omitidos:
+            mensaje += f'<br>⚠️ {len(omitidos)} ya tenían salida: {", ".join(a.empleado.nombre_completo for a in omitidos[:3])}'
+            if len(omitidos) > 3:
+                mensaje += f' y {len(omitidos) - 3} más...'
+        if sin_entrada:
+            mensaje += f'<br>⚠️ {len(sin_entrada)} no están registrados para hoy'
+        
+        return JsonResponse({
+            'success': True,
+            'message': mensaje,
+            'salidas': [{
+                'empleado_id': a.empleado_id,
+                'nombre': a.empleado.nombre_completo,
+                'hora_entrada': a.hora_entrada.strftime('%H:%M'),
+                'minutos_trabajados': a.minutos_trabajados,
+                'duracion': a.duracion_jornada(),
+            } for a in salidas],
+            'omitidos': [{
+                'empleado_id': a.empleado_id,
+                'nombre': a.empleado.nombre_completo,
+                'hora_salida': a.hora_salida.strftime('%H:%M'),
+            } for a in omitidos],
+            'sin_entrada': sin_entrada,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Error: {str(e)}'})
+
 def listar_empleados(request):
     empleados = Empleado.objects.all().order_by('apellidos')
     data = [{
@@ -199,17 +292,8 @@ def eliminar_empleado(request, empleado_id):
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error: {str(e)}'})
 
-def listar_asistencias(request):
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    
-    asistencias = Asistencia.objects.all().select_related('empleado')
-    if fecha_inicio:
-        asistencias = asistencias.filter(fecha__gte=fecha_inicio)
-    if fecha_fin:
-        asistencias = asistencias.filter(fecha__lte=fecha_fin)
-    
-    data = [{
+def _serializar_asistencia(a, archivadas=frozenset()):
+    return {
         'id': a.id,
         'empleado': a.empleado.nombre_completo,
         'cedula': a.empleado.cedula,
@@ -219,7 +303,135 @@ def listar_asistencias(request):
         'hora_salida': a.hora_salida.strftime('%H:%M') if a.hora_salida else '',
         'duracion': a.duracion_jornada(),
         'observaciones': a.observaciones or '',
-    } for a in asistencias]
+        'archivada': a.id in archivadas,
+    }
+
+
+# Columnas por las que DataTables puede ordenar en modo servidor.
+# 'fecha' es el orden natural y el único que usa paginación por cursor.
+COLUMNAS_ORDEN_ASISTENCIA = {
+    'empleado': ['empleado__apellidos', 'empleado__nombres', 'id'],
+    'fecha': ['fecha', 'hora_entrada', 'id'],
+    'hora_entrada': ['hora_entrada', 'fecha', 'id'],
+    'hora_salida': ['hora_salida', 'fecha', 'id'],
+    'duracion': ['minutos_trabajados', 'fecha', 'id'],
+}
+
+
+def _entero(valor, defecto, minimo=0, maximo=None):
+    try:
+        n = int(valor)
+    except (TypeError, ValueError):
+        return defecto
+    n = max(n, minimo)
+    return min(n, maximo) if maximo is not None else n
+
+
+def _filtro_busqueda(texto):
+    """Cada palabra debe aparecer en nombres, apellidos o cédula."""
+    filtro = Q()
+    for termino in texto.split():
+        filtro &= (Q(empleado__nombres__icontains=termino)
+                   | Q(empleado__apellidos__icontains=termino)
+                   | Q(empleado__cedula__startswith=termino))
+    return filtro
+
+
+def _filtro_cursor(cursor, descendente):
+    """Condición de búsqueda por clave (fecha, hora_entrada, id) posterior al cursor."""
+    fecha, hora, pk = cursor.split('|')
+    fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
+    hora = datetime.strptime(hora, '%H:%M:%S').time()
+    pk = int(pk)
+    op = 'lt' if descendente else 'gt'
+    return (Q(**{f'fecha__{op}': fecha})
+            | Q(fecha=fecha, **{f'hora_entrada__{op}': hora})
+            | Q(fecha=fecha, hora_entrada=hora, **{f'id__{op}': pk}))
+
+
+def _cursor_de(a):
+    return f"{a.fecha:%Y-%m-%d}|{a.hora_entrada:%H:%M:%S}|{a.id}"
+
+
+def _listar_asistencias_servidor(request, asistencias):
+    """Modo de procesamiento en servidor de DataTables (draw/start/length/order/search).
+
+    Con el orden por fecha, el cliente puede enviar ``cursor`` (devuelto como
+    ``next_cursor`` en la página anterior) para paginar por clave en lugar de
+    OFFSET; sin cursor se usa ``start`` como desplazamiento.
+    """
+    draw = _entero(request.GET.get('draw'), 0)
+    start = _entero(request.GET.get('start'), 0)
+    length = _entero(request.GET.get('length'), 25, minimo=1, maximo=500)
+
+    columna_idx = request.GET.get('order[0][column]')
+    columna = request.GET.get(f'columns[{columna_idx}][data]', 'fecha') if columna_idx is not None else 'fecha'
+    if columna not in COLUMNAS_ORDEN_ASISTENCIA:
+        columna = 'fecha'
+    descendente = request.GET.get('order[0][dir]', 'desc') != 'asc'
+    prefijo = '-' if descendente else ''
+    orden = [prefijo + campo for campo in COLUMNAS_ORDEN_ASISTENCIA[columna]]
+
+    total = asistencias.count()
+    busqueda = request.GET.get('search[value]', '').strip()
+    if busqueda:
+        asistencias = asistencias.filter(_filtro_busqueda(busqueda))
+        filtrados = asistencias.count()
+    else:
+        filtrados = total
+
+    asistencias = asistencias.order_by(*orden)
+    cursor = request.GET.get('cursor', '')
+    if cursor and columna == 'fecha':
+        try:
+            pagina = list(asistencias.filter(_filtro_cursor(cursor, descendente))[:length])
+        except ValueError:
+            return JsonResponse({'draw': draw, 'error': 'Cursor inválido'}, status=400)
+    else:
+        pagina = list(asistencias[start:start + length])
+    archivadas = archivo.archivadas(pagina)
+
+    return JsonResponse({
+        'draw': draw,
+        'recordsTotal': total,
+        'recordsFiltered': filtrados,
+        'data': [_serializar_asistencia(a, archivadas) for a in pagina],
+        'next_cursor': _cursor_de(pagina[-1]) if pagina and columna == 'fecha' else '',
+    })
+
+
+def _filtrar_asistencias(request):
+    """Asistencias filtradas por fecha_inicio, fecha_fin y, opcionalmente, empleado y cargo.
+
+    Si el rango llega a fechas archivadas, se consulta la vista histórica.
+    """
+    fecha_inicio = request.GET.get('fecha_inicio')
+    fecha_fin = request.GET.get('fecha_fin')
+    empleado_id = request.GET.get('empleado')
+    cargo = request.GET.get('cargo', '').strip()
+    
+    asistencias = archivo.consulta(fecha_inicio).select_related('empleado')
+    if fecha_inicio:
+        asistencias = asistencias.filter(fecha__gte=fecha_inicio)
+    if fecha_fin:
+        asistencias = asistencias.filter(fecha__lte=fecha_fin)
+    if empleado_id:
+        asistencias = asistencias.filter(empleado_id=empleado_id)
+    if cargo:
+        asistencias = asistencias.filter(empleado__cargo__iexact=cargo)
+    return asistencias
+
+
+@solo_lectura
+def listar_asistencias(request):
+    asistencias = _filtrar_asistencias(request)
+    
+    if 'draw' in request.GET:
+        return _listar_asistencias_servidor(request, asistencias)
+    
+    asistencias = list(asistencias)
+    archivadas = archivo.archivadas(asistencias)
+    data = [_serializar_asistencia(a, archivadas) for a in asistencias]
     
     return JsonResponse({'data': data})
 
@@ -228,7 +440,13 @@ def eliminar_asistencia(request, asistencia_id):
         return JsonResponse({'success': False, 'message': 'Método no permitido'})
     
     try:
-        asistencia = get_object_or_404(Asistencia, id=asistencia_id)
+        asistencia = Asistencia.objects.filter(id=asistencia_id).first()
+        if asistencia is None:
+            archivada = AsistenciaArchivada.objects.filter(id=asistencia_id).exists()
+            return JsonResponse({
+                'success': False,
+                'message': 'La asistencia está archivada y es de solo lectura' if archivada else 'Asistencia no encontrada'
+            })
         empleado = asistencia.empleado.nombre_completo
         fecha = asistencia.fecha
         asistencia.delete()
@@ -243,3 +461,185 @@ def eliminar_asistencia(request, asistencia_id):
 
 def inicio(request):
     return render(request, 'inicio.html')  # o tu plantilla principal
+
+
+# ── IMPORTACIÓN DE EMPLEADOS ──────────────────
+
+def importar_empleados(request):
+    """Crea o actualiza por cédula los empleados de un XLSX/CSV (``archivo``).
+
+    Responde el resumen y el informe fila por fila; con ``simular=true``
+    solo valida.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'})
+    archivo_subido = request.FILES.get('archivo')
+    if archivo_subido is None:
+        return JsonResponse({'success': False, 'message': 'Adjunte un archivo XLSX o CSV'})
+
+    simular = request.POST.get('simular') == 'true'
+    try:
+        informe = importacion.importar(importacion.leer(archivo_subido, archivo_subido.name), simular=simular)
+    except importacion.ArchivoInvalido as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+    totales = importacion.resumen(informe)
+    return JsonResponse({
+        'success': True,
+        'message': (f"{'Simulación: ' if simular else ''}{totales['creado']} creados, "
+                    f"{totales['actualizado']} actualizados, {totales['sin_cambios']} sin cambios, "
+                    f"{totales['error']} con errores"),
+        'resumen': totales,
+        'filas': informe,
+    })
+
+# ── EXPORTACIÓN ───────────────────────────────
+
+COLUMNAS_EXPORTACION = ['Cédula', 'Empleado', 'Cargo', 'Fecha', 'Entrada', 'Salida', 'Duración', 'Observaciones']
+TAMANO_BLOQUE_EXPORTACION = 2000
+
+
+def _filas_exportacion(asistencias):
+    """Recorre la consulta por bloques; nunca hay más de un bloque en memoria."""
+    for a in asistencias.order_by('fecha', 'hora_entrada', 'id').iterator(chunk_size=TAMANO_BLOQUE_EXPORTACION):
+        yield [
+            a.empleado.cedula,
+            a.empleado.nombre_completo,
+            a.empleado.cargo,
+            a.fecha.strftime('%Y-%m-%d'),
+            a.hora_entrada.strftime('%H:%M'),
+            a.hora_salida.strftime('%H:%M') if a.hora_salida else '',
+            a.duracion_jornada(),
+            a.observaciones or '',
+        ]
+
+
+def _nombre_exportacion(request, extension):
+    desde = request.GET.get('fecha_inicio') or 'inicio'
+    hasta = request.GET.get('fecha_fin') or 'hoy'
+    return f'asistencias_{desde}_{hasta}.{extension}'
+
+
+class _Eco:
+    """Búfer mínimo para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, valor):
+        return valor
+
+
+@solo_lectura
+def exportar_asistencias_csv(request):
+    writer = csv.writer(_Eco())
+    
+    def generar():
+        yield '\ufeff'  # BOM para que Excel reconozca UTF-8
+        yield writer.writerow(COLUMNAS_EXPORTACION)
+        for fila in _filas_exportacion(_filtrar_asistencias(request)):
+            yield writer.writerow(fila)
+    
+    response = StreamingHttpResponse(generar(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{_nombre_exportacion(request, "csv")}"'
+    return response
+
+
+@solo_lectura
+def exportar_asistencias_xlsx(request):
+    filas = _filas_exportacion(_filtrar_asistencias(request))
+    response = StreamingHttpResponse(planillas.escribir_xlsx('Asistencias', COLUMNAS_EXPORTACION, filas),
+                                     content_type=planillas.TIPO_XLSX)
+    response['Content-Disposition'] = f'attachment; filename="{_nombre_exportacion(request, "xlsx")}"'
+    return response
+
+
+# ── KIOSCO (escaneo de cédula/QR) ─────────────
+
+MENSAJES_KIOSCO = {
+    'entrada': '✓ ENTRADA {hora}',
+    'salida': '✓ SALIDA {hora}',
+    'repetida': '⚠️ Ya marcó entrada a las {hora}',
+    'completa': '⚠️ Ya marcó salida a las {hora}',
+}
+
+
+def kiosko_view(request):
+    return render(request, 'kiosko.html')
+
+
+def marcar_qr(request):
+    """Un escaneo: registra la entrada o, si ya la tiene, la salida de la cédula."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'})
+    
+    cedula = request.POST.get('cedula', '')
+    empleado = kiosko.empleado_por_cedula(cedula)
+    if empleado is None:
+        return JsonResponse({'success': False, 'message': f'⚠️ Cédula {cedula.strip()} no registrada o inactiva'})
+    
+    empleado_id, nombre = empleado
+    ahora = timezone.localtime()
+    tipo, asistencia = kiosko.marcar(empleado_id, ahora)
+    if asistencia is None:
+        hora = ahora.strftime('%H:%M')
+        publicar('asistencia', tipo, {'fecha': ahora.date(), 'empleado_id': empleado_id, 'hora': hora},
+                 origen=request.headers.get('X-Cliente', ''))
+    else:
+        hora = (asistencia.hora_salida or asistencia.hora_entrada).strftime('%H:%M')
+    return JsonResponse({
+        'success': asistencia is None,
+        'tipo': tipo,
+        'empleado': nombre,
+        'message': MENSAJES_KIOSCO[tipo].format(hora=hora),
+    })
+
+
+def credenciales_qr(request):
+    """Credenciales imprimibles con el QR de la cédula de los empleados activos (o ``?ids=1,2``)."""
+    empleados = Empleado.objects.filter(activo=True)
+    ids = [i for i in request.GET.get('ids', '').split(',') if i.isdigit()]
+    if ids:
+        empleados = empleados.filter(id__in=ids)
+    return render(request, 'credenciales_qr.html', {
+        'credenciales': [(e, kiosko.qr_svg(e.cedula)) for e in empleados.order_by('apellidos', 'nombres')],
+    })
+
+
+# ── HORAS TRABAJADAS ──────────────────────────
+
+# Campos y alias de cada agrupación; el GROUP BY se hace sobre ellos.
+AGRUPACIONES_HORAS = {
+    'empleado': (['empleado_id'], {
+        'cedula': F('empleado__cedula'),
+        'nombres': F('empleado__nombres'),
+        'apellidos': F('empleado__apellidos'),
+        'cargo': F('empleado__cargo'),
+    }),
+    'cargo': ([], {'cargo': F('empleado__cargo')}),
+}
+
+
+@solo_lectura
+def horas_trabajadas(request):
+    """Totales de minutos trabajados por empleado o por cargo en un rango de fechas.
+
+    Acepta los filtros de ``listar_asistencias`` y ``agrupar=empleado|cargo``;
+    todo se calcula en una sola consulta agregada sobre ``minutos_trabajados``.
+    """
+    agrupar = request.GET.get('agrupar', 'empleado')
+    if agrupar not in AGRUPACIONES_HORAS:
+        return JsonResponse({'success': False, 'message': 'Agrupación no válida'}, status=400)
+    
+    campos, alias = AGRUPACIONES_HORAS[agrupar]
+    filas = list(_filtrar_asistencias(request).select_related(None).order_by()
+                 .values(*campos, **alias)
+                 .annotate(jornadas=Count('id'),
+                           pendientes=Count('id', filter=Q(hora_salida__isnull=True)),
+                           minutos=Coalesce(Sum('minutos_trabajados'), 0))
+                 .order_by('-minutos', *alias))
+    for fila in filas:
+        fila['horas'] = round(fila['minutos'] / 60, 2)
+    total = sum(f['minutos'] for f in filas)
+    return JsonResponse({
+        'success': True,
+        'agrupar': agrupar,
+        'data': filas,
+        'total_minutos': total,
+        'total_horas': round(total / 60, 2),
+    })
@@ -0,0 +1,209 @@
+"""Series de descargue por rango de fechas, para gráficos.
+
+Palets y camiones por empresa o por producto, semana a semana o mes a mes.
+Todo se suma en SQL sobre los resúmenes diarios, que ya agregan los ítems
+y siguen ahí para los días archivados.
+
+Un mes terminado con todos sus días cerrados ya no cambia: la tarea
+``consolidar_analitica``, que se encola al cerrar el día (o ``manage.py
+consolidar_analitica``), guarda sus totales (``MesConsolidado`` con
+``ResumenEmpresaMes``/``ResumenProductoMes``) y las consultas los leen de
+ahí; en vivo se suman el mes en curso, los bordes del rango y los meses aún
+sin consolidar. Las consultas solo leen. Crear, cambiar (salvo archivarlo) o
+borrar un día de un mes consolidado, o reconstruir sus resúmenes, descarta
+ese mes (``invalidar``).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (CierreDia, Empresa, MesConsolidado, Producto, ResumenEmpresaDia, ResumenEmpresaMes,
+                     ResumenProductoDia, ResumenProductoMes)
+
+# agrupar -> (resumen diario, resumen mensual, campo, modelo con el nombre)
+FUENTES = {
+    'empresa': (ResumenEmpresaDia, ResumenEmpresaMes, 'empresa', Empresa),
+    'producto': (ResumenProductoDia, ResumenProductoMes, 'producto', Producto),
+}
+PERIODOS = {'mes': TruncMonth, 'semana': TruncWeek}
+MAX_PERIODOS = 200
+
+
+def _mes_siguiente(mes):
+    return (mes + timedelta(days=32)).replace(day=1)
+
+
+def periodos(desde, hasta, periodo):
+    """Inicio de cada mes (día 1) o semana (lunes) que toca el rango."""
+    if periodo == 'semana':
+        actual, siguiente = desde - timedelta(days=desde.weekday()), lambda f: f + timedelta(days=7)
+    else:
+        actual, siguiente = desde.replace(day=1), _mes_siguiente
+    inicios = []
+    while actual <= hasta:
+        inicios.append(actual)
+        actual = siguiente(actual)
+    return inicios
+
+
+# ── Consolidación ───────────────────────────────────────────────────────────
+
+def invalidar(fechas):
+    """Descarta los meses consolidados que contienen alguna de las fechas."""
+    mes_actual = timezone.localdate().replace(day=1)
+    meses = set()
+    for fecha in fechas:
+        if isinstance(fecha, datetime):
+            fecha = timezone.localdate(fecha) if timezone.is_aware(fecha) else fecha.date()
+        if fecha < mes_actual:
+            meses.add(fecha.replace(day=1))
+    if meses:
+        MesConsolidado.objects.filter(mes__in=meses).delete()
+
+
+@receiver([post_save, post_delete], sender=CierreDia)
+def _cierre_modificado(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'archivado'}:
+        return  # archivar mueve los registros; los resúmenes no cambian
+    invalidar([instance.fecha])
+
+
+def consolidar(meses):
+    """Guarda los totales de meses terminados, con una consulta por resumen.
+
+    Devuelve False, sin guardar nada, si otro proceso consolidó alguno antes.
+    """
+    dias = {'cierre__fecha__gte': min(meses), 'cierre__fecha__lt': _mes_siguiente(max(meses))}
+    try:
+        with transaction.atomic():
+            MesConsolidado.objects.bulk_create([MesConsolidado(mes=m) for m in meses])
+            ids = dict(MesConsolidado.objects.filter(mes__in=meses).values_list('mes', 'id'))
+            for Dia, Mes, campo, _ in FUENTES.values():
+                filas = (Dia.objects.filter(**dias)
+                         .annotate(inicio=TruncMonth('cierre__fecha'))
+                         .values_list('inicio', campo)
+                         .annotate(Sum('palets'), Sum('camiones'), Sum('items')).order_by())
+                Mes.objects.bulk_create([
+                    Mes(mes_id=ids[mes], palets=p or 0, camiones=c, items=n, **{f'{campo}_id': clave})
+                    for mes, clave, p, c, n in filas if mes in ids
+                ])
+    except IntegrityError:
+        return False
+    return True
+
+
+def consolidar_pendientes():
+    """Consolida los meses terminados con todos sus días cerrados que aún no lo están. Devuelve cuáles."""
+    mes_actual = timezone.localdate().replace(day=1)
+    meses = set(CierreDia.objects.filter(fecha__lt=mes_actual)
+                .annotate(mes=TruncMonth('fecha')).values('mes')
+                .annotate(abiertos=Count('id', filter=~Q(estado='cerrado')))
+                .filter(abiertos=0).order_by().values_list('mes', flat=True))
+    meses = {m.date() if isinstance(m, datetime) else m for m in meses}
+    faltan = sorted(meses - set(MesConsolidado.objects.values_list('mes', flat=True)))
+    if faltan and consolidar(faltan):
+        return faltan
+    return []
+
+
+def _consolidados(meses):
+    """De los meses terminados pedidos, los que ya están consolidados."""
+    if not meses:
+        return set()
+    return set(MesConsolidado.objects.filter(mes__in=meses).values_list('mes', flat=True))
+
+
+def _fuera_de(desde, hasta, meses):
+    """Tramos del rango que quedan fuera de los meses dados."""
+    tramos, inicio = [], desde
+    for mes in sorted(meses):
+        if inicio < mes:
+            tramos.append((inicio, mes - timedelta(days=1)))
+        inicio = max(inicio, _mes_siguiente(mes))
+    if inicio <= hasta:
+        tramos.append((inicio, hasta))
+    return tramos
+
+
+# ── Series ──────────────────────────────────────────────────────────────────
+
+def series(desde, hasta, agrupar='empresa', periodo='mes', limite=10):
+    """Totales por periodo de las ``limite`` empresas/productos con más palets; el resto va en "Otros"."""
+    Dia, Mes, campo, Modelo = FUENTES[agrupar]
+    inicios = periodos(desde, hasta, periodo)
+    acumulado = defaultdict(lambda: [0.0, 0])  # (inicio, clave) -> [palets, camiones]
+
+    tramos = [(desde, hasta)]
+    if periodo == 'mes':
+        mes_actual = timezone.localdate().replace(day=1)
+        completos = [m for m in inicios if desde <= m < mes_actual and _mes_siguiente(m) <= hasta + timedelta(days=1)]
+        consolidados = _consolidados(completos)
+        if consolidados:
+            for mes, clave, p, c in (Mes.objects.filter(mes__mes__in=consolidados)
+                                     .values_list('mes__mes', campo, 'palets', 'camiones')):
+                acum = acumulado[(mes, clave)]
+                acum[0] += p
+                acum[1] += c
+            tramos = _fuera_de(desde, hasta, consolidados)
+
+    if tramos:
+        filtro = Q()
+        for inicio, fin in tramos:
+            filtro |= Q(cierre__fecha__range=(inicio, fin))
+        filas = (Dia.objects.filter(filtro)
+                 .annotate(periodo=PERIODOS[periodo]('cierre__fecha'))
+                 .values_list('periodo', campo)
+                 .annotate(Sum('palets'), Sum('camiones')).order_by())
+        for inicio, clave, p, c in filas:
+            acum = acumulado[(inicio, clave)]
+            acum[0] += p or 0
+            acum[1] += c or 0
+
+    por_clave = defaultdict(float)
+    for (_, clave), (p, _) in acumulado.items():
+        por_clave[clave] += p
+    top = sorted(por_clave, key=lambda k: (-por_clave[k], k is None, k or 0))[:limite]
+
+    indice = {inicio: i for i, inicio in enumerate(inicios)}
+
+    def vacia():
+        return {'palets': [0.0] * len(inicios), 'camiones': [0] * len(inicios)}
+
+    por_serie = {clave: vacia() for clave in top}
+    otros, totales = vacia(), vacia()
+    for (inicio, clave), (p, c) in acumulado.items():
+        if isinstance(inicio, datetime):
+            inicio = inicio.date()
+        i = indice[inicio]
+        for destino in (por_serie.get(clave, otros), totales):
+            destino['palets'][i] += p
+            destino['camiones'][i] += c
+
+    nombres = dict(Modelo.objects.filter(pk__in=[k for k in top if k is not None]).values_list('id', 'nombre'))
+    resultado = [{'id': k, 'nombre': nombres.get(k, '—'), **por_serie[k]} for k in top]
+    if len(por_clave) > len(top):
+        resultado.append({'id': None, 'nombre': 'Otros', **otros})
+    for serie in resultado + [totales]:
+        serie['palets'] = [round(p, 2) for p in serie['palets']]
+
+    return {
+        'etiquetas': [f'{i:%Y-%m}' if periodo == 'mes' else i.isoformat() for i in inicios],
+        'series': resultado,
+        'totales': totales,
+    }
+
+
+def rango_por_defecto(hoy=None):
+    """Los últimos seis meses, incluido el actual."""
+    hoy = hoy or timezone.localdate()
+    desde = hoy.replace(day=1)
+    for _ in range(5):
+        desde = (desde - timedelta(days=1)).replace(day=1)
+    return desde, hoy
+
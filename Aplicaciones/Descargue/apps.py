@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DescargueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Aplicaciones.Descargue'
+
+    def ready(self):
+        from . import analitica, catalogos  # noqa: F401  (registran las señales que invalidan las cachés)
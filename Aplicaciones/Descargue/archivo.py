@@ -0,0 +1,50 @@
+"""Archivo de los días de descargue cerrados y antiguos.
+
+``archivar`` mueve los registros e ítems de cada día cerrado anterior al
+corte a ``RegistroArchivado``/``ItemArchivado`` (con los mismos ids) y marca
+el ``CierreDia`` como archivado. El cierre, su total y sus resúmenes diarios
+se quedan donde están, así que los tableros y reportes por rango no cambian;
+el detalle, el PDF y la factura de un día archivado leen de las tablas de
+archivo (``CierreDia.modelos_registro``). Un día archivado queda congelado:
+un cambio de geometría de producto ya no lo recalcula.
+"""
+from django.db import transaction
+
+from .models import CierreDia, ItemArchivado, ItemDescargue, RegistroArchivado, RegistroDescargue
+
+CAMPOS_REGISTRO = ['id', 'cierre_id', 'empresa_id', 'chofer_nombre', 'chofer_telefono', 'placa', 'tipo',
+                   'observacion', 'hora', 'duracion_minutos', 'hora_fin_estimada', 'muelle_id']
+CAMPOS_ITEM = ['id', 'registro_id', 'producto_id', 'palets_completos', 'unidades_sueltas', 'palets_equivalentes']
+
+
+def dias_pendientes(corte):
+    """Días cerrados y sin archivar con fecha anterior a ``corte``."""
+    return CierreDia.objects.filter(fecha__lt=corte, estado='cerrado', archivado=False).order_by('fecha')
+
+
+def archivar_dia(cierre):
+    """Mueve los registros de un día cerrado a las tablas de archivo. Devuelve cuántos."""
+    with transaction.atomic():
+        cierre = CierreDia.objects.select_for_update().get(pk=cierre.pk)
+        if cierre.estado != 'cerrado' or cierre.archivado:
+            return 0
+        registros = RegistroDescargue.objects.filter(cierre=cierre)
+        items = ItemDescargue.objects.filter(registro__cierre=cierre)
+        archivados = RegistroArchivado.objects.bulk_create(
+            [RegistroArchivado(**v) for v in registros.values(*CAMPOS_REGISTRO)])
+        ItemArchivado.objects.bulk_create([ItemArchivado(**v) for v in items.values(*CAMPOS_ITEM)])
+        items.delete()
+        registros.delete()
+        cierre.cambios.all().delete()
+        cierre.archivado = True
+        cierre.save(update_fields=['archivado'])
+    return len(archivados)
+
+
+def archivar(corte):
+    """Archiva cada día cerrado anterior a ``corte``, uno por transacción. Devuelve (días, registros)."""
+    dias = registros = 0
+    for cierre in dias_pendientes(corte):
+        registros += archivar_dia(cierre)
+        dias += 1
+    return dias, registros
@@ -0,0 +1,190 @@
+"""Caché de los catálogos de empresas y productos.
+
+Los listados se guardan ya serializados en la caché de Django bajo una
+versión de catálogo guardada en la base (``Aplicaciones.Eventos.versiones``).
+Cualquier alta, cambio o baja (vistas, admin) cambia la versión en su misma
+transacción, así que todos los workers la ven al confirmarse, y con ella el
+ETag: los navegadores revalidan y reciben 304 mientras el catálogo no
+cambie. Las escrituras masivas que no emiten señales (``bulk_create``,
+``update``) deben llamar a ``invalidar``.
+
+Para autocompletar, cada proceso arma un ``IndiceNombres`` por versión:
+búsqueda sin tildes ni mayúsculas, por prefijo, palabra y trigramas, sin
+tocar la base de datos en cada tecla. El uso reciente que desempata se toma
+de los resúmenes diarios al armar el índice.
+"""
+import json
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from Aplicaciones.Eventos import versiones
+
+from .models import Empresa, Producto, ResumenEmpresaDia, ResumenProductoDia
+
+DURACION = getattr(settings, 'CATALOGO_CACHE_SEGUNDOS', 300)
+CLAVE_VERSION = 'catalogos:version'
+DIAS_USO = 30
+
+_indices = {}  # nombre -> (versión, IndiceNombres) de este proceso
+
+
+def version():
+    return versiones.actual(CLAVE_VERSION)
+
+
+def invalidar():
+    """Cambia la versión en la transacción en curso; los workers la ven al confirmarse."""
+    versiones.cambiar(CLAVE_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Empresa)
+@receiver([post_save, post_delete], sender=Producto)
+def _catalogo_modificado(sender, **kwargs):
+    invalidar()
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con espacios simples: ``'Ñandú  S.A.'`` → ``'nandu s.a.'``."""
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ' '.join(''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold().split())
+
+
+class IndiceNombres:
+    """Índice en memoria para autocompletar por nombre.
+
+    Ordena primero los nombres que empiezan por la búsqueda, luego los que
+    tienen una palabra que empieza por ella y al final los que la contienen
+    (por trigramas); dentro de cada grupo, los más usados últimamente.
+    """
+
+    def __init__(self, filas):
+        # filas: (id, nombre, uso, datos serializables)
+        self.datos = {pk: datos for pk, _, _, datos in filas}
+        self.claves = {pk: normalizar(nombre) for pk, nombre, _, _ in filas}
+        self.uso = {pk: uso for pk, _, uso, _ in filas}
+        self.por_uso = sorted(self.claves, key=self._orden)
+        self.completos = sorted((clave, pk) for pk, clave in self.claves.items())
+        self.palabras = sorted({(palabra, pk) for pk, clave in self.claves.items() for palabra in clave.split()})
+        self.trigramas = defaultdict(set)
+        for pk, clave in self.claves.items():
+            for i in range(len(clave) - 2):
+                self.trigramas[clave[i:i + 3]].add(pk)
+
+    def _orden(self, pk):
+        return (-self.uso[pk], self.claves[pk], pk)
+
+    @staticmethod
+    def _con_prefijo(ordenados, q):
+        encontrados = set()
+        for i in range(bisect_left(ordenados, (q,)), len(ordenados)):
+            clave, pk = ordenados[i]
+            if not clave.startswith(q):
+                break
+            encontrados.add(pk)
+        return encontrados
+
+    def _contienen(self, q):
+        if len(q) < 3:
+            return {pk for pk, clave in self.claves.items() if q in clave}
+        grupos = sorted((self.trigramas.get(q[i:i + 3], set()) for i in range(len(q) - 2)), key=len)
+        return {pk for pk in set.intersection(*grupos) if q in self.claves[pk]}
+
+    def buscar(self, q, limite):
+        """Datos de hasta ``limite`` coincidencias de ``q``, de más a menos relevantes."""
+        q = normalizar(q)
+        if not q:
+            return [self.datos[pk] for pk in self.por_uso[:limite]]
+        resultado, vistos = [], set()
+        for buscar_grupo in (lambda: self._con_prefijo(self.completos, q),
+                             lambda: self._con_prefijo(self.palabras, q),
+                             lambda: self._contienen(q)):
+            grupo = buscar_grupo() - vistos
+            resultado += sorted(grupo, key=self._orden)
+            vistos |= grupo
+            if len(resultado) >= limite:
+                break
+        return [self.datos[pk] for pk in resultado[:limite]]
+
+
+def _en_cache(clave, construir):
+    datos = cache.get(clave)
+    if datos is None:
+        datos = construir()
+        cache.set(clave, datos, DURACION)
+    return datos
+
+
+def _obtener(nombre, construir):
+    actual = version()
+    return actual, _en_cache(f'catalogos:{nombre}:{actual}', construir)
+
+
+def _usos(modelo, campo):
+    """Camiones por empresa/producto en los últimos ``DIAS_USO`` días, desde los resúmenes."""
+    desde = timezone.localdate() - timedelta(days=DIAS_USO)
+    return dict(modelo.objects.filter(cierre__fecha__gte=desde).values_list(campo)
+                .annotate(n=Sum('camiones')).values_list(campo, 'n'))
+
+
+def _filas_empresas():
+    usos = _usos(ResumenEmpresaDia, 'empresa')
+    return [(pk, nombre, usos.get(pk, 0), {'id': pk, 'nombre': nombre})
+            for pk, nombre in Empresa.objects.filter(activo=True).values_list('id', 'nombre')]
+
+
+def _filas_productos():
+    usos = _usos(ResumenProductoDia, 'producto')
+    return [(p.id, p.nombre, usos.get(p.id, 0), {
+        'id': p.id, 'nombre': p.nombre,
+        'upc': p.unidades_por_capa, 'cpp': p.capas_por_palet,
+        'unidades_palet': p.unidades_palet_completo,
+    }) for p in Producto.objects.filter(activo=True)]
+
+
+def _indice(nombre, construir_filas):
+    # Las filas se comparten por la caché; el índice se arma una vez por versión y proceso
+    actual, filas = _obtener(nombre, construir_filas)
+    memo = _indices.get(nombre)
+    if memo is None or memo[0] != actual:
+        memo = _indices[nombre] = (actual, IndiceNombres(filas))
+    return memo
+
+
+def empresas():
+    """(versión, índice) de las empresas activas."""
+    return _indice('empresas', _filas_empresas)
+
+
+def productos():
+    """(versión, índice) de los productos activos."""
+    return _indice('productos', _filas_productos)
+
+
+def productos_json():
+    """(versión, JSON de ``lista_productos``), ordenado por uso reciente."""
+    actual, indice = productos()
+    return actual, _en_cache(f'catalogos:productos_json:{actual}',
+                             lambda: json.dumps({'productos': indice.buscar('', len(indice.datos))}))
+
+
+def respuesta(request, nombre, actual, cuerpo):
+    """JSON con ETag de la versión; 304 sin construir el cuerpo si el cliente ya la tiene."""
+    etag = quote_etag(f'{nombre}-{actual}')
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(cuerpo(), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,172 @@
+"""Importación masiva del catálogo de productos (XLSX, CSV o JSON).
+
+Los productos se buscan por nombre sin distinguir mayúsculas contra el
+catálogo entero, leído en una sola consulta. Los nuevos entran con un
+``bulk_create`` y los cambios con un ``bulk_update``, todo en una
+transacción. Si cambia la geometría (unidades por capa, capas por palet),
+los ítems con unidades sueltas de esos productos en días abiertos se
+recalculan en bloque (``Producto.recalcular_items_de``). Los días cerrados
+quedan congelados: su detalle, su PDF y su total siguen con la geometría del
+cierre y se ponen al día si se reabren. El informe dice, por producto, qué
+días cerrados quedan con la geometría anterior.
+
+En un producto existente, las celdas vacías conservan el valor actual.
+``bulk_create``/``bulk_update`` no emiten señales: al final se invalida la
+caché de catálogos.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from Recuperadora import planillas
+from Recuperadora.planillas import ArchivoInvalido  # noqa: F401
+
+from . import catalogos
+from .models import ItemDescargue, Producto
+
+CAMPOS = ['nombre', 'categoria', 'unidades_por_capa', 'capas_por_palet', 'activo']
+GEOMETRIA = ['unidades_por_capa', 'capas_por_palet']
+ENCABEZADOS = {
+    'nombre': 'nombre', 'producto': 'nombre', 'descripcion': 'nombre',
+    'categoria': 'categoria',
+    'unidades por capa': 'unidades_por_capa', 'upc': 'unidades_por_capa',
+    'capas por palet': 'capas_por_palet', 'cpp': 'capas_por_palet',
+    'activo': 'activo', 'estado': 'activo',
+}
+# Clave o etiqueta sin emoji ("Papel / Higiene") -> clave.
+CATEGORIAS = {planillas.normalizar(k): k for k, _ in Producto.CATEGORIA_CHOICES}
+CATEGORIAS.update({planillas.normalizar(etiqueta.split(' ', 1)[1]): k for k, etiqueta in Producto.CATEGORIA_CHOICES})
+NUEVO = {'categoria': 'otros', 'unidades_por_capa': 8, 'capas_por_palet': 8}  # como agregar_producto
+
+
+def leer(archivo, nombre):
+    """Genera ``(número de fila, {campo: valor})`` de la planilla de productos."""
+    return planillas.leer(archivo, nombre, ENCABEZADOS, ['nombre'])
+
+
+def desde_json(productos):
+    """Como ``leer``, para una lista de objetos JSON; las filas se numeran desde 1."""
+    if not isinstance(productos, list):
+        raise ArchivoInvalido('Envíe una lista de productos.')
+    for numero, producto in enumerate(productos, start=1):
+        if not isinstance(producto, dict):
+            yield numero, {}
+            continue
+        yield numero, {ENCABEZADOS[planillas.normalizar(k)]: v for k, v in producto.items()
+                       if planillas.normalizar(k) in ENCABEZADOS}
+
+
+def _entero_positivo(valor):
+    valor = planillas.texto(valor)
+    if not valor.isdigit() or int(valor) < 1:
+        raise ValueError
+    return int(valor)
+
+
+def validar(fila):
+    """Convierte una fila leída a valores de Producto. Devuelve ``(datos, errores)``."""
+    datos, errores = {}, []
+    nombre = ' '.join(planillas.texto(fila.get('nombre')).split())
+    if not nombre:
+        errores.append('nombre: obligatorio')
+    elif len(nombre) > 150:
+        errores.append('nombre: máximo 150 caracteres')
+    datos['nombre'] = nombre
+
+    categoria = planillas.texto(fila.get('categoria'))
+    if categoria:
+        if planillas.normalizar(categoria) in CATEGORIAS:
+            datos['categoria'] = CATEGORIAS[planillas.normalizar(categoria)]
+        else:
+            errores.append(f'categoria: "{categoria}" no existe')
+    for campo in GEOMETRIA:
+        if planillas.texto(fila.get(campo)):
+            try:
+                datos[campo] = _entero_positivo(fila[campo])
+            except ValueError:
+                errores.append(f'{campo}: debe ser un entero mayor que 0')
+    try:
+        activo = planillas.booleano(fila.get('activo'))
+        if activo is not None:
+            datos['activo'] = activo
+    except ValueError:
+        errores.append('activo: use sí o no')
+    return datos, errores
+
+
+def _dias_cerrados(ids):
+    """``{producto_id: [fechas]}`` de los días cerrados que conservan la geometría anterior."""
+    dias = defaultdict(list)
+    for producto_id, fecha in (ItemDescargue.objects
+                               .filter(producto_id__in=ids, unidades_sueltas__gt=0,
+                                       registro__cierre__estado='cerrado')
+                               .values_list('producto_id', 'registro__cierre__fecha')
+                               .distinct().order_by('producto_id', 'registro__cierre__fecha')):
+        dias[producto_id].append(fecha.isoformat())
+    return dias
+
+
+def importar(filas, simular=False):
+    """Crea o actualiza por nombre los productos de ``filas`` (ver ``leer`` y ``desde_json``).
+
+    Devuelve el informe ``[{'fila', 'nombre', 'estado', 'errores'}]`` con
+    estado ``creado``, ``actualizado``, ``sin_cambios`` o ``error``; los
+    productos con geometría nueva traen además ``dias_cerrados``. Con
+    ``simular`` valida y clasifica sin escribir.
+    """
+    with transaction.atomic():
+        catalogo = {}
+        for producto in Producto.objects.order_by('-id'):
+            catalogo[producto.nombre.lower()] = producto  # con nombres repetidos queda el más antiguo
+
+        informe, nuevos, cambiados, geometria, primeras = [], [], [], {}, {}
+        for numero, fila in filas:
+            datos, errores = validar(fila)
+            clave = datos['nombre'].lower()
+            if clave in primeras:
+                errores.append(f'nombre: repetido (fila {primeras[clave]})')
+            entrada = {'fila': numero, 'nombre': datos['nombre'], 'estado': 'error', 'errores': errores}
+            informe.append(entrada)
+            if errores:
+                continue
+            primeras[clave] = numero  # solo las filas válidas reservan el nombre
+
+            producto = catalogo.get(clave)
+            if producto is None:
+                nuevos.append(Producto(**{**NUEVO, **datos}))
+                entrada['estado'] = 'creado'
+                continue
+            datos.pop('nombre')  # se conserva el nombre registrado
+            if all(getattr(producto, c) == v for c, v in datos.items()):
+                entrada['estado'] = 'sin_cambios'
+                continue
+            if any(getattr(producto, c) != datos.get(c, getattr(producto, c)) for c in GEOMETRIA):
+                geometria[producto.pk] = entrada
+            for campo, valor in datos.items():
+                setattr(producto, campo, valor)
+            cambiados.append(producto)
+            entrada['estado'] = 'actualizado'
+
+        afectados = _dias_cerrados(list(geometria))
+        for pk, entrada in geometria.items():
+            entrada['dias_cerrados'] = afectados.get(pk, [])
+
+        if not simular:
+            Producto.objects.bulk_create(nuevos, batch_size=500)
+            Producto.objects.bulk_update(cambiados, CAMPOS[1:], batch_size=500)
+            if geometria:
+                Producto.recalcular_items_de(list(geometria))
+            if nuevos or cambiados:
+                catalogos.invalidar()
+    return informe
+
+
+def resumen(informe):
+    """Cuántas filas quedaron en cada estado y cuántos días cerrados cambian."""
+    totales = dict.fromkeys(['creado', 'actualizado', 'sin_cambios', 'error'], 0)
+    dias = set()
+    for fila in informe:
+        totales[fila['estado']] += 1
+        dias.update(fila.get('dias_cerrados', []))
+    totales['dias_cerrados'] = len(dias)
+    return totales
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from Aplicaciones.Descargue import analitica
+
+
+class Command(BaseCommand):
+    help = 'Guarda los totales de los meses terminados con todos sus días cerrados (analítica de descargue).'
+
+    def handle(self, *args, **options):
+        meses = analitica.consolidar_pendientes()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(meses)} mes(es) consolidados{': ' + ', '.join(f'{m:%Y-%m}' for m in meses) if meses else '.'}"))
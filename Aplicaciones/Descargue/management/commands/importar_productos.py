@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Aplicaciones.Descargue import importacion
+
+
+class Command(BaseCommand):
+    help = 'Crea o actualiza por nombre los productos de un catálogo XLSX o CSV de proveedor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .xlsx o .csv (primera fila: encabezados).')
+        parser.add_argument('--simular', action='store_true', help='Solo valida e informa, sin guardar.')
+
+    def handle(self, *args, **o):
+        try:
+            with open(o['archivo'], 'rb') as archivo:
+                informe = importacion.importar(importacion.leer(archivo, o['archivo']), simular=o['simular'])
+        except OSError as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+        except importacion.ArchivoInvalido as e:
+            raise CommandError(str(e))
+
+        for fila in informe:
+            if fila['errores']:
+                self.stderr.write(f"Fila {fila['fila']} ({fila['nombre'] or 'sin nombre'}): {'; '.join(fila['errores'])}")
+            elif fila.get('dias_cerrados'):
+                self.stdout.write(f"{fila['nombre']}: {len(fila['dias_cerrados'])} día(s) cerrado(s) con la geometría anterior "
+                                  f"({', '.join(fila['dias_cerrados'][:5])}{'...' if len(fila['dias_cerrados']) > 5 else ''})")
+        totales = importacion.resumen(informe)
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Simulación: ' if o['simular'] else ''}{totales['creado']} creado(s), "
+            f"{totales['actualizado']} actualizado(s), {totales['sin_cambios']} sin cambios, "
+            f"{totales['error']} con errores; {totales['dias_cerrados']} día(s) cerrado(s) con la geometría anterior."))
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Aplicaciones.Descargue import resumenes
+from Aplicaciones.Descargue.models import CierreDia
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes diarios por empresa/producto o verifica si difieren de los registros.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Solo este día (AAAA-MM-DD).')
+        parser.add_argument('--verificar', action='store_true',
+                            help='No escribe nada; informa las diferencias y termina con error si las hay.')
+
+    def handle(self, *args, **options):
+        cierres = CierreDia.objects.order_by('fecha')
+        if options['fecha']:
+            try:
+                cierres = cierres.filter(fecha=date.fromisoformat(options['fecha']))
+            except ValueError:
+                raise CommandError('Fecha inválida, use AAAA-MM-DD.')
+
+        if options['verificar']:
+            total = 0
+            for cierre in cierres:
+                for tipo, clave, esperado, guardado in resumenes.verificar(cierre):
+                    total += 1
+                    self.stdout.write(f'{cierre.fecha} {tipo}={clave}: esperado {esperado}, guardado {guardado}')
+            if total:
+                raise CommandError(f'{total} diferencia(s) encontradas.')
+            self.stdout.write(self.style.SUCCESS('Resúmenes consistentes.'))
+            return
+
+        n = 0
+        for cierre in cierres:
+            resumenes.reconstruir(cierre)
+            n += 1
+        self.stdout.write(self.style.SUCCESS(f'{n} día(s) reconstruidos.'))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:28
+
+from django.db import migrations, models
+
+
+def calcular_palets_equivalentes(apps, schema_editor):
+    ItemDescargue = apps.get_model('Descargue', 'ItemDescargue')
+    items = list(ItemDescargue.objects.select_related('producto'))
+    for item in items:
+        total = float(item.palets_completos)
+        upc = item.producto.unidades_por_capa * item.producto.capas_por_palet
+        if item.unidades_sueltas > 0 and upc > 0:
+            total += round(item.unidades_sueltas / upc, 4)
+        item.palets_equivalentes = round(total, 4)
+    ItemDescargue.objects.bulk_update(items, ['palets_equivalentes'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descargue', '0002_empresa_itemdescargue_alter_producto_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemdescargue',
+            name='palets_equivalentes',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(calcular_palets_equivalentes, migrations.RunPython.noop),
+    ]
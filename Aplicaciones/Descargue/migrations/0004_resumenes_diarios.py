@@ -0,0 +1,69 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def poblar_resumenes(apps, schema_editor):
+    RegistroDescargue = apps.get_model('Descargue', 'RegistroDescargue')
+    ItemDescargue = apps.get_model('Descargue', 'ItemDescargue')
+    ResumenEmpresaDia = apps.get_model('Descargue', 'ResumenEmpresaDia')
+    ResumenProductoDia = apps.get_model('Descargue', 'ResumenProductoDia')
+    ResumenEmpresaDia.objects.bulk_create([
+        ResumenEmpresaDia(cierre_id=f['cierre'], empresa_id=f['empresa'], palets=round(f['palets'] or 0, 4),
+                          camiones=f['camiones'], items=f['n_items'])
+        for f in (RegistroDescargue.objects.values('cierre', 'empresa')
+                  .annotate(palets=Sum('items__palets_equivalentes'),
+                            camiones=Count('id', distinct=True), n_items=Count('items')))
+    ])
+    ResumenProductoDia.objects.bulk_create([
+        ResumenProductoDia(cierre_id=f['registro__cierre'], producto_id=f['producto'], palets=round(f['palets'] or 0, 4),
+                           camiones=f['camiones'], items=f['n_items'])
+        for f in (ItemDescargue.objects.values('registro__cierre', 'producto')
+                  .annotate(palets=Sum('palets_equivalentes'),
+                            camiones=Count('registro', distinct=True), n_items=Count('id')))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descargue', '0003_itemdescargue_palets_equivalentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenProductoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palets', models.FloatField(default=0)),
+                ('camiones', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('cierre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_productos', to='Descargue.cierredia')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_dia', to='Descargue.producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen por Producto',
+                'verbose_name_plural': 'Resúmenes por Producto',
+                'unique_together': {('cierre', 'producto')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenEmpresaDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palets', models.FloatField(default=0)),
+                ('camiones', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('cierre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_empresas', to='Descargue.cierredia')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumenes_dia', to='Descargue.empresa')),
+            ],
+            options={
+                'verbose_name': 'Resumen por Empresa',
+                'verbose_name_plural': 'Resúmenes por Empresa',
+                'unique_together': {('cierre', 'empresa')},
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
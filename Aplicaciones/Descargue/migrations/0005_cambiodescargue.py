@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descargue', '0004_resumenes_diarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioDescargue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registro_id', models.PositiveBigIntegerField()),
+                ('tipo', models.CharField(choices=[('alta', 'Alta'), ('baja', 'Baja')], max_length=4)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('cierre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios', to='Descargue.cierredia')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Descargue',
+                'verbose_name_plural': 'Cambios de Descargue',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['cierre', 'id'], name='cambio_cierre_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.23 on 2026-10-17 18:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descargue', '0005_cambiodescargue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cierredia',
+            name='archivado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='RegistroArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chofer_nombre', models.CharField(default='', max_length=100)),
+                ('chofer_telefono', models.CharField(default='', max_length=20)),
+                ('placa', models.CharField(blank=True, max_length=20)),
+                ('tipo', models.CharField(choices=[('completo', 'Completo'), ('incompleto', 'Incompleto'), ('especial', 'Especial')], default='completo', max_length=12)),
+                ('observacion', models.CharField(blank=True, max_length=200)),
+                ('hora', models.DateTimeField()),
+                ('duracion_minutos', models.PositiveIntegerField(default=30)),
+                ('hora_fin_estimada', models.DateTimeField(blank=True, null=True)),
+                ('cierre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registros_archivados', to='Descargue.cierredia')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Descargue.empresa')),
+            ],
+            options={
+                'verbose_name': 'Registro Archivado',
+                'verbose_name_plural': 'Registros Archivados',
+                'ordering': ['-hora'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palets_completos', models.PositiveIntegerField(default=0)),
+                ('unidades_sueltas', models.PositiveIntegerField(default=0)),
+                ('palets_equivalentes', models.FloatField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items_archivados', to='Descargue.producto')),
+                ('registro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='Descargue.registroarchivado')),
+            ],
+            options={
+                'verbose_name': 'Ítem Archivado',
+                'verbose_name_plural': 'Ítems Archivados',
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.23 on 2026-10-17 19:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descargue', '0006_registros_archivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MesConsolidado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(unique=True)),
+                ('generado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Mes Consolidado',
+                'verbose_name_plural': 'Meses Consolidados',
+                'ordering': ['-mes'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenProductoMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palets', models.FloatField(default=0)),
+                ('camiones', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('mes', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_productos', to='Descargue.mesconsolidado')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mes', to='Descargue.producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual por Producto',
+                'verbose_name_plural': 'Resúmenes Mensuales por Producto',
+                'unique_together': {('mes', 'producto')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenEmpresaMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palets', models.FloatField(default=0)),
+                ('camiones', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumenes_mes', to='Descargue.empresa')),
+                ('mes', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_empresas', to='Descargue.mesconsolidado')),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual por Empresa',
+                'verbose_name_plural': 'Resúmenes Mensuales por Empresa',
+                'unique_together': {('mes', 'empresa')},
+            },
+        ),
+    ]
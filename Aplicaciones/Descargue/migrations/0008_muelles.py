@@ -0,0 +1,51 @@
+# Generated by Django 4.2.23 on 2026-10-17 19:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Descargue', '0007_resumenes_mensuales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Muelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('activo', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Muelles',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='registroarchivado',
+            name='muelle',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Descargue.muelle'),
+        ),
+        migrations.AddField(
+            model_name='registrodescargue',
+            name='muelle',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='registros', to='Descargue.muelle'),
+        ),
+        migrations.CreateModel(
+            name='OcupacionMuelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField()),
+                ('muelle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupaciones', to='Descargue.muelle')),
+                ('registro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion', to='Descargue.registrodescargue')),
+            ],
+            options={
+                'verbose_name': 'Ocupación de Muelle',
+                'verbose_name_plural': 'Ocupaciones de Muelle',
+                'indexes': [models.Index(fields=['inicio', 'fin', 'muelle'], name='ocupacion_intervalo_idx')],
+            },
+        ),
+    ]
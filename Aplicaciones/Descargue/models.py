@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
 from django.utils import timezone
 
 
@@ -35,6 +37,40 @@ class Producto(models.Model):
     def unidades_palet_completo(self):
         return self.unidades_por_capa * self.capas_por_palet
 
+    def save(self, *args, **kwargs):
+        geometria_anterior = None
+        if self.pk:
+            geometria_anterior = (Producto.objects.filter(pk=self.pk)
+                                  .values_list('unidades_por_capa', 'capas_por_palet').first())
+        super().save(*args, **kwargs)
+        if geometria_anterior and geometria_anterior != (self.unidades_por_capa, self.capas_por_palet):
+            Producto.recalcular_items_de([self.pk])
+
+    @staticmethod
+    def recalcular_items_de(ids):
+        """Recalcula los ítems de los productos ``ids`` tras un cambio de geometría."""
+        return Producto.actualizar_items(ItemDescargue.objects.filter(producto_id__in=ids))
+
+    @staticmethod
+    def actualizar_items(items):
+        """Recalcula ``items`` con la geometría actual de sus productos, en una consulta.
+
+        Solo cambian los ítems con unidades sueltas y de días abiertos (los
+        cerrados quedan congelados); después se reconstruyen juntos los
+        resúmenes de los días afectados.
+        """
+        upc = Subquery(Producto.objects.filter(pk=OuterRef('producto_id'))
+                       .values(upc=Cast(F('unidades_por_capa') * F('capas_por_palet'), FloatField())))
+        # Mismo redondeo que ``ItemDescargue.calcular_palets_equivalentes``
+        sueltas = Round(Cast(F('unidades_sueltas'), FloatField()) / NullIf(upc, 0.0), 4)
+        valor = Round(Cast(F('palets_completos'), FloatField()) + Coalesce(sueltas, 0.0), 4)
+        items = items.filter(unidades_sueltas__gt=0).exclude(registro__cierre__estado='cerrado')
+        actualizados = items.exclude(palets_equivalentes=valor).update(palets_equivalentes=valor)
+        if actualizados:
+            from . import resumenes
+            resumenes.reconstruir_dias(CierreDia.objects.filter(registros__items__in=items).distinct())
+        return actualizados
+
     def __str__(self):
         return self.nombre
 
@@ -51,14 +87,23 @@ class CierreDia(models.Model):
     hora_cierre   = models.DateTimeField(null=True, blank=True)
     total_palets  = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     observaciones = models.TextField(blank=True)
+    archivado     = models.BooleanField(default=False, editable=False)  # registros en RegistroArchivado
+
+    def modelos_registro(self):
+        """``(registro, ítem)``: los modelos donde están los registros del día."""
+        if self.archivado:
+            return RegistroArchivado, ItemArchivado
+        return RegistroDescargue, ItemDescargue
+
+    def palets_del_dia(self):
+        """Suma en SQL los palets equivalentes de todos los ítems del día."""
+        _, Item = self.modelos_registro()
+        return (Item.objects
+                .filter(registro__cierre=self)
+                .aggregate(total=Coalesce(Sum('palets_equivalentes'), 0.0))['total'])
 
     def recalcular(self):
-        total = sum(
-            item.palets_equivalentes
-            for reg in self.registros.all()
-            for item in reg.items.all()
-        )
-        self.total_palets = round(total, 2)
+        self.total_palets = round(self.palets_del_dia(), 2)
         self.save(update_fields=['total_palets'])
 
     def __str__(self):
@@ -70,6 +115,19 @@ class CierreDia(models.Model):
         ordering = ['-fecha']
 
 
+class Muelle(models.Model):
+    """Muelle o bahía de descarga donde se asigna cada camión."""
+    nombre = models.CharField(max_length=50, unique=True)
+    activo = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name_plural = "Muelles"
+        ordering = ['nombre']
+
+
 class RegistroDescargue(models.Model):
     """Un registro = llegada de UN camión/chofer con uno o varios productos."""
     TIPO_CHOICES = [
@@ -87,16 +145,32 @@ class RegistroDescargue(models.Model):
     hora              = models.DateTimeField(default=timezone.now)
     duracion_minutos  = models.PositiveIntegerField(default=30)
     hora_fin_estimada = models.DateTimeField(null=True, blank=True)
+    muelle            = models.ForeignKey(Muelle, on_delete=models.SET_NULL, null=True, blank=True, related_name='registros')
 
     @property
     def total_palets(self):
+        # Si la consulta ya trae el total agregado en SQL (ver con_total_palets), se usa ese.
+        if hasattr(self, 'palets_total'):
+            return round(self.palets_total or 0, 4)
         return round(sum(i.palets_equivalentes for i in self.items.all()), 4)
 
-    def save(self, *args, **kwargs):
+    @staticmethod
+    def con_total_palets(queryset):
+        """Anota cada registro con la suma SQL de sus palets equivalentes."""
+        return queryset.annotate(palets_total=Sum('items__palets_equivalentes'))
+
+    def calcular_hora_fin(self):
         if self.duracion_minutos and self.hora:
             from datetime import timedelta
             self.hora_fin_estimada = self.hora + timedelta(minutes=self.duracion_minutos)
+
+    def save(self, *args, **kwargs):
+        self.calcular_hora_fin()
+        nuevo = self._state.adding
         super().save(*args, **kwargs)
+        if self.muelle_id or not nuevo:
+            from . import ocupacion
+            ocupacion.sincronizar(self)
 
     def __str__(self):
         emp = self.empresa.nombre if self.empresa else '—'
@@ -114,18 +188,184 @@ class ItemDescargue(models.Model):
     producto         = models.ForeignKey(Producto, on_delete=models.CASCADE)
     palets_completos = models.PositiveIntegerField(default=0)
     unidades_sueltas = models.PositiveIntegerField(default=0)
+    # Se guarda al escribir el ítem y se refresca cuando cambia la geometría del
+    # producto, para poder sumar totales en la base de datos.
+    palets_equivalentes = models.FloatField(default=0, editable=False)
 
-    @property
-    def palets_equivalentes(self):
+    def calcular_palets_equivalentes(self):
         total = float(self.palets_completos)
         upc = self.producto.unidades_palet_completo
         if self.unidades_sueltas > 0 and upc > 0:
             total += round(self.unidades_sueltas / upc, 4)
-        return round(total, 4)
+        self.palets_equivalentes = round(total, 4)
+        return self.palets_equivalentes
+
+    def save(self, *args, **kwargs):
+        self.calcular_palets_equivalentes()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'palets_equivalentes' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['palets_equivalentes']
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.producto.nombre} — {self.palets_equivalentes} pal"
 
     class Meta:
         verbose_name = "Ítem de Descargue"
-        verbose_name_plural = "Ítems de Descargue"
\ No newline at end of file
+        verbose_name_plural = "Ítems de Descargue"
+
+class OcupacionMuelle(models.Model):
+    """Intervalo [inicio, fin) en que un registro ocupa su muelle (ver ocupacion.py)."""
+    muelle   = models.ForeignKey(Muelle, on_delete=models.CASCADE, related_name='ocupaciones')
+    registro = models.OneToOneField(RegistroDescargue, on_delete=models.CASCADE, related_name='ocupacion')
+    inicio   = models.DateTimeField()
+    fin      = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.muelle} {self.inicio:%H:%M}-{self.fin:%H:%M}"
+
+    class Meta:
+        verbose_name = "Ocupación de Muelle"
+        verbose_name_plural = "Ocupaciones de Muelle"
+        indexes = [models.Index(fields=['inicio', 'fin', 'muelle'], name='ocupacion_intervalo_idx')]
+
+
+class CambioDescargue(models.Model):
+    """Bitácora de altas y bajas de registros; su id es el cursor del feed de cambios."""
+    TIPO_CHOICES = [('alta', 'Alta'), ('baja', 'Baja')]
+
+    cierre      = models.ForeignKey(CierreDia, on_delete=models.CASCADE, related_name='cambios')
+    registro_id = models.PositiveBigIntegerField()  # sin FK: la baja sobrevive al registro
+    tipo        = models.CharField(max_length=4, choices=TIPO_CHOICES)
+    fecha       = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def altas(cls, registros):
+        cls.objects.bulk_create([cls(cierre_id=r.cierre_id, registro_id=r.pk, tipo='alta') for r in registros])
+
+    @classmethod
+    def baja(cls, registro):
+        cls.objects.create(cierre_id=registro.cierre_id, registro_id=registro.pk, tipo='baja')
+
+    def __str__(self):
+        return f"#{self.id} {self.get_tipo_display()} registro {self.registro_id}"
+
+    class Meta:
+        verbose_name = "Cambio de Descargue"
+        verbose_name_plural = "Cambios de Descargue"
+        ordering = ['id']
+        indexes = [models.Index(fields=['cierre', 'id'], name='cambio_cierre_id_idx')]
+
+
+class ResumenEmpresaDia(models.Model):
+    """Totales precalculados de un día por empresa. Se mantienen en resumenes.py."""
+    cierre   = models.ForeignKey(CierreDia, on_delete=models.CASCADE, related_name='resumen_empresas')
+    empresa  = models.ForeignKey(Empresa, on_delete=models.SET_NULL, null=True, blank=True, related_name='resumenes_dia')
+    palets   = models.FloatField(default=0)
+    camiones = models.PositiveIntegerField(default=0)
+    items    = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        emp = self.empresa.nombre if self.empresa else '—'
+        return f"{self.cierre.fecha} | {emp} | {self.palets} pal"
+
+    class Meta:
+        verbose_name = "Resumen por Empresa"
+        verbose_name_plural = "Resúmenes por Empresa"
+        unique_together = ['cierre', 'empresa']
+
+
+class ResumenProductoDia(models.Model):
+    """Totales precalculados de un día por producto. Se mantienen en resumenes.py."""
+    cierre   = models.ForeignKey(CierreDia, on_delete=models.CASCADE, related_name='resumen_productos')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='resumenes_dia')
+    palets   = models.FloatField(default=0)
+    camiones = models.PositiveIntegerField(default=0)
+    items    = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.cierre.fecha} | {self.producto.nombre} | {self.palets} pal"
+
+    class Meta:
+        verbose_name = "Resumen por Producto"
+        verbose_name_plural = "Resúmenes por Producto"
+        unique_together = ['cierre', 'producto']
+
+
+class MesConsolidado(models.Model):
+    """Mes terminado con todos sus días cerrados cuyos totales ya se guardaron (ver analitica.py)."""
+    mes      = models.DateField(unique=True)  # primer día del mes
+    generado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m}"
+
+    class Meta:
+        verbose_name = "Mes Consolidado"
+        verbose_name_plural = "Meses Consolidados"
+        ordering = ['-mes']
+
+
+class ResumenEmpresaMes(models.Model):
+    """Totales inmutables de un mes consolidado por empresa."""
+    mes      = models.ForeignKey(MesConsolidado, on_delete=models.CASCADE, related_name='resumen_empresas')
+    empresa  = models.ForeignKey(Empresa, on_delete=models.SET_NULL, null=True, blank=True, related_name='resumenes_mes')
+    palets   = models.FloatField(default=0)
+    camiones = models.PositiveIntegerField(default=0)
+    items    = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumen Mensual por Empresa"
+        verbose_name_plural = "Resúmenes Mensuales por Empresa"
+        unique_together = ['mes', 'empresa']
+
+
+class ResumenProductoMes(models.Model):
+    """Totales inmutables de un mes consolidado por producto."""
+    mes      = models.ForeignKey(MesConsolidado, on_delete=models.CASCADE, related_name='resumen_productos')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='resumenes_mes')
+    palets   = models.FloatField(default=0)
+    camiones = models.PositiveIntegerField(default=0)
+    items    = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumen Mensual por Producto"
+        verbose_name_plural = "Resúmenes Mensuales por Producto"
+        unique_together = ['mes', 'producto']
+
+
+class RegistroArchivado(models.Model):
+    """Registro de un día cerrado archivado (ver archivo.py); conserva el id original."""
+    cierre            = models.ForeignKey(CierreDia, on_delete=models.CASCADE, related_name='registros_archivados')
+    empresa           = models.ForeignKey(Empresa, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    chofer_nombre     = models.CharField(max_length=100, default='')
+    chofer_telefono   = models.CharField(max_length=20, default='')
+    placa             = models.CharField(max_length=20, blank=True)
+    tipo              = models.CharField(max_length=12, choices=RegistroDescargue.TIPO_CHOICES, default='completo')
+    observacion       = models.CharField(max_length=200, blank=True)
+    hora              = models.DateTimeField()
+    duracion_minutos  = models.PositiveIntegerField(default=30)
+    hora_fin_estimada = models.DateTimeField(null=True, blank=True)
+    muelle            = models.ForeignKey(Muelle, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    total_palets = RegistroDescargue.total_palets
+    __str__ = RegistroDescargue.__str__
+
+    class Meta:
+        verbose_name = "Registro Archivado"
+        verbose_name_plural = "Registros Archivados"
+        ordering = ['-hora']
+
+
+class ItemArchivado(models.Model):
+    registro            = models.ForeignKey(RegistroArchivado, on_delete=models.CASCADE, related_name='items')
+    producto            = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='items_archivados')
+    palets_completos    = models.PositiveIntegerField(default=0)
+    unidades_sueltas    = models.PositiveIntegerField(default=0)
+    palets_equivalentes = models.FloatField(default=0)
+
+    __str__ = ItemDescargue.__str__
+
+    class Meta:
+        verbose_name = "Ítem Archivado"
+        verbose_name_plural = "Ítems Archivados"
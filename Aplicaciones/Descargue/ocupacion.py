@@ -0,0 +1,98 @@
+"""Ocupación de muelles por intervalos.
+
+Cada registro con muelle y hora fin estimada ocupa ``[hora, hora_fin)`` en
+``OcupacionMuelle``, una tabla angosta con índice por ``(inicio, fin,
+muelle)``. Como ninguna ocupación dura más de ``DURACION_MAXIMA``, lo que
+se cruza con ``[desde, hasta)`` empieza entre ``desde - DURACION_MAXIMA`` y
+``hasta``: un rango acotado del índice, sin recorrer el día entero.
+
+``disponibilidad`` dice qué muelles están libres en un intervalo y
+``primer_hueco`` busca el primer inicio con ``duracion`` libre en algún
+muelle, barriendo las ocupaciones de cada uno en orden. Al registrar,
+``solapes`` marca los camiones que se cruzan en el mismo muelle (es un
+aviso: el registro se guarda igual).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from .models import Muelle, OcupacionMuelle
+
+DURACION_MAXIMA = timedelta(hours=12)
+HORIZONTE = timedelta(hours=24)  # hasta dónde busca primer_hueco por defecto
+CAMPOS = ('muelle_id', 'registro_id', 'registro__placa', 'inicio', 'fin')
+
+
+def intervalo(registro):
+    """``(inicio, fin)`` que ocupa un registro; el fin se acota a ``DURACION_MAXIMA``."""
+    return registro.hora, min(registro.hora_fin_estimada, registro.hora + DURACION_MAXIMA)
+
+
+def _ocupacion(registro):
+    inicio, fin = intervalo(registro)
+    return OcupacionMuelle(muelle_id=registro.muelle_id, registro=registro, inicio=inicio, fin=fin)
+
+
+def ocupar(registros):
+    """Crea con una inserción la ocupación de los registros nuevos que tienen muelle."""
+    OcupacionMuelle.objects.bulk_create(
+        [_ocupacion(r) for r in registros if r.muelle_id and r.hora_fin_estimada])
+
+
+def sincronizar(registro):
+    """Alinea la ocupación de un registro guardado uno a uno (admin, shell)."""
+    if registro.muelle_id and registro.hora_fin_estimada:
+        o = _ocupacion(registro)
+        OcupacionMuelle.objects.update_or_create(
+            registro=registro, defaults={'muelle_id': o.muelle_id, 'inicio': o.inicio, 'fin': o.fin})
+    else:
+        OcupacionMuelle.objects.filter(registro=registro).delete()
+
+
+def _cruces(desde, hasta):
+    """Ocupaciones que se cruzan con ``[desde, hasta)``, ordenadas por inicio."""
+    return (OcupacionMuelle.objects
+            .filter(inicio__gte=desde - DURACION_MAXIMA, inicio__lt=hasta, fin__gt=desde)
+            .order_by('inicio')
+            .values(*CAMPOS))
+
+
+def disponibilidad(desde, hasta):
+    """``[(muelle, [ocupaciones])]`` de los muelles activos en ``[desde, hasta)``; libre si la lista está vacía."""
+    muelles = list(Muelle.objects.filter(activo=True))
+    por_muelle = defaultdict(list)
+    for o in _cruces(desde, hasta).filter(muelle__activo=True):
+        por_muelle[o['muelle_id']].append(o)
+    return [(m, por_muelle[m.pk]) for m in muelles]
+
+
+def primer_hueco(duracion, desde, hasta=None):
+    """``(muelle, inicio)`` más temprano desde ``desde`` con ``duracion`` libre, o None hasta ``hasta``."""
+    hasta = hasta or desde + HORIZONTE
+    mejor = None
+    for muelle, ocupaciones in disponibilidad(desde, hasta):
+        inicio = desde
+        for o in ocupaciones:
+            if o['inicio'] - inicio >= duracion:
+                break
+            inicio = max(inicio, o['fin'])
+        if inicio + duracion <= hasta and (mejor is None or inicio < mejor[1]):
+            mejor = (muelle, inicio)
+    return mejor
+
+
+def solapes(registros):
+    """``{registro_id: [ocupaciones]}`` de los registros que se cruzan con otros en su muelle."""
+    con_muelle = [r for r in registros if r.muelle_id and r.hora_fin_estimada]
+    if not con_muelle:
+        return {}
+    intervalos = {r.pk: intervalo(r) for r in con_muelle}
+    cruces = list(_cruces(min(i for i, _ in intervalos.values()), max(f for _, f in intervalos.values()))
+                  .filter(muelle_id__in={r.muelle_id for r in con_muelle}))
+    resultado = {}
+    for r in con_muelle:
+        inicio, fin = intervalos[r.pk]
+        propios = [o for o in cruces if o['muelle_id'] == r.muelle_id and o['registro_id'] != r.pk
+                   and o['inicio'] < fin and o['fin'] > inicio]
+        if propios:
+            resultado[r.pk] = propios
+    return resultado
@@ -0,0 +1,191 @@
+"""Contexto de los reportes de cierre y PDF/HTML inmutables de los días cerrados.
+
+Un día con ``estado == 'cerrado'`` no cambia, así que su PDF se genera una
+sola vez y se guarda en ``MEDIA_ROOT/cierres/``. El nombre del archivo lleva
+la fecha y la versión (marca de tiempo de ``hora_cierre``): si el día se
+reabre y se vuelve a cerrar, la versión cambia y el archivo anterior se borra.
+Con la misma versión se guardan en caché las páginas HTML del detalle del
+cierre y de las facturas de sus registros, y se responden GET condicionales.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import RegistroDescargue
+
+EMPRESA_NOMBRE = 'Recuperadora Logística Integral'
+CARPETA_PDF = 'cierres'
+DURACION_HTML = getattr(settings, 'CIERRE_HTML_CACHE_SEGUNDOS', 7 * 24 * 3600)
+
+
+def agrupar_por_empresa(cierre, registros):
+    subtotales = {}
+    for r in cierre.resumen_empresas.all():
+        key = r.empresa_id or 0
+        subtotales[key] = subtotales.get(key, 0) + r.palets
+    data = {}
+    for reg in registros:
+        key = reg.empresa_id or 0
+        if key not in data:
+            data[key] = {'empresa': reg.empresa, 'registros': [],
+                         'subtotal_palets': round(subtotales.get(key, 0), 2)}
+        data[key]['registros'].append(reg)
+    return list(data.values())
+
+
+def totales_dia(cierre):
+    """Totales del día leídos de los resúmenes precalculados."""
+    t = cierre.resumen_empresas.aggregate(
+        total_palets=Sum('palets'), total_camiones=Sum('camiones'), total_items=Sum('items'),
+        total_empresas=Count('id', filter=Q(camiones__gt=0)),
+    )
+    return {
+        'palets': round(t['total_palets'] or 0, 2),
+        'camiones': t['total_camiones'] or 0,
+        'items': t['total_items'] or 0,
+        'empresas': t['total_empresas'],
+    }
+
+
+def contexto_cierre(cierre):
+    """Contexto común de cierre_detalle.html y cierre_pdf.html (también de días archivados)."""
+    Registro, _ = cierre.modelos_registro()
+    registros = (RegistroDescargue.con_total_palets(Registro.objects.filter(cierre=cierre))
+                 .select_related('empresa')
+                 .prefetch_related('items__producto')
+                 .order_by('empresa__nombre', 'hora'))
+    totales = totales_dia(cierre)
+    return {
+        'cierre': cierre,
+        'empresas_data': agrupar_por_empresa(cierre, registros),
+        'empresa_nombre': EMPRESA_NOMBRE,
+        'total_registros': totales['camiones'],
+        'total_empresas': totales['empresas'],
+    }
+
+
+def version_cierre(cierre):
+    """Versión del contenido de un día cerrado; None si está abierto."""
+    if cierre.estado != 'cerrado' or not cierre.hora_cierre:
+        return None
+    return f"{cierre.fecha.isoformat()}-{int(cierre.hora_cierre.timestamp())}"
+
+
+# ── PDF ───────────────────────────────────────
+
+def ruta_pdf(cierre):
+    version = version_cierre(cierre)
+    if version is None:
+        return None
+    return os.path.join(settings.MEDIA_ROOT, CARPETA_PDF, f'descargue_{version}.pdf')
+
+
+def renderizar_pdf(cierre, contexto=None):
+    """Genera los bytes del PDF del cierre. Lanza ImportError sin xhtml2pdf."""
+    from xhtml2pdf import pisa
+    html = render_to_string('cierre_pdf.html', contexto or contexto_cierre(cierre))
+    result = BytesIO()
+    pisa.CreatePDF(BytesIO(html.encode('utf-8')), dest=result)
+    return result.getvalue()
+
+
+def guardar_pdf(cierre):
+    """Genera y guarda el PDF de un día cerrado si aún no existe. Devuelve la ruta."""
+    ruta = ruta_pdf(cierre)
+    if ruta is None:
+        raise ValueError('Solo se guardan PDF de días cerrados.')
+    if os.path.exists(ruta):
+        return ruta
+    contenido = renderizar_pdf(cierre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    # Escritura atómica: otro worker nunca ve un archivo a medio escribir.
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def invalidar_pdf(fecha):
+    """Borra todas las versiones guardadas del PDF de una fecha."""
+    carpeta = os.path.join(settings.MEDIA_ROOT, CARPETA_PDF)
+    prefijo = f'descargue_{fecha.isoformat()}-'
+    try:
+        nombres = os.listdir(carpeta)
+    except FileNotFoundError:
+        return
+    for nombre in nombres:
+        if nombre.startswith(prefijo):
+            try:
+                os.remove(os.path.join(carpeta, nombre))
+            except FileNotFoundError:
+                pass
+
+
+# ── HTML ──────────────────────────────────────
+
+def _clave_html(nombre, version):
+    return f'cierre_html:{nombre}:{version}'
+
+
+def nombre_pagina_cierre(cierre):
+    return f'cierre-{cierre.pk}'
+
+
+def nombre_pagina_factura(registro_id):
+    return f'factura-{registro_id}'
+
+
+def html_en_cache(nombre, version, plantilla, contexto):
+    """HTML de ``plantilla`` para una versión de día cerrado; se renderiza solo la primera vez."""
+    clave = _clave_html(nombre, version)
+    html = cache.get(clave)
+    if html is None:
+        html = render_to_string(plantilla, contexto())
+        cache.set(clave, html, DURACION_HTML)
+    return html
+
+
+def pagina(request, cierre, nombre, plantilla, contexto):
+    """Página de un día; si está cerrado, desde la caché y con ETag/Last-Modified.
+
+    ``contexto`` es una función: en un 304 o con la página en caché no se llama.
+    """
+    version = version_cierre(cierre)
+    if version is None:
+        return render(request, plantilla, contexto())
+    etag = quote_etag(f'{nombre}-{version}')
+    last_modified = int(cierre.hora_cierre.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(html_en_cache(nombre, version, plantilla, contexto))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
+
+
+def guardar_html_cierre(cierre):
+    """Deja en caché el detalle de un día recién cerrado."""
+    version = version_cierre(cierre)
+    if version is not None:
+        html_en_cache(nombre_pagina_cierre(cierre), version, 'cierre_detalle.html', lambda: contexto_cierre(cierre))
+
+
+def invalidar_html(cierre):
+    """Borra de la caché las páginas de la versión actual del día (detalle y facturas)."""
+    version = version_cierre(cierre)
+    if version is None:
+        return
+    Registro, _ = cierre.modelos_registro()
+    nombres = [nombre_pagina_cierre(cierre)] + [
+        nombre_pagina_factura(pk) for pk in Registro.objects.filter(cierre=cierre).values_list('id', flat=True)]
+    cache.delete_many([_clave_html(n, version) for n in nombres])
@@ -0,0 +1,186 @@
+"""Mantenimiento de los resúmenes diarios por empresa y por producto.
+
+Las vistas de registro/eliminación aplican deltas dentro de su propia
+transacción; ``reconstruir`` vuelve a derivar todo desde los ítems y
+``verificar`` compara ambos sin escribir.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Round
+
+from . import analitica
+from .models import ItemDescargue, RegistroDescargue, ResumenEmpresaDia, ResumenProductoDia
+
+
+def _acumular(modelo, filtro, palets, camiones, items):
+    actualizados = modelo.objects.filter(**filtro).update(
+        palets=Round(F('palets') + palets, 4),
+        camiones=F('camiones') + camiones,
+        items=F('items') + items,
+    )
+    if not actualizados and camiones > 0:
+        modelo.objects.create(**filtro, palets=round(palets, 4), camiones=camiones, items=items)
+
+
+def _acumular_lote(modelo, campo, deltas):
+    """Aplica ``{(cierre_id, clave): (palets, camiones, items)}`` con un número fijo de consultas."""
+    sin_clave = {k: d for k, d in deltas.items() if k[1] is None}
+    deltas = {k: d for k, d in deltas.items() if k[1] is not None}
+    # NULL no choca con la clave única, así que esas filas van una por una.
+    for (cierre_id, _), (palets, camiones, items) in sin_clave.items():
+        _acumular(modelo, {'cierre_id': cierre_id, campo: None}, palets, camiones, items)
+    if not deltas:
+        return
+
+    nuevas = [modelo(cierre_id=c, **{campo: k}) for (c, k), d in deltas.items() if d[1] > 0]
+    modelo.objects.bulk_create(nuevas, ignore_conflicts=True)
+    filas = modelo.objects.filter(cierre_id__in={c for c, _ in deltas},
+                                  **{f'{campo}__in': {k for _, k in deltas}})
+    cambiar = []
+    for fila in filas:
+        d = deltas.get((fila.cierre_id, getattr(fila, campo)))
+        if d is None:
+            continue
+        fila.palets = Round(F('palets') + d[0], 4)
+        fila.camiones = F('camiones') + d[1]
+        fila.items = F('items') + d[2]
+        cambiar.append(fila)
+    modelo.objects.bulk_update(cambiar, ['palets', 'camiones', 'items'])
+
+
+def _aplicar(pares, signo):
+    """Aplica los deltas de una lista de (registro, ítems) agrupados por clave."""
+    por_empresa = defaultdict(lambda: [0.0, 0, 0])
+    por_producto = defaultdict(lambda: [0.0, set(), 0])
+    for reg, items in pares:
+        acum = por_empresa[(reg.cierre_id, reg.empresa_id)]
+        acum[0] += sum(i.palets_equivalentes for i in items)
+        acum[1] += 1
+        acum[2] += len(items)
+        for i in items:
+            acum = por_producto[(reg.cierre_id, i.producto_id)]
+            acum[0] += i.palets_equivalentes
+            acum[1].add(reg.pk)
+            acum[2] += 1
+
+    _acumular_lote(ResumenEmpresaDia, 'empresa_id', {
+        k: (signo * p, signo * c, signo * n) for k, (p, c, n) in por_empresa.items()})
+    _acumular_lote(ResumenProductoDia, 'producto_id', {
+        k: (signo * p, signo * len(r), signo * n) for k, (p, r, n) in por_producto.items()})
+
+
+def sumar_registro(reg, items):
+    """Suma a los resúmenes un registro recién creado con sus ítems."""
+    _aplicar([(reg, items)], +1)
+
+
+def sumar_registros(pares):
+    """Como sumar_registro, para muchos registros: una actualización por clave."""
+    _aplicar(pares, +1)
+
+
+def descontar_registro(reg):
+    """Resta de los resúmenes un registro que se va a eliminar."""
+    _aplicar([(reg, list(reg.items.all()))], -1)
+
+
+def calcular(cierre):
+    """Deriva los resúmenes del día desde los registros, sin tocar las tablas.
+
+    Devuelve dos diccionarios ``{empresa_id: (palets, camiones, items)}`` y
+    ``{producto_id: (palets, camiones, items)}``.
+    """
+    Registro, Item = cierre.modelos_registro()
+    por_empresa = {
+        fila['empresa']: (round(fila['palets'] or 0, 4), fila['camiones'], fila['n_items'])
+        for fila in (Registro.objects
+                     .filter(cierre=cierre)
+                     .values('empresa')
+                     .annotate(palets=Sum('items__palets_equivalentes'),
+                               camiones=Count('id', distinct=True),
+                               n_items=Count('items')))
+    }
+    por_producto = {
+        fila['producto']: (round(fila['palets'] or 0, 4), fila['camiones'], fila['n_items'])
+        for fila in (Item.objects
+                     .filter(registro__cierre=cierre)
+                     .values('producto')
+                     .annotate(palets=Sum('palets_equivalentes'),
+                               camiones=Count('registro', distinct=True),
+                               n_items=Count('id')))
+    }
+    return por_empresa, por_producto
+
+
+def _guardados(cierre):
+    por_empresa = defaultdict(lambda: (0.0, 0, 0))
+    for r in cierre.resumen_empresas.all():
+        p, c, n = por_empresa[r.empresa_id]
+        por_empresa[r.empresa_id] = (round(p + r.palets, 4), c + r.camiones, n + r.items)
+    por_producto = {r.producto_id: (round(r.palets, 4), r.camiones, r.items)
+                    for r in cierre.resumen_productos.all()}
+    return dict(por_empresa), por_producto
+
+
+def reconstruir(cierre):
+    """Reemplaza los resúmenes del día por los derivados de los registros."""
+    por_empresa, por_producto = calcular(cierre)
+    with transaction.atomic():
+        cierre.resumen_empresas.all().delete()
+        cierre.resumen_productos.all().delete()
+        ResumenEmpresaDia.objects.bulk_create([
+            ResumenEmpresaDia(cierre=cierre, empresa_id=k, palets=p, camiones=c, items=n)
+            for k, (p, c, n) in por_empresa.items()
+        ])
+        ResumenProductoDia.objects.bulk_create([
+            ResumenProductoDia(cierre=cierre, producto_id=k, palets=p, camiones=c, items=n)
+            for k, (p, c, n) in por_producto.items()
+        ])
+        analitica.invalidar([cierre.fecha])
+
+
+def reconstruir_dias(cierres):
+    """Como ``reconstruir`` para varios días sin archivar, con un número fijo de consultas."""
+    cierres = list(cierres)
+    ids = [c.pk for c in cierres]
+    if not ids:
+        return
+    por_empresa = (RegistroDescargue.objects
+                   .filter(cierre_id__in=ids)
+                   .values_list('cierre_id', 'empresa')
+                   .annotate(Sum('items__palets_equivalentes'), Count('id', distinct=True), Count('items'))
+                   .order_by())
+    por_producto = (ItemDescargue.objects
+                    .filter(registro__cierre_id__in=ids)
+                    .values_list('registro__cierre_id', 'producto')
+                    .annotate(Sum('palets_equivalentes'), Count('registro', distinct=True), Count('id'))
+                    .order_by())
+    with transaction.atomic():
+        ResumenEmpresaDia.objects.filter(cierre_id__in=ids).delete()
+        ResumenProductoDia.objects.filter(cierre_id__in=ids).delete()
+        ResumenEmpresaDia.objects.bulk_create([
+            ResumenEmpresaDia(cierre_id=c, empresa_id=k, palets=round(p or 0, 4), camiones=n_c, items=n)
+            for c, k, p, n_c, n in por_empresa
+        ])
+        ResumenProductoDia.objects.bulk_create([
+            ResumenProductoDia(cierre_id=c, producto_id=k, palets=round(p or 0, 4), camiones=n_c, items=n)
+            for c, k, p, n_c, n in por_producto
+        ])
+        analitica.invalidar([c.fecha for c in cierres])
+
+
+def verificar(cierre, tolerancia=0.001):
+    """Lista las diferencias entre los resúmenes guardados y los derivados."""
+    esperado_emp, esperado_prod = calcular(cierre)
+    guardado_emp, guardado_prod = _guardados(cierre)
+    diferencias = []
+    for tipo, esperado, guardado in (('empresa', esperado_emp, guardado_emp),
+                                     ('producto', esperado_prod, guardado_prod)):
+        for clave in set(esperado) | set(guardado):
+            e = esperado.get(clave, (0.0, 0, 0))
+            g = guardado.get(clave, (0.0, 0, 0))
+            if abs(e[0] - g[0]) > tolerancia or e[1:] != g[1:]:
+                diferencias.append((tipo, clave, e, g))
+    return diferencias
@@ -0,0 +1,30 @@
+from datetime import date
+
+from Aplicaciones.Tareas.registro import tarea
+
+from . import analitica, reportes
+from .models import CierreDia
+
+
+@tarea('pdf_cierre')
+def pdf_cierre(fecha):
+    """Genera y guarda en disco el PDF de un día cerrado."""
+    cierre = CierreDia.objects.get(fecha=date.fromisoformat(fecha))
+    return {'archivo': reportes.guardar_pdf(cierre), 'fecha': fecha}
+
+
+@tarea('consolidar_analitica')
+def consolidar_analitica():
+    """Guarda los totales de los meses terminados y cerrados para la analítica."""
+    return {'meses': [m.isoformat() for m in analitica.consolidar_pendientes()]}
+
+
+def encolar_pdf_cierre(cierre):
+    from Aplicaciones.Tareas.ejecutor import encolar
+    return encolar('pdf_cierre', {'fecha': cierre.fecha.isoformat()},
+                   clave=f'pdf_cierre:{reportes.version_cierre(cierre)}')
+
+
+def encolar_consolidacion():
+    from Aplicaciones.Tareas.ejecutor import encolar
+    return encolar('consolidar_analitica', clave='consolidar_analitica')
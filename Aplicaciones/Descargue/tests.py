@@ -1,3 +1,391 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from Recuperadora.rendimiento import Caso, RendimientoMixin
+from Aplicaciones.Tareas.models import Tarea
+
+from . import analitica, archivo, catalogos, importacion, ocupacion, resumenes
+from .models import (CierreDia, Empresa, ItemArchivado, ItemDescargue, MesConsolidado, Muelle, OcupacionMuelle,
+                     Producto, RegistroArchivado, RegistroDescargue, ResumenEmpresaDia)
+
+# Volumen reducido: lo que se vigila es que las consultas no crezcan con los datos.
+VOLUMEN_PRUEBA = dict(empleados=20, dias=30, empresas=40, productos=80, registros=900)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RendimientoVistasTest(RendimientoMixin, TestCase):
+    modulo_urls = 'Aplicaciones.Descargue.urls'
+    ruta_base = Path(__file__).with_name('rendimiento_base.json')
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('sembrar_datos', stdout=StringIO(), **VOLUMEN_PRUEBA)
+        muelles = Muelle.objects.bulk_create([Muelle(nombre=f'Muelle {n}') for n in range(1, 7)])
+        registros = list(RegistroDescargue.objects.filter(cierre__estado='abierto').exclude(hora_fin_estimada=None))
+        for n, reg in enumerate(registros):
+            reg.muelle = muelles[n % len(muelles)]
+        RegistroDescargue.objects.bulk_update(registros, ['muelle'])
+        ocupacion.ocupar(registros)
+
+    def casos(self):
+        hoy = timezone.localdate()
+        empresa = Empresa.objects.first()
+        productos = list(Producto.objects.values_list('id', flat=True)[:3])
+        registro_hoy = RegistroDescargue.objects.filter(cierre__fecha=hoy).first()
+        pasado = CierreDia.objects.filter(estado='cerrado').order_by('-fecha').first()
+        muelle = Muelle.objects.first()
+        desde = f'{hoy}T08:00'
+        llegada = max(timezone.localtime() - timedelta(minutes=5), timezone.localtime().replace(hour=0, minute=0))
+        return [
+            Caso('dashboard'),
+            Caso('agregar_empresa', 'post', json=True, datos={'nombre': 'Empresa Nueva de Prueba'}),
+            Caso('lista_empresas', datos={'q': 'dis'}),
+            Caso('agregar_producto', 'post', json=True, datos={'nombre': 'Producto Nuevo de Prueba'}),
+            Caso('lista_productos'),
+            Caso('importar_productos', 'post', json=True, datos={'productos': [
+                {'nombre': p.nombre.upper(), 'upc': p.unidades_por_capa + 1} for p in Producto.objects.order_by('id')[:5]
+            ] + [{'nombre': f'Producto Importado {i}', 'categoria': 'Bebidas', 'upc': 12, 'cpp': 5} for i in range(50)]}),
+            Caso('registrar', 'post', json=True, datos={
+                'empresa_id': empresa.id, 'chofer_nombre': 'Chofer', 'placa': 'gab-1234',
+                'items': [{'producto_id': p, 'palets_completos': 3, 'unidades_sueltas': 5} for p in productos],
+            }),
+            Caso('registrar', 'post', json=True, variante='muelle', datos={
+                'empresa_id': empresa.id, 'chofer_nombre': 'Chofer', 'placa': 'gab-1234', 'muelle_id': muelle.id,
+                'items': [{'producto_id': p, 'palets_completos': 3, 'unidades_sueltas': 5} for p in productos],
+            }),
+            Caso('registrar_lote', 'post', json=True, datos={'registros': [{
+                'empresa_id': empresa.id, 'chofer_nombre': f'Chofer {n}', 'placa': f'gab-{1000 + n}',
+                'items': [{'producto_id': p, 'palets_completos': 2} for p in productos],
+            } for n in range(20)]}),
+            Caso('registrar_lote', 'post', json=True, variante='muelle', datos={'registros': [{
+                'empresa_id': empresa.id, 'chofer_nombre': f'Chofer {n}', 'placa': f'gab-{1000 + n}',
+                'muelle_id': muelle.id, 'hora': (llegada + timedelta(seconds=10 * n)).isoformat(), 'duracion_minutos': 45,
+                'items': [{'producto_id': p, 'palets_completos': 2} for p in productos],
+            } for n in range(20)]}),
+            Caso('agregar_muelle', 'post', json=True, datos={'nombre': 'Muelle Nuevo'}),
+            Caso('muelles', datos={'desde': desde, 'hasta': f'{hoy}T12:00'}),
+            Caso('hueco_muelle', datos={'desde': desde, 'duracion': '90'}),
+            Caso('eliminar_registro', 'post', kwargs={'pk': registro_hoy.pk}),
+            Caso('factura_registro', kwargs={'pk': registro_hoy.pk}),
+            Caso('factura_registro', kwargs={'pk': pasado.registros.first().pk}, variante='cerrado'),
+            Caso('resumen'),
+            Caso('cambios'),
+            Caso('cambios', datos={'cursor': f'{hoy}:0'}, variante='incremental'),
+            Caso('cerrar', 'post', json=True, datos={'observaciones': ''}),
+            Caso('reabrir', 'post'),
+            Caso('ver_cierre', kwargs={'fecha': str(pasado.fecha)}),
+            Caso('pdf', kwargs={'fecha': str(pasado.fecha)}),
+            Caso('analitica'),
+            Caso('analitica', datos={'agrupar': 'producto', 'periodo': 'semana'}, variante='semanal'),
+        ]
+
+
+def _dia(fecha, registros, estado='cerrado'):
+    """Día con ``registros = [(empresa, [(producto, palets, sueltas)])]`` y sus resúmenes al día."""
+    cierre = CierreDia.objects.create(fecha=fecha, estado=estado,
+                                      hora_cierre=timezone.now() if estado == 'cerrado' else None)
+    for empresa, items in registros:
+        registro = RegistroDescargue.objects.create(cierre=cierre, empresa=empresa)
+        for producto, palets, sueltas in items:
+            ItemDescargue.objects.create(registro=registro, producto=producto,
+                                         palets_completos=palets, unidades_sueltas=sueltas)
+    resumenes.reconstruir(cierre)
+    cierre.recalcular()
+    return cierre
+
+
+class _DescargueTest(TestCase):
+
+    def setUp(self):
+        self.empresas = [Empresa.objects.create(nombre=n) for n in ('Alfa', 'Beta')]
+        self.producto = Producto.objects.create(nombre='Agua', unidades_por_capa=4, capas_por_palet=5)
+        self.otro = Producto.objects.create(nombre='Jugo', unidades_por_capa=10, capas_por_palet=10)
+
+    def post(self, url, datos=None):
+        return self.client.post(url, json.dumps(datos or {}), content_type='application/json').json()
+
+    def registrar(self, empresa, sueltas=5, **extra):
+        return self.post('/descargue/registrar/', dict({'empresa_id': empresa.id, 'items': [
+            {'producto_id': self.producto.id, 'palets_completos': 2, 'unidades_sueltas': sueltas},
+            {'producto_id': self.otro.id, 'palets_completos': 1},
+        ]}, **extra))
+
+
+class ResumenesTest(_DescargueTest):
+    """Los resúmenes incrementales coinciden con recalcularlos desde los registros."""
+
+    def test_alta_baja_y_geometria(self):
+        ids = [self.registrar(e)['id'] for e in self.empresas + self.empresas[:1]]
+        cierre = CierreDia.objects.get()
+        self.assertEqual(resumenes.verificar(cierre), [])
+        self.assertAlmostEqual(ResumenEmpresaDia.objects.get(empresa=self.empresas[0]).palets, 2 * 3.25)
+
+        self.client.post(f'/descargue/registro/{ids[0]}/eliminar/')
+        self.assertEqual(resumenes.verificar(cierre), [])
+        self.assertAlmostEqual(ResumenEmpresaDia.objects.get(empresa=self.empresas[0]).palets, 3.25)
+
+        self.producto.capas_por_palet = 10
+        self.producto.save()
+        self.assertEqual(resumenes.verificar(cierre), [])
+        self.assertAlmostEqual(cierre.palets_del_dia(), 2 * 3.125)
+
+        informe = importacion.importar(importacion.desde_json([{'nombre': 'agua', 'upc': 5}]))
+        self.assertEqual(informe[0]['estado'], 'actualizado')
+        self.assertEqual(resumenes.verificar(cierre), [])
+        self.assertAlmostEqual(cierre.palets_del_dia(), 2 * 3.1)
+
+    def test_los_dias_cerrados_conservan_la_geometria(self):
+        cerrado = _dia(timezone.localdate() - timedelta(days=3), [(self.empresas[0], [(self.producto, 2, 5)])])
+        self.producto.capas_por_palet = 10
+        self.producto.save()
+        self.assertAlmostEqual(cerrado.palets_del_dia(), 2.25)
+        self.assertEqual(resumenes.verificar(cerrado), [])
+
+    def test_reconstruir_repara_un_resumen_alterado(self):
+        cierre = _dia(timezone.localdate() - timedelta(days=1), [(self.empresas[0], [(self.producto, 2, 0)])])
+        ResumenEmpresaDia.objects.update(palets=0)
+        self.assertTrue(resumenes.verificar(cierre))
+        call_command('reconstruir_resumenes', stdout=StringIO())
+        self.assertEqual(resumenes.verificar(cierre), [])
+
+
+class RegistrarLoteTest(_DescargueTest):
+    """Cada camión mal formado se informa por separado y no se guarda ninguno."""
+
+    def camion(self, item=None, **extra):
+        return dict({'empresa_id': self.empresas[0].id,
+                     'items': [dict({'producto_id': self.producto.id, 'palets_completos': 1}, **(item or {}))]}, **extra)
+
+    def test_campos_numericos_mal_formados(self):
+        respuesta = self.post('/descargue/registrar/lote/', {'registros': [
+            self.camion(),
+            self.camion({'palets_completos': 'dos'}),
+            self.camion({'unidades_sueltas': -3}),
+            self.camion(duracion_minutos='media hora'),
+            self.camion(duracion_minutos=0),
+            self.camion(tipo='urgente'),
+        ]})
+        self.assertFalse(respuesta['ok'])
+        self.assertEqual([e['indice'] for e in respuesta['errores']], [1, 2, 3, 4, 5])
+        self.assertIn('palets completos', respuesta['errores'][0]['error'])
+        self.assertIn('unidades sueltas', respuesta['errores'][1]['error'])
+        self.assertIn('duración', respuesta['errores'][2]['error'])
+        self.assertEqual(respuesta['errores'][4]['error'], 'Tipo de descargue no válido.')
+        self.assertFalse(RegistroDescargue.objects.exists())
+
+        respuesta = self.post('/descargue/registrar/lote/', {'registros': [self.camion({'unidades_sueltas': '3'})]})
+        self.assertTrue(respuesta['ok'], respuesta)
+        self.assertEqual(ItemDescargue.objects.get().unidades_sueltas, 3)
+
+
+class ArchivoDescargueTest(_DescargueTest):
+    """Ida y vuelta por el archivo: el día archivado se sigue viendo igual."""
+
+    def test_archivar_un_dia_cerrado(self):
+        hoy = timezone.localdate()
+        viejo = _dia(hoy - timedelta(days=400), [(self.empresas[0], [(self.producto, 2, 5), (self.otro, 1, 0)])])
+        abierto = _dia(hoy - timedelta(days=390), [(self.empresas[1], [(self.producto, 1, 0)])], estado='abierto')
+        registro = viejo.registros.get()
+        antes = self.client.get(f'/descargue/cierre/{viejo.fecha}/').content
+        totales = [(r.empresa_id, r.palets) for r in ResumenEmpresaDia.objects.filter(cierre=viejo)]
+
+        self.assertEqual(archivo.archivar(hoy - timedelta(days=30)), (1, 1))
+        viejo.refresh_from_db()
+        self.assertTrue(viejo.archivado)
+        self.assertFalse(RegistroDescargue.objects.filter(cierre=viejo).exists())
+        self.assertEqual(RegistroArchivado.objects.get().id, registro.id)
+        self.assertEqual(ItemArchivado.objects.count(), 2)
+        self.assertTrue(RegistroDescargue.objects.filter(cierre=abierto).exists())
+
+        self.assertEqual([(r.empresa_id, r.palets) for r in ResumenEmpresaDia.objects.filter(cierre=viejo)], totales)
+        self.assertEqual(resumenes.verificar(viejo), [])
+        self.assertAlmostEqual(float(viejo.total_palets), 3.25)
+        self.assertEqual(self.client.get(f'/descargue/cierre/{viejo.fecha}/').content, antes)
+        self.assertEqual(self.client.get(f'/descargue/registro/{registro.id}/factura/').status_code, 200)
+        self.assertEqual(archivo.archivar(hoy - timedelta(days=30)), (0, 0))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AnaliticaTest(_DescargueTest):
+    """Los meses consolidados suman lo mismo que los registros."""
+
+    def setUp(self):
+        super().setUp()
+        mes = timezone.localdate().replace(day=1)
+        self.anterior = (mes - timedelta(days=1)).replace(day=1)
+        self.previo = (self.anterior - timedelta(days=1)).replace(day=1)
+        for fecha, sueltas in ((self.previo, 7), (self.previo + timedelta(days=9), 3), (self.anterior + timedelta(days=4), 1)):
+            _dia(fecha, [(self.empresas[0], [(self.producto, 2, sueltas), (self.otro, 1, 3)]),
+                         (self.empresas[1], [(self.otro, 3, 1)])])
+        self.rango = (self.previo, timezone.localdate())
+
+    def series(self):
+        return [analitica.series(*self.rango, agrupar, periodo, 10)
+                for agrupar in ('empresa', 'producto') for periodo in ('mes', 'semana')]
+
+    def test_consolidados_igual_a_lo_vivo(self):
+        vivo = self.series()
+        self.assertEqual(analitica.consolidar_pendientes(), [self.previo, self.anterior])
+        self.assertEqual(analitica.consolidar_pendientes(), [])
+        self.assertEqual(self.series(), vivo)
+
+        archivo.archivar(timezone.localdate())
+        self.assertEqual(MesConsolidado.objects.count(), 2)
+        self.assertEqual(self.series(), vivo)
+
+    def test_la_vista_solo_lee(self):
+        self.assertEqual(self.client.get('/descargue/analitica/').status_code, 200)
+        self.assertFalse(MesConsolidado.objects.exists())
+
+    def test_cerrar_encola_la_consolidacion(self):
+        self.registrar(self.empresas[0])
+        self.post('/descargue/cerrar/')
+        self.assertTrue(Tarea.objects.filter(tipo='consolidar_analitica', estado='pendiente').exists())
+        salida = StringIO()
+        call_command('consolidar_analitica', stdout=salida)
+        self.assertIn('2 mes(es)', salida.getvalue())
+
+
+class ImportarProductosTest(_DescargueTest):
+    """Informe fila por fila de la importación del catálogo."""
+
+    def test_informe_por_fila(self):
+        cerrado = _dia(timezone.localdate() - timedelta(days=2), [(self.empresas[0], [(self.producto, 1, 2)])])
+        informe = importacion.importar(importacion.desde_json([
+            {'nombre': ' AGUA ', 'upc': 6},
+            {'nombre': 'Jugo', 'upc': 10, 'cpp': 10},
+            {'nombre': 'Leche', 'categoria': 'Bebidas', 'upc': 12, 'cpp': 5},
+            {'nombre': 'Café', 'categoria': 'Inventada'},
+            {'nombre': 'leche', 'upc': 0},
+            {'nombre': ''},
+        ]))
+        self.assertEqual([f['estado'] for f in informe],
+                         ['actualizado', 'sin_cambios', 'creado', 'error', 'error', 'error'])
+        self.assertEqual(informe[0]['dias_cerrados'], [cerrado.fecha.isoformat()])
+        self.assertEqual(informe[3]['errores'], ['categoria: "Inventada" no existe'])
+        self.assertIn('nombre: repetido (fila 3)', informe[4]['errores'])
+        self.assertEqual(importacion.resumen(informe),
+                         {'creado': 1, 'actualizado': 1, 'sin_cambios': 1, 'error': 3, 'dias_cerrados': 1})
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.nombre, self.producto.unidades_por_capa), ('Agua', 6))
+        self.assertEqual(Producto.objects.get(nombre='Leche').categoria, 'bebidas')
+
+    def test_una_fila_invalida_no_reserva_el_nombre(self):
+        informe = importacion.importar(importacion.desde_json([{'nombre': 'Té', 'upc': 'x'}, {'nombre': 'té'}]))
+        self.assertEqual([f['estado'] for f in informe], ['error', 'creado'])
+
+    def test_simular_no_escribe(self):
+        respuesta = self.post('/descargue/producto/importar/', {'productos': [{'nombre': 'Té'}], 'simular': True})
+        self.assertEqual(respuesta['resumen']['creado'], 1)
+        self.assertFalse(Producto.objects.filter(nombre='Té').exists())
+
+
+class CatalogosTest(_DescargueTest):
+    """Un cambio hecho en un worker se ve en los demás al confirmarse, sin esperar a que caduque."""
+
+    def en_worker(self, nombre, url):
+        # Cada worker tiene su propia caché local y sus propios índices en memoria
+        worker = self.workers.setdefault(nombre, (LocMemCache(nombre, {}), {}))
+        with mock.patch.object(catalogos, 'cache', worker[0]), mock.patch.object(catalogos, '_indices', worker[1]):
+            return self.client.get(url)
+
+    def nombres(self, respuesta, clave):
+        return {e['nombre'] for e in respuesta.json()[clave]}
+
+    def test_dos_workers_con_cache_propia(self):
+        self.workers = {}
+        primera = self.en_worker('a', '/descargue/empresa/lista/')
+        self.assertEqual(self.nombres(self.en_worker('b', '/descargue/empresa/lista/'), 'empresas'), {'Alfa', 'Beta'})
+
+        with mock.patch.object(catalogos, 'cache', self.workers['a'][0]):
+            self.post('/descargue/empresa/agregar/', {'nombre': 'Gamma'})
+        Producto.objects.filter(pk=self.otro.pk).update(activo=False)
+        catalogos.invalidar()
+
+        respuesta = self.en_worker('b', '/descargue/empresa/lista/')
+        self.assertEqual(self.nombres(respuesta, 'empresas'), {'Alfa', 'Beta', 'Gamma'})
+        self.assertNotEqual(respuesta['ETag'], primera['ETag'])
+        self.assertEqual(self.nombres(self.en_worker('b', '/descargue/producto/lista/'), 'productos'), {'Agua'})
+
+    def test_lo_que_se_deshace_no_cambia_la_version(self):
+        antes = catalogos.version()
+        try:
+            with transaction.atomic():
+                Empresa.objects.create(nombre='Gamma')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(catalogos.version(), antes)
+
+
+class MuellesTest(_DescargueTest):
+    """Solapes por muelle y búsqueda del primer hueco libre."""
+
+    def setUp(self):
+        super().setUp()
+        self.m1, self.m2 = Muelle.objects.create(nombre='M1'), Muelle.objects.create(nombre='M2')
+        self.cierre = CierreDia.objects.create()
+        self.base = timezone.localtime().replace(hour=8, minute=0, second=0, microsecond=0)
+
+    def ocupar(self, muelle, desde, minutos):
+        return RegistroDescargue.objects.create(cierre=self.cierre, empresa=self.empresas[0], muelle=muelle,
+                                                hora=self.base + timedelta(minutes=desde), duracion_minutos=minutos)
+
+    def hueco(self, minutos, **rango):
+        limites = {k: self.base + timedelta(minutes=v) for k, v in rango.items()}
+        return ocupacion.primer_hueco(timedelta(minutes=minutos), **limites)
+
+    def test_solapes_en_el_mismo_muelle(self):
+        a = self.ocupar(self.m1, 0, 60)
+        b = self.ocupar(self.m1, 30, 60)
+        pegado = self.ocupar(self.m1, 90, 30)  # empieza justo cuando termina b
+        otro_muelle = self.ocupar(self.m2, 0, 60)
+        cruces = ocupacion.solapes([a, b, pegado, otro_muelle])
+        self.assertEqual({k: [o['registro_id'] for o in v] for k, v in cruces.items()}, {a.id: [b.id], b.id: [a.id]})
+
+    def test_primer_hueco(self):
+        self.ocupar(self.m1, 0, 60)
+        self.ocupar(self.m1, 90, 60)
+        self.ocupar(self.m2, -30, 100)  # empezó antes del rango
+        self.ocupar(self.m2, 70, 120)
+        # Hueco exacto de 30 minutos en M1 entre 60 y 90
+        self.assertEqual(self.hueco(30, desde=0), (self.m1, self.base + timedelta(minutes=60)))
+        # 31 minutos no caben en M1 hasta 150; M2 está ocupado hasta 190
+        self.assertEqual(self.hueco(31, desde=0), (self.m1, self.base + timedelta(minutes=150)))
+        # Dentro de un rango que no alcanza, no hay hueco
+        self.assertIsNone(self.hueco(31, desde=0, hasta=150))
+        self.assertEqual(self.hueco(31, desde=0, hasta=181), (self.m1, self.base + timedelta(minutes=150)))
+        # A mitad de una ocupación se parte de su fin; empatados gana el primer muelle
+        self.assertEqual(self.hueco(10, desde=40), (self.m1, self.base + timedelta(minutes=60)))
+        self.assertEqual(self.hueco(10, desde=200), (self.m1, self.base + timedelta(minutes=200)))
+
+    def test_muelle_inactivo_y_reasignacion(self):
+        registro = self.ocupar(self.m1, 0, 60)
+        self.m2.activo = False
+        self.m2.save()
+        self.assertEqual(self.hueco(30, desde=0), (self.m1, self.base + timedelta(minutes=60)))
+        registro.muelle = self.m2
+        registro.save()
+        self.assertEqual(OcupacionMuelle.objects.get().muelle, self.m2)
+        registro.muelle = None
+        registro.save()
+        self.assertFalse(OcupacionMuelle.objects.exists())
+
+    def test_api(self):
+        self.ocupar(self.m1, 0, 60)
+        desde = (self.base + timedelta(minutes=30)).isoformat()
+        datos = self.client.get('/descargue/muelles/', {'desde': desde, 'hasta': (self.base + timedelta(minutes=45)).isoformat()}).json()
+        self.assertEqual([m['libre'] for m in datos['muelles']], [False, True])
+        datos = self.client.get('/descargue/muelles/hueco/', {'desde': desde, 'duracion': '45'}).json()
+        self.assertEqual((datos['hueco']['muelle'], datos['hueco']['inicio']), ('M2', desde))
+        self.assertEqual(self.client.get('/descargue/muelles/hueco/', {'desde': 'xx'}).status_code, 400)
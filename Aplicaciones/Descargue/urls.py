@@ -9,12 +9,19 @@ urlpatterns = [
     path('empresa/lista/',              views.lista_empresas,      name='lista_empresas'),
     path('producto/agregar/',           views.agregar_producto,    name='agregar_producto'),
     path('producto/lista/',             views.lista_productos,     name='lista_productos'),
+    path('producto/importar/',          views.importar_productos,  name='importar_productos'),
+    path('muelle/agregar/',             views.agregar_muelle,      name='agregar_muelle'),
+    path('muelles/',                    views.disponibilidad_muelles, name='muelles'),
+    path('muelles/hueco/',              views.hueco_muelle,        name='hueco_muelle'),
     path('registrar/',                  views.registrar_descargue, name='registrar'),
+    path('registrar/lote/',             views.registrar_lote,      name='registrar_lote'),
     path('registro/<int:pk>/eliminar/', views.eliminar_registro,   name='eliminar_registro'),
     path('registro/<int:pk>/factura/',  views.factura_registro,    name='factura_registro'),
     path('resumen/',                    views.resumen_dia,         name='resumen'),
+    path('cambios/',                    views.cambios_dia,         name='cambios'),
     path('cerrar/',                     views.cerrar_dia,          name='cerrar'),
     path('reabrir/',                    views.reabrir_dia,         name='reabrir'),
     path('cierre/<str:fecha>/',         views.ver_cierre,          name='ver_cierre'),
     path('cierre/<str:fecha>/pdf/',     views.generar_pdf,         name='pdf'),
+    path('analitica/',                  views.analitica_descargue, name='analitica'),
 ]
\ No newline at end of file
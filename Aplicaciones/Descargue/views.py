@@ -1,38 +1,76 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
-from datetime import timedelta
-from io import BytesIO
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from datetime import date, timedelta
 import json
+import os
 
-from .models import Empresa, Producto, CierreDia, RegistroDescargue, ItemDescargue
+from .models import Empresa, Producto, CierreDia, RegistroDescargue, ItemDescargue, CambioDescargue, RegistroArchivado, Muelle
+from . import analitica, catalogos, importacion, ocupacion, reportes, resumenes
+from .tareas import encolar_consolidacion, encolar_pdf_cierre
+from Aplicaciones.Tareas.views import respuesta_en_cola
+from Recuperadora.enrutador import solo_lectura
+from Recuperadora.eventos import publicar
 
 
-def _agrupar_por_empresa(registros):
-    data = {}
-    for reg in registros:
-        key = reg.empresa_id or 0
-        if key not in data:
-            data[key] = {'empresa': reg.empresa, 'registros': [], 'subtotal_palets': 0}
-        data[key]['registros'].append(reg)
-        data[key]['subtotal_palets'] = round(data[key]['subtotal_palets'] + reg.total_palets, 2)
-    return list(data.values())
+# ── DASHBOARD ─────────────────────────────────
 
+# Filas planas de registros: diccionarios con estos campos, más ``empresa``
+# (nombre), ``items`` y ``total_palets``; cada ítem lleva ``producto`` (nombre).
+CAMPOS_REGISTRO = ('id', 'hora', 'hora_fin_estimada', 'duracion_minutos', 'chofer_nombre',
+                   'chofer_telefono', 'placa', 'tipo', 'observacion', 'muelle_id')
+CAMPOS_ITEM = ('id', 'palets_completos', 'unidades_sueltas', 'palets_equivalentes')
+
+
+def _filas_registros(registros, *orden):
+    """Registros con sus ítems como filas planas, en una sola consulta con JOIN.
+
+    Llega una fila por ítem, ordenadas por registro, y se agrupan en una
+    pasada sin crear instancias de modelo.
+    """
+    n = len(CAMPOS_REGISTRO)
+    consulta = (registros.order_by(*orden, 'id', 'items__id')
+                .values_list(*CAMPOS_REGISTRO, 'empresa__nombre', 'items__producto__nombre',
+                             *(f'items__{c}' for c in CAMPOS_ITEM)))
+    filas, actual = [], None
+    for valores in consulta:
+        if actual is None or actual['id'] != valores[0]:
+            actual = dict(zip(CAMPOS_REGISTRO, valores), empresa=valores[n], items=[], total_palets=0.0)
+            filas.append(actual)
+        if valores[n + 2] is not None:
+            item = dict(zip(CAMPOS_ITEM, valores[n + 2:]), producto=valores[n + 1])
+            actual['items'].append(item)
+            actual['total_palets'] += item['palets_equivalentes']
+    for fila in filas:
+        fila['total_palets'] = round(fila['total_palets'], 4)
+    return filas
+
+
+def _fila(reg, items):
+    """Fila plana de un registro ya cargado con sus ítems."""
+    return dict({c: getattr(reg, c) for c in CAMPOS_REGISTRO},
+                empresa=reg.empresa.nombre if reg.empresa else None,
+                items=[dict({c: getattr(i, c) for c in CAMPOS_ITEM}, producto=i.producto.nombre) for i in items],
+                total_palets=round(sum(i.palets_equivalentes for i in items), 4))
 
-# ── DASHBOARD ─────────────────────────────────
 
 def dashboard(request):
     hoy = timezone.localdate()
     cierre, _ = CierreDia.objects.get_or_create(fecha=hoy)
-    registros = (RegistroDescargue.objects
-                 .filter(cierre=cierre)
-                 .select_related('empresa')
-                 .prefetch_related('items__producto')
-                 .order_by('-hora'))
-    total_palets = round(sum(r.total_palets for r in registros), 2)
+    # El cursor se toma antes que la lista: un cambio concurrente se recibe dos veces
+    # (el cliente ignora la fila repetida), nunca cero; ver SOLAPE_CAMBIOS
+    cursor = _cursor_cambios(cierre)
+    registros = _filas_registros(RegistroDescargue.objects.filter(cierre=cierre), '-hora')
+    total_palets = round(sum(r['total_palets'] for r in registros), 2)
     return render(request, 'descargue.html', {
         'cierre': cierre,
+        'cursor': cursor,
         'registros': registros,
         'total_palets': total_palets,
         'hoy': hoy,
@@ -57,11 +95,10 @@ def agregar_empresa(request):
 
 
 def lista_empresas(request):
-    q = request.GET.get('q', '').strip()
-    qs = Empresa.objects.filter(activo=True)
-    if q:
-        qs = qs.filter(nombre__icontains=q)
-    return JsonResponse({'empresas': list(qs.values('id', 'nombre').order_by('nombre')[:50])})
+    q = request.GET.get('q', '')
+    version, indice = catalogos.empresas()
+    return catalogos.respuesta(request, 'empresas', version,
+                               lambda: json.dumps({'empresas': indice.buscar(q, 50)}))
 
 
 # ── PRODUCTOS ─────────────────────────────────
@@ -91,89 +128,301 @@ def agregar_producto(request):
     })
 
 
+@csrf_exempt
+def importar_productos(request):
+    """Alta y actualización masiva del catálogo: un XLSX/CSV (``archivo``) o una lista JSON.
+
+    El JSON puede ser la lista o ``{"productos": [...], "simular": true}``.
+    Responde el resumen y el informe por fila, con los días cerrados que
+    conservan la geometría anterior de cada producto que la cambia.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'ok': False}, status=405)
+    try:
+        if 'archivo' in request.FILES:
+            archivo = request.FILES['archivo']
+            simular = request.POST.get('simular') == 'true'
+            filas = importacion.leer(archivo, archivo.name)
+        else:
+            data = json.loads(request.body)
+            simular = isinstance(data, dict) and data.get('simular') is True
+            filas = importacion.desde_json(data.get('productos') if isinstance(data, dict) else data)
+        informe = importacion.importar(filas, simular=simular)
+    except json.JSONDecodeError:
+        return JsonResponse({'ok': False, 'error': 'JSON inválido'}, status=400)
+    except importacion.ArchivoInvalido as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    return JsonResponse({'ok': True, 'simular': simular, 'resumen': importacion.resumen(informe), 'filas': informe})
+
+
 def lista_productos(request):
-    qs = Producto.objects.filter(activo=True).order_by('categoria', 'nombre')
-    return JsonResponse({'productos': [{
-        'id': p.id, 'nombre': p.nombre,
-        'upc': p.unidades_por_capa, 'cpp': p.capas_por_palet,
-        'unidades_palet': p.unidades_palet_completo,
-    } for p in qs]})
+    q = request.GET.get('q', '')
+    if q:
+        version, indice = catalogos.productos()
+        return catalogos.respuesta(request, 'productos', version,
+                                   lambda: json.dumps({'productos': indice.buscar(q, 20)}))
+    version, cuerpo = catalogos.productos_json()
+    return catalogos.respuesta(request, 'productos', version, lambda: cuerpo)
 
 
 # ── REGISTRAR DESCARGUE (con múltiples productos) ─────────
 
-@csrf_exempt
-def registrar_descargue(request):
-    if request.method != 'POST':
-        return JsonResponse({'ok': False}, status=405)
-    data = json.loads(request.body)
-    hoy = timezone.localdate()
-    cierre, _ = CierreDia.objects.get_or_create(fecha=hoy)
-    if cierre.estado == 'cerrado':
-        return JsonResponse({'ok': False, 'error': 'El día ya está cerrado.'})
+DURACION_MAXIMA_MINUTOS = int(ocupacion.DURACION_MAXIMA.total_seconds() // 60)
+VENTANA_SIN_CONEXION = timedelta(hours=24)  # antigüedad máxima de la ``hora`` de un camión anotado sin conexión
+TOLERANCIA_RELOJ = timedelta(minutes=5)     # adelanto admitido del reloj del dispositivo
+
 
+def _leer_hora(data):
+    """Convierte ``data['hora']`` (ISO 8601) en fecha y hora con zona. Devuelve el error o None."""
+    if not data.get('hora'):
+        return None
     try:
-        empresa = Empresa.objects.get(id=data['empresa_id'])
-    except (Empresa.DoesNotExist, KeyError):
-        return JsonResponse({'ok': False, 'error': 'Empresa no válida.'})
+        hora = parse_datetime(str(data['hora']))
+    except ValueError:
+        hora = None
+    if hora is None:
+        return 'Hora no válida.'
+    hora = hora if timezone.is_aware(hora) else timezone.make_aware(hora)
+    ahora = timezone.now()
+    if not ahora - VENTANA_SIN_CONEXION <= hora <= ahora + TOLERANCIA_RELOJ:
+        return 'La hora debe ser de las últimas 24 horas.'
+    data['hora'] = hora
+    return None
+
+
+def _fecha_de(data):
+    return timezone.localdate(data['hora']) if data.get('hora') else timezone.localdate()
+
+
+def _cierres_abiertos(fechas):
+    """``{fecha: CierreDia}`` de las fechas pedidas. Solo se crea el día de hoy.
+
+    Un día pasado sin cierre no se abre desde aquí: ``cerrar_dia`` ya no
+    podría cerrarlo y dejaría su mes sin consolidar.
+    """
+    cierres = {c.fecha: c for c in CierreDia.objects.filter(fecha__in=fechas)}
+    hoy = timezone.localdate()
+    if hoy in fechas and hoy not in cierres:
+        cierres[hoy], _ = CierreDia.objects.get_or_create(fecha=hoy)
+    return cierres
+
 
+def _cierre_de(data, cierres):
+    """``(cierre, error)``: el día abierto al que pertenece el camión."""
+    cierre = cierres.get(_fecha_de(data))
+    if cierre is None:
+        return None, f'No hay un día abierto el {_fecha_de(data):%d/%m/%Y}.'
+    if cierre.estado == 'cerrado':
+        return None, 'El día ya está cerrado.'
+    return cierre, None
+
+
+def _validar_camion(data, empresas, productos, muelles):
+    """Devuelve el mensaje de error de un camión, o None si es válido.
+
+    Deja en ``data`` la duración, el tipo y las cantidades ya convertidos,
+    para que ``_guardar_camiones`` no tenga nada que pueda fallar.
+    """
+    if _id(data.get('empresa_id')) not in empresas:
+        return 'Empresa no válida.'
+    data['tipo'] = data.get('tipo') or 'completo'
+    if data['tipo'] not in TIPOS_REGISTRO:
+        return 'Tipo de descargue no válido.'
+    data['duracion_minutos'] = _id(data.get('duracion_minutos', 30))
+    if not 1 <= (data['duracion_minutos'] or 0) <= DURACION_MAXIMA_MINUTOS:
+        return f'La duración debe estar entre 1 y {DURACION_MAXIMA_MINUTOS} minutos.'
+    if data.get('muelle_id') and _id(data['muelle_id']) not in muelles:
+        return 'Muelle no válido.'
     items_data = data.get('items', [])
     if not items_data:
-        return JsonResponse({'ok': False, 'error': 'Agrega al menos un producto.'})
-
-    # Validar que todos los productos existan
-    productos = {}
+        return 'Agrega al menos un producto.'
     for item in items_data:
-        try:
-            p = Producto.objects.get(id=item['producto_id'])
-            productos[item['producto_id']] = p
-        except (Producto.DoesNotExist, KeyError):
-            return JsonResponse({'ok': False, 'error': f'Producto ID {item.get("producto_id")} no válido.'})
-
-    duracion = int(data.get('duracion_minutos', 30))
-    reg = RegistroDescargue.objects.create(
-        cierre=cierre,
-        empresa=empresa,
-        chofer_nombre=data.get('chofer_nombre', '').strip(),
-        chofer_telefono=data.get('chofer_telefono', '').strip(),
-        placa=data.get('placa', '').upper().strip(),
-        tipo=data.get('tipo', 'completo'),
-        observacion=data.get('observacion', ''),
-        duracion_minutos=duracion,
-    )
+        if _id(item.get('producto_id')) not in productos:
+            return f'Producto ID {item.get("producto_id")} no válido.'
+        for campo, nombre in (('palets_completos', 'palets completos'), ('unidades_sueltas', 'unidades sueltas')):
+            item[campo] = _id(item.get(campo, 0))
+            if item[campo] is None or item[campo] < 0:
+                return f'Las {nombre} deben ser un número entero no negativo.'
+    return None
 
-    items_creados = []
-    for item in items_data:
-        prod = productos[item['producto_id']]
-        it = ItemDescargue.objects.create(
-            registro=reg,
-            producto=prod,
-            palets_completos=int(item.get('palets_completos', 0)),
-            unidades_sueltas=int(item.get('unidades_sueltas', 0)),
-        )
-        items_creados.append({
-            'id': it.id,
-            'producto': prod.nombre,
-            'palets_completos': it.palets_completos,
-            'unidades_sueltas': it.unidades_sueltas,
-            'palets_eq': it.palets_equivalentes,
-        })
 
-    return JsonResponse({
+def _id(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cargar_catalogos(camiones):
+    """Empresas, productos y muelles activos de todos los camiones con una consulta por tabla."""
+    empresas = Empresa.objects.in_bulk({_id(c.get('empresa_id')) for c in camiones} - {None})
+    productos = Producto.objects.in_bulk(
+        {_id(i.get('producto_id')) for c in camiones for i in c.get('items', [])} - {None})
+    muelles = Muelle.objects.filter(activo=True).in_bulk({_id(c.get('muelle_id')) for c in camiones} - {None})
+    return empresas, productos, muelles
+
+
+def _guardar_camiones(camiones, empresas, productos):
+    """Crea registros e ítems con una inserción masiva por tabla.
+
+    ``camiones`` es una lista de (cierre, data). Debe llamarse dentro de
+    ``transaction.atomic`` junto con la actualización de los resúmenes.
+    """
+    registros = []
+    for cierre, data in camiones:
+        reg = RegistroDescargue(
+            cierre=cierre,
+            empresa=empresas[_id(data['empresa_id'])],
+            chofer_nombre=data.get('chofer_nombre', '').strip(),
+            chofer_telefono=data.get('chofer_telefono', '').strip(),
+            placa=data.get('placa', '').upper().strip(),
+            tipo=data['tipo'],
+            observacion=data.get('observacion', ''),
+            duracion_minutos=data['duracion_minutos'],
+            muelle_id=_id(data.get('muelle_id')),
+        )
+        if data.get('hora'):
+            reg.hora = data['hora']
+        reg.calcular_hora_fin()
+        registros.append(reg)
+    RegistroDescargue.objects.bulk_create(registros)
+    CambioDescargue.altas(registros)
+    ocupacion.ocupar(registros)
+
+    pares = []
+    todos = []
+    for reg, (_, data) in zip(registros, camiones):
+        items = []
+        for item in data['items']:
+            it = ItemDescargue(
+                registro=reg,
+                producto=productos[_id(item['producto_id'])],
+                palets_completos=item['palets_completos'],
+                unidades_sueltas=item['unidades_sueltas'],
+            )
+            it.calcular_palets_equivalentes()
+            items.append(it)
+        pares.append((reg, items))
+        todos.extend(items)
+    ItemDescargue.objects.bulk_create(todos)
+    resumenes.sumar_registros(pares)
+    return pares
+
+
+def _avisar(request, tipo, cierre, datos=None):
+    """Publica un evento del día de ``cierre`` con sus totales para las demás pantallas."""
+    totales = reportes.totales_dia(cierre) if cierre.estado == 'abierto' else {}
+    publicar('descargue', tipo, dict(datos or {}, fecha=cierre.fecha, estado=cierre.estado,
+                                     total_palets=totales.get('palets'), total_camiones=totales.get('camiones')),
+             origen=request.headers.get('X-Cliente', ''))
+
+
+TIPOS_REGISTRO = dict(RegistroDescargue.TIPO_CHOICES)
+
+
+def _ocupacion_json(o):
+    local = timezone.localtime
+    return {'registro_id': o['registro_id'], 'placa': o['registro__placa'],
+            'inicio': local(o['inicio']).isoformat(), 'fin': local(o['fin']).isoformat()}
+
+
+def _registro_json(fila):
+    return {
         'ok': True,
-        'id': reg.id,
-        'empresa': empresa.nombre,
-        'chofer': reg.chofer_nombre,
-        'telefono': reg.chofer_telefono,
-        'placa': reg.placa,
-        'tipo': reg.get_tipo_display(),
-        'total_palets': reg.total_palets,
-        'hora': reg.hora.strftime('%H:%M'),
-        'hora_fin': reg.hora_fin_estimada.strftime('%H:%M') if reg.hora_fin_estimada else '—',
-        'duracion': duracion,
-        'observacion': reg.observacion,
-        'items': items_creados,
-    })
+        'id': fila['id'],
+        'empresa': fila['empresa'] or '—',
+        'chofer': fila['chofer_nombre'],
+        'telefono': fila['chofer_telefono'],
+        'placa': fila['placa'],
+        'tipo': TIPOS_REGISTRO.get(fila['tipo'], fila['tipo']),
+        'total_palets': fila['total_palets'],
+        'hora': fila['hora'].strftime('%H:%M'),
+        'hora_fin': fila['hora_fin_estimada'].strftime('%H:%M') if fila['hora_fin_estimada'] else '—',
+        'duracion': fila['duracion_minutos'],
+        'observacion': fila['observacion'],
+        'muelle_id': fila['muelle_id'],
+        'items': [{
+            'id': it['id'],
+            'producto': it['producto'],
+            'palets_completos': it['palets_completos'],
+            'unidades_sueltas': it['unidades_sueltas'],
+            'palets_eq': it['palets_equivalentes'],
+        } for it in fila['items']],
+    }
+
+
+@csrf_exempt
+def registrar_descargue(request):
+    if request.method != 'POST':
+        return JsonResponse({'ok': False}, status=405)
+    data = json.loads(request.body)
+    error = _leer_hora(data)
+    if error:
+        return JsonResponse({'ok': False, 'error': error})
+    cierre, error = _cierre_de(data, _cierres_abiertos({_fecha_de(data)}))
+    if error:
+        return JsonResponse({'ok': False, 'error': error})
+
+    empresas, productos, muelles = _cargar_catalogos([data])
+    error = _validar_camion(data, empresas, productos, muelles)
+    if error:
+        return JsonResponse({'ok': False, 'error': error})
+
+    with transaction.atomic():
+        (reg, items), = _guardar_camiones([(cierre, data)], empresas, productos)
+        solapes = ocupacion.solapes([reg])
+    respuesta = _registro_json(_fila(reg, items))
+    respuesta['solapes'] = [_ocupacion_json(o) for o in solapes.get(reg.pk, [])]
+    _avisar(request, 'registro', cierre, {'registros': [respuesta]})
+    return JsonResponse(respuesta)
+
+
+@csrf_exempt
+def registrar_lote(request):
+    """Registra varios camiones en una sola petición (p. ej. anotados sin conexión).
+
+    Recibe ``{"registros": [camión, ...]}``; cada camión tiene los campos de
+    ``registrar_descargue``, incluida la ``hora`` opcional (ISO 8601, de las
+    últimas 24 horas) con la llegada real, que decide el día al que
+    pertenece; ese día debe estar abierto. Es todo o nada: si un camión no es
+    válido no se guarda ninguno.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'ok': False}, status=405)
+    camiones = json.loads(request.body).get('registros', [])
+    if not camiones:
+        return JsonResponse({'ok': False, 'error': 'No hay registros.'})
+
+    errores = {}
+    for n, data in enumerate(camiones):
+        error = _leer_hora(data)
+        if error:
+            errores[n] = error
+    cierres = _cierres_abiertos({_fecha_de(c) for n, c in enumerate(camiones) if n not in errores})
+
+    empresas, productos, muelles = _cargar_catalogos(camiones)
+    pendientes = []
+    for n, data in enumerate(camiones):
+        if n in errores:
+            continue
+        cierre, error = _cierre_de(data, cierres)
+        error = error or _validar_camion(data, empresas, productos, muelles)
+        if error:
+            errores[n] = error
+        else:
+            pendientes.append((cierre, data))
+    if errores:
+        return JsonResponse({'ok': False, 'error': 'Hay registros no válidos; no se guardó ninguno.',
+                             'errores': [{'indice': n, 'error': e} for n, e in sorted(errores.items())]})
+
+    with transaction.atomic():
+        pares = _guardar_camiones(pendientes, empresas, productos)
+        solapes = ocupacion.solapes([reg for reg, _ in pares])
+    registros = [dict(_registro_json(_fila(reg, items)),
+                      solapes=[_ocupacion_json(o) for o in solapes.get(reg.pk, [])]) for reg, items in pares]
+    for cierre in {reg.cierre_id: reg.cierre for reg, _ in pares}.values():
+        _avisar(request, 'registro', cierre, {'registros': [r for r, (reg, _) in zip(registros, pares) if reg.cierre_id == cierre.id]})
+    return JsonResponse({'ok': True, 'registros': registros})
 
 
 @csrf_exempt
@@ -183,21 +432,111 @@ def eliminar_registro(request, pk):
     reg = get_object_or_404(RegistroDescargue, pk=pk)
     if reg.cierre.estado == 'cerrado':
         return JsonResponse({'ok': False, 'error': 'Cierre cerrado.'})
-    reg.delete()
+    with transaction.atomic():
+        resumenes.descontar_registro(reg)
+        CambioDescargue.baja(reg)
+        reg.delete()
+    _avisar(request, 'baja', reg.cierre, {'id': pk})
     return JsonResponse({'ok': True})
 
 
+# ── MUELLES ───────────────────────────────────
+
+@csrf_exempt
+def agregar_muelle(request):
+    if request.method != 'POST':
+        return JsonResponse({'ok': False}, status=405)
+    data = json.loads(request.body)
+    nombre = data.get('nombre', '').strip()
+    if not nombre:
+        return JsonResponse({'ok': False, 'error': 'El nombre es requerido'})
+    muelle, created = Muelle.objects.get_or_create(
+        nombre__iexact=nombre, defaults={'nombre': nombre}
+    )
+    return JsonResponse({'ok': True, 'id': muelle.id, 'nombre': muelle.nombre, 'nuevo': created})
+
+
+def _momento(valor, base):
+    """``HH:MM`` (del día de ``base``) o fecha y hora ISO 8601; ValueError si no se entiende."""
+    hora = parse_datetime(valor)
+    if hora is None:
+        h, _, m = valor.partition(':')
+        if not (h.isdigit() and m.isdigit() and int(h) < 24 and int(m) < 60):
+            raise ValueError
+        return base.replace(hour=int(h), minute=int(m), second=0, microsecond=0)
+    return hora if timezone.is_aware(hora) else timezone.make_aware(hora)
+
+
+def _rango(request, duracion_defecto):
+    """``(desde, hasta)`` de ``?desde=``/``?hasta=``; desde es ahora si falta."""
+    ahora = timezone.localtime()
+    desde = _momento(request.GET['desde'], ahora) if request.GET.get('desde') else ahora
+    hasta = _momento(request.GET['hasta'], timezone.localtime(desde)) if request.GET.get('hasta') else None
+    return desde, hasta or desde + duracion_defecto
+
+
+def disponibilidad_muelles(request):
+    """Muelles activos libres u ocupados entre ``?desde=`` y ``?hasta=`` (HH:MM o ISO).
+
+    Sin rango, los próximos 30 minutos. Cada muelle trae las ocupaciones que
+    se cruzan con el intervalo.
+    """
+    try:
+        desde, hasta = _rango(request, timedelta(minutes=30))
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': 'Hora inválida, use HH:MM o AAAA-MM-DDTHH:MM.'}, status=400)
+    if desde >= hasta:
+        return JsonResponse({'ok': False, 'error': 'desde debe ser anterior a hasta.'}, status=400)
+    if hasta - desde > ocupacion.HORIZONTE:
+        return JsonResponse({'ok': False, 'error': 'El rango no puede superar 24 horas.'}, status=400)
+    muelles = [{'id': m.id, 'nombre': m.nombre, 'libre': not ocupaciones,
+                'ocupaciones': [_ocupacion_json(o) for o in ocupaciones]}
+               for m, ocupaciones in ocupacion.disponibilidad(desde, hasta)]
+    return JsonResponse({'ok': True, 'desde': timezone.localtime(desde).isoformat(),
+                         'hasta': timezone.localtime(hasta).isoformat(), 'muelles': muelles})
+
+
+def hueco_muelle(request):
+    """Primer muelle e inicio con ``?duracion=`` minutos libres (30 por defecto) desde ``?desde=``.
+
+    Busca hasta ``?hasta=``, o 24 horas adelante; ``hueco`` es null si no hay.
+    """
+    duracion = request.GET.get('duracion', '30')
+    if not duracion.isdigit() or not 1 <= int(duracion) <= DURACION_MAXIMA_MINUTOS:
+        return JsonResponse({'ok': False, 'error': f'duracion debe estar entre 1 y {DURACION_MAXIMA_MINUTOS}.'},
+                            status=400)
+    duracion = timedelta(minutes=int(duracion))
+    try:
+        desde, hasta = _rango(request, ocupacion.HORIZONTE)
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': 'Hora inválida, use HH:MM o AAAA-MM-DDTHH:MM.'}, status=400)
+    if hasta - desde > ocupacion.HORIZONTE:
+        return JsonResponse({'ok': False, 'error': 'El rango no puede superar 24 horas.'}, status=400)
+    hueco = ocupacion.primer_hueco(duracion, desde, hasta)
+    if hueco is None:
+        return JsonResponse({'ok': True, 'hueco': None})
+    muelle, inicio = hueco
+    return JsonResponse({'ok': True, 'hueco': {
+        'muelle_id': muelle.id, 'muelle': muelle.nombre,
+        'inicio': timezone.localtime(inicio).isoformat(),
+        'fin': timezone.localtime(inicio + duracion).isoformat(),
+    }})
+
+
 # ── FACTURA CHOFER ────────────────────────────
 
+@solo_lectura
 def factura_registro(request, pk):
-    reg = get_object_or_404(
-        RegistroDescargue.objects.select_related('empresa', 'cierre').prefetch_related('items__producto'),
-        pk=pk
-    )
-    return render(request, 'factura_chofer.html', {
-        'reg': reg,
-        'empresa_nombre': 'Recuperadora Logística Integral',
-    })
+    reg = RegistroDescargue.objects.select_related('empresa', 'cierre').filter(pk=pk).first()
+    if reg is None:
+        # Registros de días archivados: mismo id, otra tabla
+        reg = get_object_or_404(RegistroArchivado.objects.select_related('empresa', 'cierre'), pk=pk)
+
+    def contexto():
+        prefetch_related_objects([reg], 'items__producto')
+        return {'reg': reg, 'empresa_nombre': reportes.EMPRESA_NOMBRE}
+
+    return reportes.pagina(request, reg.cierre, reportes.nombre_pagina_factura(pk), 'factura_chofer.html', contexto)
 
 
 # ── RESUMEN ───────────────────────────────────
@@ -205,26 +544,79 @@ def factura_registro(request, pk):
 def resumen_dia(request):
     hoy = timezone.localdate()
     cierre, _ = CierreDia.objects.get_or_create(fecha=hoy)
-    registros = (RegistroDescargue.objects
-                 .filter(cierre=cierre)
-                 .select_related('empresa')
-                 .prefetch_related('items__producto')
-                 .order_by('-hora'))
-    total_palets = round(sum(r.total_palets for r in registros), 2)
+    registros = _filas_registros(RegistroDescargue.objects.filter(cierre=cierre), '-hora')
     return JsonResponse({
         'estado': cierre.estado,
-        'total_palets': total_palets,
-        'registros': [{
-            'id': r.id,
-            'hora': r.hora.strftime('%H:%M'),
-            'empresa': r.empresa.nombre if r.empresa else '—',
-            'chofer': r.chofer_nombre,
-            'placa': r.placa,
-            'tipo': r.get_tipo_display(),
-            'total_palets': r.total_palets,
-            'hora_fin': r.hora_fin_estimada.strftime('%H:%M') if r.hora_fin_estimada else '—',
-            'items': [{'producto': i.producto.nombre, 'palets_eq': i.palets_equivalentes} for i in r.items.all()],
-        } for r in registros],
+        'total_palets': round(sum(r['total_palets'] for r in registros), 2),
+        'total_camiones': len(registros),
+        'registros': [_registro_json(r) for r in registros],
+    })
+
+
+# ── CAMBIOS (sincronización incremental) ─────
+
+# Los ids se asignan antes del commit (en PostgreSQL un id menor puede
+# confirmarse después de uno mayor), así que el cursor no es solo el último id:
+# ``AAAA-MM-DD:<tope>[:<id>,...]`` lleva el tope de los cambios ya asentados
+# (con más de SOLAPE_CAMBIOS de antigüedad, más que cualquier transacción de
+# escritura) y los ids posteriores ya entregados. Cada consulta relee desde
+# el tope y descarta los vistos.
+DIAS_BITACORA = 7
+SOLAPE_CAMBIOS = timedelta(seconds=30)
+
+
+def _cursor(fecha, tope, vistos):
+    vistos = ','.join(str(i) for i in sorted(vistos))
+    return f"{fecha.isoformat()}:{tope}" + (f":{vistos}" if vistos else '')
+
+
+def _cursor_cambios(cierre):
+    """Cursor con todos los cambios registrados del día."""
+    cambios = CambioDescargue.objects.filter(cierre=cierre)
+    tope = (cambios.filter(fecha__lt=timezone.now() - SOLAPE_CAMBIOS)
+            .order_by('-id').values_list('id', flat=True).first()) or 0
+    return _cursor(cierre.fecha, tope, cambios.filter(id__gt=tope).values_list('id', flat=True))
+
+
+def cambios_dia(request):
+    """Registros creados y eliminados hoy desde ``?cursor=``, más los totales nuevos.
+
+    Sin cursor, o con uno de otro día, responde ``reset`` con todos los
+    registros del día para que el cliente reconstruya la tabla.
+    """
+    hoy = timezone.localdate()
+    cierre, _ = CierreDia.objects.get_or_create(fecha=hoy)
+    fecha, _, resto = request.GET.get('cursor', '').partition(':')
+    tope, _, vistos = resto.partition(':')
+    reset = fecha != hoy.isoformat() or not tope.isdigit()
+
+    registros = RegistroDescargue.objects.filter(cierre=cierre)
+    bajas = []
+    if reset:
+        cursor = _cursor_cambios(cierre)
+        registros = _filas_registros(registros, '-hora')
+    else:
+        vistos = {int(i) for i in vistos.split(',') if i.isdigit()}
+        cambios = list(CambioDescargue.objects.filter(cierre=cierre, id__gt=int(tope))
+                       .values_list('id', 'tipo', 'registro_id', 'fecha'))
+        asentado = timezone.now() - SOLAPE_CAMBIOS
+        tope = max([int(tope)] + [i for i, _, _, f in cambios if f < asentado])
+        cursor = _cursor(hoy, tope, [i for i, *_ in cambios if i > tope])
+        nuevos = [(i, tipo, r) for i, tipo, r, _ in cambios if i not in vistos]
+        bajas = sorted({r for _, tipo, r in nuevos if tipo == 'baja'})
+        altas = {r for _, tipo, r in nuevos if tipo == 'alta'} - set(bajas)
+        registros = _filas_registros(registros.filter(id__in=altas), 'hora') if altas else []
+
+    totales = reportes.totales_dia(cierre)
+    return JsonResponse({
+        'ok': True,
+        'cursor': cursor,
+        'reset': reset,
+        'estado': cierre.estado,
+        'total_palets': totales['palets'],
+        'total_camiones': totales['camiones'],
+        'altas': [_registro_json(r) for r in registros],
+        'bajas': bajas,
     })
 
 
@@ -243,6 +635,11 @@ def cerrar_dia(request):
     cierre.hora_cierre = timezone.now()
     cierre.observaciones = data.get('observaciones', '')
     cierre.save()
+    encolar_pdf_cierre(cierre)
+    encolar_consolidacion()
+    reportes.guardar_html_cierre(cierre)
+    _avisar(request, 'estado', cierre)
+    CambioDescargue.objects.filter(fecha__lt=timezone.now() - timedelta(days=DIAS_BITACORA)).delete()
     return JsonResponse({'ok': True, 'total_palets': float(cierre.total_palets)})
 
 
@@ -251,14 +648,19 @@ def reabrir_dia(request):
     if request.method != 'POST':
         return JsonResponse({'ok': False}, status=405)
     cierre = get_object_or_404(CierreDia, fecha=timezone.localdate())
+    reportes.invalidar_html(cierre)
     cierre.estado = 'abierto'
     cierre.hora_cierre = None
     cierre.save()
+    Producto.actualizar_items(ItemDescargue.objects.filter(registro__cierre=cierre))  # geometría cambiada mientras estuvo cerrado
+    reportes.invalidar_pdf(cierre.fecha)
+    _avisar(request, 'estado', cierre)
     return JsonResponse({'ok': True})
 
 
 # ── VER CIERRE ────────────────────────────────
 
+@solo_lectura
 def ver_cierre(request, fecha):
     from datetime import date
     try:
@@ -266,24 +668,13 @@ def ver_cierre(request, fecha):
     except ValueError:
         return HttpResponse("Fecha inválida", status=400)
     cierre = get_object_or_404(CierreDia, fecha=fecha_obj)
-    registros = (RegistroDescargue.objects
-                 .filter(cierre=cierre)
-                 .select_related('empresa')
-                 .prefetch_related('items__producto')
-                 .order_by('empresa__nombre', 'hora'))
-    empresas_data = _agrupar_por_empresa(registros)
-    total_registros = sum(len(e['registros']) for e in empresas_data)
-    return render(request, 'cierre_detalle.html', {
-        'cierre': cierre,
-        'empresas_data': empresas_data,
-        'total_empresas': len(empresas_data),
-        'total_registros': total_registros,
-        'empresa_nombre': 'Recuperadora Logística Integral',
-    })
+    return reportes.pagina(request, cierre, reportes.nombre_pagina_cierre(cierre), 'cierre_detalle.html',
+                           lambda: reportes.contexto_cierre(cierre))
 
 
 # ── PDF ───────────────────────────────────────
 
+@solo_lectura
 def generar_pdf(request, fecha):
     from datetime import date
     try:
@@ -291,25 +682,80 @@ def generar_pdf(request, fecha):
     except ValueError:
         return HttpResponse("Fecha inválida", status=400)
     cierre = get_object_or_404(CierreDia, fecha=fecha_obj)
-    registros = (RegistroDescargue.objects
-                 .filter(cierre=cierre)
-                 .select_related('empresa')
-                 .prefetch_related('items__producto')
-                 .order_by('empresa__nombre', 'hora'))
-    context = {
-        'cierre': cierre,
-        'empresas_data': _agrupar_por_empresa(registros),
-        'empresa_nombre': 'Recuperadora Logística Integral',
-        'total_registros': registros.count(),
-        'total_empresas': len(set(r.empresa_id for r in registros)),
-    }
-    try:
-        from xhtml2pdf import pisa
-        html_bytes = render(request, 'cierre_pdf.html', context).content
-        result = BytesIO()
-        pisa.CreatePDF(BytesIO(html_bytes), dest=result)
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="descargue_{fecha}.pdf"'
+    nombre = f'descargue_{fecha}.pdf'
+
+    # Día cerrado: el PDF es inmutable, se sirve desde disco con validadores HTTP.
+    version = reportes.version_cierre(cierre)
+    if version is not None:
+        etag = quote_etag(version)
+        last_modified = int(cierre.hora_cierre.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            ruta = reportes.ruta_pdf(cierre)
+            if not os.path.exists(ruta):
+                # Se genera en segundo plano (manage.py procesar_tareas).
+                t = encolar_pdf_cierre(cierre)
+                if t.estado == 'fallida':
+                    return render(request, 'cierre_pdf.html', reportes.contexto_cierre(cierre))
+                if not os.path.exists(ruta):
+                    if 'application/json' in request.headers.get('Accept', ''):
+                        return respuesta_en_cola(t)
+                    return render(request, 'pdf_pendiente.html', {'cierre': cierre, 'tarea': t}, status=202)
+            response = FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre,
+                                    content_type='application/pdf')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
         return response
+
+    context = reportes.contexto_cierre(cierre)
+    try:
+        pdf = reportes.renderizar_pdf(cierre, context)
     except ImportError:
-        return render(request, 'cierre_pdf.html', context)
\ No newline at end of file
+        return render(request, 'cierre_pdf.html', context)
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+
+# ── ANALÍTICA ─────────────────────────────────
+
+@solo_lectura
+def analitica_descargue(request):
+    """Series de palets y camiones entre ``?desde=`` y ``?hasta=`` para gráficos.
+
+    ``agrupar`` es ``empresa`` o ``producto`` y ``periodo`` ``mes`` o
+    ``semana``; van las ``limite`` series con más palets y el resto en
+    "Otros". Sin fechas, los últimos seis meses.
+    """
+    desde, hasta = analitica.rango_por_defecto()
+    try:
+        if request.GET.get('desde'):
+            desde = date.fromisoformat(request.GET['desde'])
+        if request.GET.get('hasta'):
+            hasta = date.fromisoformat(request.GET['hasta'])
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': 'Fecha inválida, use AAAA-MM-DD.'}, status=400)
+    agrupar = request.GET.get('agrupar', 'empresa')
+    periodo = request.GET.get('periodo', 'mes')
+    if agrupar not in analitica.FUENTES:
+        return JsonResponse({'ok': False, 'error': 'agrupar debe ser empresa o producto.'}, status=400)
+    if periodo not in analitica.PERIODOS:
+        return JsonResponse({'ok': False, 'error': 'periodo debe ser mes o semana.'}, status=400)
+    limite = request.GET.get('limite', '10')
+    if not limite.isdigit() or not 1 <= int(limite) <= 50:
+        return JsonResponse({'ok': False, 'error': 'limite debe estar entre 1 y 50.'}, status=400)
+    if desde > hasta:
+        return JsonResponse({'ok': False, 'error': 'desde no puede ser posterior a hasta.'}, status=400)
+    if len(analitica.periodos(desde, hasta, periodo)) > analitica.MAX_PERIODOS:
+        return JsonResponse({'ok': False, 'error': f'El rango supera los {analitica.MAX_PERIODOS} periodos.'},
+                            status=400)
+
+    return JsonResponse({
+        'ok': True,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'agrupar': agrupar,
+        'periodo': periodo,
+        **analitica.series(desde, hasta, agrupar, periodo, int(limite)),
+    })
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.23 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Eventos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Version',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('valor', models.CharField(max_length=32)),
+            ],
+            options={
+                'verbose_name': 'Versión',
+                'verbose_name_plural': 'Versiones',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class Evento(models.Model):
+    """Evento en vivo para las pantallas (ver ``Recuperadora.eventos``).
+
+    El id es el ``Last-Event-ID`` del navegador y es el mismo en todos los workers.
+    """
+    canal  = models.CharField(max_length=20)
+    tipo   = models.CharField(max_length=20)
+    datos  = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    origen = models.CharField(max_length=64, blank=True)  # X-Cliente de la pantalla que lo causó
+    creado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.canal}:{self.tipo} #{self.id}"
+
+    class Meta:
+        verbose_name = "Evento"
+        verbose_name_plural = "Eventos"
+        ordering = ['id']
+
+
+class Version(models.Model):
+    """Versión de un conjunto de datos que los workers guardan en memoria (ver ``versiones.py``).
+
+    Se cambia en la misma transacción que la escritura, así que todos los
+    workers ven la versión nueva exactamente cuando se confirma.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    valor  = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.nombre} {self.valor}"
+
+    class Meta:
+        verbose_name = "Versión"
+        verbose_name_plural = "Versiones"
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from Recuperadora import eventos
+
+from .models import Evento
+
+
+class _Pantalla:
+    """Suscripción de prueba: entrega en el acto, sin bucle de eventos."""
+
+    def __init__(self, canales):
+        self.canales = canales
+        self.recibidos = []
+        self.bucle = self
+
+    def call_soon_threadsafe(self, funcion, *args):
+        funcion(*args)
+
+    def entregar(self, evento):
+        self.recibidos.append(evento['id'])
+
+
+class PendientesTest(TestCase):
+    """Lo que recibe una pantalla al (re)conectar, servido por cualquier worker."""
+
+    def pedir(self, **kwargs):
+        respuesta = self.client.get('/eventos/', kwargs.pop('datos', {}), **kwargs)
+        return respuesta.content.decode()
+
+    def test_entrega_lo_perdido_en_orden_y_solo_del_canal(self):
+        eventos.publicar('descargue', 'registro', {'n': 1})
+        eventos.publicar('asistencia', 'entrada', {'n': 2}, origen='pantalla-a')
+        eventos.publicar('descargue', 'baja', {'n': 3})
+        ids = list(Evento.objects.values_list('id', flat=True))
+
+        cuerpo = self.pedir(datos={'canales': 'descargue'}, HTTP_LAST_EVENT_ID=str(ids[0] - 1))
+        self.assertIn(f'id: {ids[0]}\nevent: registro\n', cuerpo)
+        self.assertIn(f'id: {ids[2]}\nevent: baja\n', cuerpo)
+        self.assertLess(cuerpo.index('event: registro'), cuerpo.index('event: baja'))
+        self.assertNotIn('event: entrada', cuerpo)
+
+        cuerpo = self.pedir(datos={'canales': 'asistencia', 'desde': ids[0]})
+        self.assertIn('"origen": "pantalla-a"', cuerpo)
+
+    def test_sin_ultimo_id_parte_del_actual(self):
+        eventos.publicar('descargue', 'registro')
+        actual = Evento.objects.get().id
+        self.assertIn(f'id: {actual}\n\n', self.pedir())
+
+    def test_reset_si_el_ultimo_id_no_esta_en_la_tabla(self):
+        eventos.publicar('descargue', 'registro')
+        eventos.publicar('descargue', 'registro')
+        primero, segundo = Evento.objects.values_list('id', flat=True)
+        self.assertIn('event: reset', self.pedir(HTTP_LAST_EVENT_ID=str(segundo + 10)))
+        Evento.objects.filter(id=primero).delete()  # purgado por antigüedad
+        self.assertIn('event: reset', self.pedir(HTTP_LAST_EVENT_ID=str(primero - 1)))
+        self.assertNotIn('event: reset', self.pedir(HTTP_LAST_EVENT_ID=str(primero)))
+
+    def test_no_publica_lo_que_se_deshace(self):
+        try:
+            with transaction.atomic():
+                eventos.publicar('descargue', 'registro')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(Evento.objects.exists())
+
+
+class SondeoTest(TestCase):
+    """El hilo de cada worker reparte lo que publicaron los demás."""
+
+    def setUp(self):
+        self.pantalla = _Pantalla({'descargue'})
+        with eventos._candado:
+            eventos._suscriptores.add(self.pantalla)
+        self.addCleanup(eventos._suscriptores.discard, self.pantalla)
+        self.sondeo = eventos._Sondeo()
+        self.sondeo.iniciar()
+
+    def test_entrega_cada_evento_una_vez(self):
+        eventos.publicar('descargue', 'registro')
+        eventos.publicar('asistencia', 'entrada')
+        self.sondeo.leer()
+        self.sondeo.leer()
+        self.assertEqual(self.pantalla.recibidos,
+                         list(Evento.objects.filter(canal='descargue').values_list('id', flat=True)))
+
+    def test_lo_anterior_a_la_conexion_no_se_reenvia(self):
+        eventos.publicar('descargue', 'registro')
+        otro = eventos._Sondeo()
+        otro.iniciar()
+        otro.leer()
+        self.assertEqual(self.pantalla.recibidos, [])
+
+    def test_relee_el_solape_para_commits_fuera_de_orden(self):
+        Evento.objects.create(id=100, canal='descargue', tipo='registro')
+        Evento.objects.create(id=102, canal='descargue', tipo='registro')
+        self.sondeo.leer()
+        # El 101 se asignó antes pero su transacción confirmó después
+        Evento.objects.create(id=101, canal='descargue', tipo='registro')
+        self.sondeo.leer()
+        self.assertEqual(self.pantalla.recibidos, [100, 102, 101])
+
+    def test_avanza_el_tope_con_lo_asentado(self):
+        eventos.publicar('descargue', 'registro')
+        evento = Evento.objects.get()
+        self.sondeo.leer()
+        Evento.objects.update(creado=timezone.now() - eventos.SOLAPE - timedelta(seconds=1))
+        self.sondeo.leer()
+        self.assertEqual(self.sondeo.tope, evento.id)
+        self.assertEqual(self.sondeo.vistos, set())
+
+    def test_sin_pantallas_deja_de_seguir_la_tabla(self):
+        eventos._suscriptores.discard(self.pantalla)
+        self.sondeo.leer()
+        self.assertIsNone(self.sondeo.tope)
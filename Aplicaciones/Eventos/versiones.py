@@ -0,0 +1,31 @@
+"""Versiones compartidas de los datos que cada worker guarda en memoria.
+
+Un worker que arma en memoria un catálogo o un mapa de cédulas lo etiqueta
+con ``actual(nombre)`` y lo rearma cuando la versión cambia. ``cambiar``
+escribe una versión nueva en la transacción de la escritura: no hay caché
+por proceso que pueda quedar atrás, y si la transacción se deshace la
+versión tampoco cambia.
+"""
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from .models import Version
+
+
+def actual(nombre):
+    """Versión vigente de ``nombre`` (``''`` si nunca cambió)."""
+    return Version.objects.filter(nombre=nombre).values_list('valor', flat=True).first() or ''
+
+
+def cambiar(nombre):
+    """Da a ``nombre`` una versión nueva dentro de la transacción en curso."""
+    valor = uuid.uuid4().hex[:12]
+    if Version.objects.filter(nombre=nombre).update(valor=valor):
+        return
+    try:
+        with transaction.atomic():
+            Version.objects.create(nombre=nombre, valor=valor)
+    except IntegrityError:
+        # Otro worker la creó a la vez
+        Version.objects.filter(nombre=nombre).update(valor=valor)
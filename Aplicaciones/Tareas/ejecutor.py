@@ -0,0 +1,86 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import registro
+from .models import Tarea
+
+ACTIVAS = ('pendiente', 'en_proceso')
+INTERVALO_LATIDO = timedelta(seconds=30)
+PLAZO_LATIDO = timedelta(minutes=3)  # sin latido en este plazo, el worker se da por caído
+MAXIMO_INTENTOS = 3  # una tarea que tumba a su worker tantas veces se da por fallida
+
+
+def encolar(tipo, parametros=None, clave=''):
+    """Crea una tarea pendiente, o devuelve la ya encolada con la misma clave.
+
+    Con ``TAREAS_SINCRONAS = True`` (útil sin worker, p. ej. en desarrollo)
+    la tarea se ejecuta en el momento.
+    """
+    if not registro.existe(tipo):
+        raise ValueError(f'Tipo de tarea desconocido: {tipo}')
+    if clave:
+        existente = Tarea.objects.filter(tipo=tipo, clave=clave, estado__in=ACTIVAS).first()
+        if existente:
+            return existente
+    t = Tarea.objects.create(tipo=tipo, clave=clave, parametros=parametros or {})
+    if getattr(settings, 'TAREAS_SINCRONAS', False) and reclamar(t.id):
+        ejecutar(t.id)
+        t.refresh_from_db()
+    return t
+
+
+def reclamar(tarea_id):
+    """Marca la tarea como en proceso si sigue pendiente. Devuelve True si se obtuvo."""
+    ahora = timezone.now()
+    return bool(Tarea.objects
+                .filter(id=tarea_id, estado='pendiente')
+                .update(estado='en_proceso', iniciada=ahora, latido=ahora, intentos=F('intentos') + 1))
+
+
+def latir(tarea_ids):
+    """Renueva el latido de las tareas que este worker sigue ejecutando."""
+    if tarea_ids:
+        Tarea.objects.filter(id__in=tarea_ids, estado='en_proceso').update(latido=timezone.now())
+
+
+def _devolver(tareas, motivo):
+    """Devuelve a la cola las ``tareas`` en proceso; las que agotaron sus intentos quedan fallidas."""
+    tareas.filter(intentos__gte=MAXIMO_INTENTOS).update(
+        estado='fallida', error=f'Sin terminar tras {MAXIMO_INTENTOS} intentos: {motivo}', terminada=timezone.now())
+    return tareas.filter(intentos__lt=MAXIMO_INTENTOS).update(estado='pendiente')
+
+
+def devolver(tarea_ids, motivo):
+    """Devuelve a la cola tareas reclamadas que no llegaron a ejecutarse o terminar. Devuelve cuántas."""
+    return _devolver(Tarea.objects.filter(id__in=tarea_ids, estado='en_proceso'), motivo)
+
+
+def recuperar_abandonadas():
+    """Devuelve a la cola las tareas en proceso cuyo worker dejó de latir. Devuelve cuántas."""
+    return _devolver(Tarea.objects
+                     .alias(ultimo=Coalesce('latido', 'iniciada'))
+                     .filter(estado='en_proceso', ultimo__lt=timezone.now() - PLAZO_LATIDO),
+                     'el worker dejó de latir')
+
+
+def ejecutar(tarea_id):
+    """Ejecuta una tarea ya reclamada y guarda su resultado o su error."""
+    t = Tarea.objects.get(id=tarea_id)
+    try:
+        resultado = registro.obtener(t.tipo)(**t.parametros) or {}
+    except Exception:
+        t.estado = 'fallida'
+        t.error = traceback.format_exc()
+    else:
+        t.estado = 'completada'
+        t.resultado = resultado
+        t.archivo = resultado.get('archivo', '')
+        t.error = ''
+    t.terminada = timezone.now()
+    t.save(update_fields=['estado', 'resultado', 'archivo', 'error', 'terminada'])
+    return t.estado
@@ -0,0 +1,109 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from Aplicaciones.Tareas.ejecutor import (INTERVALO_LATIDO, devolver, ejecutar, latir, reclamar,
+                                         recuperar_abandonadas)
+from Aplicaciones.Tareas.models import Tarea
+
+
+def _inicializar_proceso():
+    # Con 'spawn' el proceso hijo arranca sin Django; con 'fork' hereda las
+    # conexiones del padre, que no deben compartirse.
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Recuperadora.settings')
+    django.setup()
+    connections.close_all()
+
+
+def _ejecutar_en_proceso(tarea_id):
+    try:
+        return ejecutar(tarea_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de tareas en segundo plano con un pool de procesos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                            help='Procesos en paralelo (por defecto, núcleos - 1).')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos entre consultas a la cola cuando está vacía.')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa lo pendiente y termina.')
+
+    def _nuevo_pool(self, procesos):
+        return ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso)
+
+    def _reiniciar(self, pool, procesos, tarea_ids, error):
+        """Un hijo murió y el pool ya no acepta trabajo: devuelve sus tareas a la cola y arma otro."""
+        pool.shutdown(wait=False, cancel_futures=True)
+        devueltas = devolver(tarea_ids, repr(error))
+        self.stderr.write(f'El pool de procesos se rompió ({error}); {devueltas} tarea(s) devueltas a la cola.')
+        return self._nuevo_pool(procesos)
+
+    def handle(self, *args, **options):
+        procesos = max(options['procesos'], 1)
+
+        connections.close_all()
+        self.stdout.write(f'Procesando tareas con {procesos} proceso(s)...')
+        pool = self._nuevo_pool(procesos)
+        en_curso = {}
+        proximo_latido = 0
+        try:
+            while True:
+                # Mientras este worker vive, sus tareas laten; las de un worker
+                # caído dejan de latir y cualquier otro las devuelve a la cola.
+                if time.monotonic() >= proximo_latido:
+                    latir(list(en_curso.values()))
+                    recuperadas = recuperar_abandonadas()
+                    if recuperadas:
+                        self.stdout.write(f'{recuperadas} tarea(s) recuperadas.')
+                    proximo_latido = time.monotonic() + INTERVALO_LATIDO.total_seconds()
+
+                libres = procesos - len(en_curso)
+                if libres > 0:
+                    pendientes = list(Tarea.objects.filter(estado='pendiente')
+                                      .order_by('creada').values_list('id', flat=True)[:libres])
+                    try:
+                        for tarea_id in pendientes:
+                            if reclamar(tarea_id):
+                                en_curso[pool.submit(_ejecutar_en_proceso, tarea_id)] = tarea_id
+                    except BrokenProcessPool as e:
+                        pool = self._reiniciar(pool, procesos, [tarea_id, *en_curso.values()], e)
+                        en_curso.clear()
+                        continue
+                    finally:
+                        connections.close_all()
+
+                if not en_curso:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                hechos, _ = wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    tarea_id = en_curso.pop(futuro)
+                    try:
+                        estado = futuro.result()
+                    except BrokenProcessPool as e:
+                        # No se sabe qué tarea tumbó al hijo: vuelven todas las del pool
+                        pool = self._reiniciar(pool, procesos, [tarea_id, *en_curso.values()], e)
+                        en_curso.clear()
+                        break
+                    except Exception as e:
+                        # El proceso hijo no pudo guardar su propio error.
+                        Tarea.objects.filter(id=tarea_id).update(
+                            estado='fallida', error=repr(e), terminada=timezone.now())
+                        estado = 'fallida'
+                    self.stdout.write(f'Tarea #{tarea_id}: {estado}')
+        finally:
+            pool.shutdown()
@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class Tarea(models.Model):
+    """Trabajo pesado (PDF, exportaciones) que procesa `manage.py procesar_tareas`."""
+    ESTADO_CHOICES = [
+        ('pendiente',  'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completada', 'Completada'),
+        ('fallida',    'Fallida'),
+    ]
+    tipo       = models.CharField(max_length=50)
+    clave      = models.CharField(max_length=200, blank=True, db_index=True)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado     = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='pendiente')
+    resultado  = models.JSONField(null=True, blank=True)
+    archivo    = models.CharField(max_length=255, blank=True)
+    error      = models.TextField(blank=True)
+    intentos   = models.PositiveIntegerField(default=0)
+    creada     = models.DateTimeField(auto_now_add=True)
+    iniciada   = models.DateTimeField(null=True, blank=True)
+    latido     = models.DateTimeField(null=True, blank=True)  # última señal de vida del worker que la ejecuta
+    terminada  = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} | {self.get_estado_display()}"
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        ordering = ['creada']
+        indexes = [models.Index(fields=['estado', 'creada'], name='tarea_estado_creada_idx')]
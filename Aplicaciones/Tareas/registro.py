@@ -0,0 +1,30 @@
+"""Registro de tipos de tarea.
+
+Las aplicaciones declaran sus tareas en un módulo ``tareas.py``::
+
+    @tarea('pdf_cierre')
+    def pdf_cierre(fecha):
+        ...
+        return {'archivo': ruta}
+
+Los parámetros llegan como argumentos con nombre y el valor devuelto (un
+diccionario serializable) se guarda en ``Tarea.resultado``; si trae la
+clave ``archivo`` se guarda también en ``Tarea.archivo``.
+"""
+
+_TAREAS = {}
+
+
+def tarea(nombre):
+    def registrar(func):
+        _TAREAS[nombre] = func
+        return func
+    return registrar
+
+
+def obtener(nombre):
+    return _TAREAS[nombre]
+
+
+def existe(nombre):
+    return nombre in _TAREAS
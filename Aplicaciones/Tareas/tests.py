@@ -0,0 +1,162 @@
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .ejecutor import MAXIMO_INTENTOS, PLAZO_LATIDO, ejecutar, encolar, latir, reclamar, recuperar_abandonadas
+from .management.commands import procesar_tareas
+from .models import Tarea
+from .registro import tarea
+
+CARPETA = tempfile.mkdtemp()
+
+
+@tarea('prueba_sumar')
+def prueba_sumar(a, b):
+    return {'suma': a + b}
+
+
+@tarea('prueba_archivo')
+def prueba_archivo(texto):
+    ruta = Path(CARPETA) / 'prueba.txt'
+    ruta.write_text(texto)
+    return {'archivo': str(ruta)}
+
+
+@tarea('prueba_fallar')
+def prueba_fallar():
+    raise RuntimeError('sin papel')
+
+
+class CicloTareaTest(TestCase):
+    """pendiente → en_proceso → completada/fallida, y vuelta a la cola si el worker cae."""
+
+    def test_encolar_reclamar_ejecutar(self):
+        t = encolar('prueba_sumar', {'a': 2, 'b': 3})
+        self.assertEqual((t.estado, t.intentos), ('pendiente', 0))
+        self.assertEqual(self.client.get(f'/tareas/{t.id}/resultado/').status_code, 202)
+
+        self.assertTrue(reclamar(t.id))
+        self.assertFalse(reclamar(t.id))  # otro worker no la obtiene
+        t.refresh_from_db()
+        self.assertEqual((t.estado, t.intentos), ('en_proceso', 1))
+        self.assertIsNotNone(t.latido)
+
+        self.assertEqual(ejecutar(t.id), 'completada')
+        t.refresh_from_db()
+        self.assertEqual(t.resultado, {'suma': 5})
+        self.assertIsNotNone(t.terminada)
+        self.assertEqual(self.client.get(f'/tareas/{t.id}/').json()['estado'], 'completada')
+        self.assertEqual(self.client.get(f'/tareas/{t.id}/resultado/').json()['resultado'], {'suma': 5})
+
+    def test_la_misma_clave_no_se_encola_dos_veces(self):
+        t = encolar('prueba_sumar', {'a': 1, 'b': 1}, clave='unica')
+        self.assertEqual(encolar('prueba_sumar', {'a': 1, 'b': 1}, clave='unica').id, t.id)
+        reclamar(t.id)
+        ejecutar(t.id)
+        self.assertNotEqual(encolar('prueba_sumar', {'a': 1, 'b': 1}, clave='unica').id, t.id)
+
+    def test_tipo_desconocido(self):
+        with self.assertRaises(ValueError):
+            encolar('no_existe')
+
+    def test_fallida_responde_200_con_el_error(self):
+        t = encolar('prueba_fallar')
+        reclamar(t.id)
+        self.assertEqual(ejecutar(t.id), 'fallida')
+        respuesta = self.client.get(f'/tareas/{t.id}/resultado/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['estado'], 'fallida')
+        self.assertEqual(respuesta.json()['error'], 'RuntimeError: sin papel')
+
+    def test_resultado_con_archivo(self):
+        t = encolar('prueba_archivo', {'texto': 'hola'})
+        reclamar(t.id)
+        ejecutar(t.id)
+        respuesta = self.client.get(f'/tareas/{t.id}/resultado/')
+        self.assertEqual(b''.join(respuesta.streaming_content), b'hola')
+        respuesta.close()
+
+    @override_settings(TAREAS_SINCRONAS=True)
+    def test_sincronas(self):
+        self.assertEqual(encolar('prueba_sumar', {'a': 1, 'b': 2}).resultado, {'suma': 3})
+
+    def test_solo_se_recuperan_las_que_dejaron_de_latir(self):
+        viva, caida = encolar('prueba_sumar', {'a': 1, 'b': 1}), encolar('prueba_sumar', {'a': 2, 'b': 2})
+        reclamar(viva.id)
+        reclamar(caida.id)
+        hace_rato = timezone.now() - PLAZO_LATIDO - timedelta(seconds=1)
+        Tarea.objects.update(iniciada=hace_rato, latido=hace_rato)
+        latir([viva.id])
+
+        self.assertEqual(recuperar_abandonadas(), 1)
+        self.assertEqual(Tarea.objects.get(id=viva.id).estado, 'en_proceso')
+        caida.refresh_from_db()
+        self.assertEqual(caida.estado, 'pendiente')
+        self.assertTrue(reclamar(caida.id))
+        self.assertEqual(Tarea.objects.get(id=caida.id).intentos, 2)
+
+    def test_tras_el_maximo_de_intentos_queda_fallida(self):
+        t = encolar('prueba_sumar', {'a': 1, 'b': 1})
+        reclamar(t.id)
+        hace_rato = timezone.now() - PLAZO_LATIDO - timedelta(seconds=1)
+        Tarea.objects.update(intentos=MAXIMO_INTENTOS, latido=hace_rato)
+        self.assertEqual(recuperar_abandonadas(), 0)
+        t.refresh_from_db()
+        self.assertEqual(t.estado, 'fallida')
+        self.assertIn('el worker dejó de latir', t.error)
+
+    def test_sin_endpoint_generico_para_encolar(self):
+        self.assertEqual(self.client.post('/tareas/encolar/', {'tipo': 'prueba_sumar'}).status_code, 404)
+
+
+class _Pool:
+    """Pool en el mismo proceso que simula la muerte de un proceso hijo."""
+
+    def __init__(self, roto_al_enviar=False, rompen=()):
+        self.roto_al_enviar = roto_al_enviar
+        self.rompen = rompen  # tareas cuyo proceso hijo muere
+
+    def submit(self, funcion, tarea_id):
+        if self.roto_al_enviar:
+            raise BrokenProcessPool('un proceso hijo murió')
+        futuro = Future()
+        if tarea_id in self.rompen:
+            futuro.set_exception(BrokenProcessPool('un proceso hijo murió'))
+        else:
+            futuro.set_result(ejecutar(tarea_id))
+        return futuro
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class ProcesarTareasTest(TestCase):
+    """El worker sobrevive a la muerte de un proceso hijo."""
+
+    def procesar(self, *pools):
+        with mock.patch.object(procesar_tareas.Command, '_nuevo_pool', side_effect=pools + (_Pool(),) * 5):
+            call_command('procesar_tareas', procesos=2, una_vez=True, intervalo=0,
+                         stdout=StringIO(), stderr=StringIO())
+
+    def test_pool_roto_al_enviar(self):
+        t = encolar('prueba_sumar', {'a': 2, 'b': 2})
+        self.procesar(_Pool(roto_al_enviar=True))
+        t.refresh_from_db()
+        self.assertEqual((t.estado, t.intentos, t.resultado), ('completada', 2, {'suma': 4}))
+
+    def test_la_tarea_que_tumba_al_hijo_termina_fallida(self):
+        sana, venenosa = encolar('prueba_sumar', {'a': 1, 'b': 1}), encolar('prueba_sumar', {'a': 0, 'b': 0})
+        self.procesar(*[_Pool(rompen={venenosa.id})] * MAXIMO_INTENTOS)
+        sana.refresh_from_db()
+        venenosa.refresh_from_db()
+        self.assertEqual(sana.estado, 'completada')
+        self.assertEqual((venenosa.estado, venenosa.intentos), ('fallida', MAXIMO_INTENTOS))
+        self.assertIn('BrokenProcessPool', venenosa.error)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'tareas'
+
+urlpatterns = [
+    path('<int:pk>/',               views.ver_estado,    name='estado'),
+    path('<int:pk>/resultado/',     views.ver_resultado, name='resultado'),
+]
@@ -0,0 +1,47 @@
+from django.shortcuts import get_object_or_404
+from django.http import JsonResponse, FileResponse
+from django.urls import reverse
+import os
+
+from .models import Tarea
+
+# Las tareas las encola solo el código del servidor (``ejecutor.encolar``);
+# por HTTP se consulta su estado y su resultado.
+
+
+def estado_tarea(t):
+    return {
+        'ok': True,
+        'id': t.id,
+        'tipo': t.tipo,
+        'estado': t.estado,
+        'creada': t.creada.isoformat(),
+        'terminada': t.terminada.isoformat() if t.terminada else None,
+        'error': t.error.strip().splitlines()[-1] if t.error else '',
+        'estado_url': reverse('tareas:estado', args=[t.id]),
+        'resultado_url': reverse('tareas:resultado', args=[t.id]),
+    }
+
+
+def respuesta_en_cola(t):
+    """Respuesta 202 estándar para una tarea que todavía no termina."""
+    response = JsonResponse(estado_tarea(t), status=202)
+    response['Location'] = reverse('tareas:estado', args=[t.id])
+    response['Retry-After'] = '2'
+    return response
+
+
+def ver_estado(request, pk):
+    t = get_object_or_404(Tarea, pk=pk)
+    return JsonResponse(estado_tarea(t))
+
+
+def ver_resultado(request, pk):
+    t = get_object_or_404(Tarea, pk=pk)
+    if t.estado in ('pendiente', 'en_proceso'):
+        return respuesta_en_cola(t)
+    if t.estado == 'fallida':
+        return JsonResponse(estado_tarea(t))  # la consulta sí funcionó: el fallo va en ``estado``
+    if t.archivo and os.path.exists(t.archivo):
+        return FileResponse(open(t.archivo, 'rb'), as_attachment=True, filename=os.path.basename(t.archivo))
+    return JsonResponse({'ok': True, 'id': t.id, 'resultado': t.resultado})
@@ -3,6 +3,13 @@ ASGI config for Recuperadora project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Required for the live event stream (``/eventos/``), e.g.::
+
+    gunicorn Recuperadora.asgi:application -k uvicorn.workers.UvicornWorker
+
+Any number of workers may serve it: events travel through the ``Evento``
+table, so every worker sees the ones published by the others.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
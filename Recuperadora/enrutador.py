@@ -0,0 +1,71 @@
+"""Lecturas de reportes por una conexión de solo lectura.
+
+Las vistas marcadas con ``@solo_lectura`` (detalle y PDF de cierres,
+listados, exportaciones) leen por el alias ``reportes``; todo lo demás, y
+cualquier escritura, va a ``default``. Con SQLite ``reportes`` abre el mismo
+archivo en modo ``ro`` y, con WAL (``SQLITE_WAL``), no bloquea ni espera a
+los registros que entran; con PostgreSQL puede ser una réplica
+(``REPORTES_DATABASE_URL``) o el mismo servidor en transacciones de solo
+lectura. El enrutador no depende del motor.
+
+Dentro de una transacción de ``default`` se lee de ``default``, para ver lo
+propio aún sin confirmar (y en los tests, que corren dentro de una).
+"""
+import contextvars
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import FileResponse
+
+ALIAS_REPORTES = 'reportes'
+
+_lectura = contextvars.ContextVar('solo_lectura', default=False)
+
+
+class EnrutadorReportes:
+
+    def db_for_read(self, model, **hints):
+        if (_lectura.get() and ALIAS_REPORTES in settings.DATABASES
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return ALIAS_REPORTES
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # mismos datos en ambos alias
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _leer_en_reportes(partes):
+    # El contenido de una respuesta en streaming se consulta al recorrerlo,
+    # después de que la vista terminó: se marca cada paso por separado.
+    partes = iter(partes)
+    while True:
+        token = _lectura.set(True)
+        try:
+            parte = next(partes, None)
+        finally:
+            _lectura.reset(token)
+        if parte is None:
+            return
+        yield parte
+
+
+def solo_lectura(vista):
+    """Las consultas de la vista (y de su contenido en streaming) leen por ``reportes``."""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        token = _lectura.set(True)
+        try:
+            respuesta = vista(request, *args, **kwargs)
+        finally:
+            _lectura.reset(token)
+        if respuesta.streaming and not isinstance(respuesta, FileResponse):
+            respuesta.streaming_content = _leer_en_reportes(respuesta.streaming_content)
+        return respuesta
+    return envoltura
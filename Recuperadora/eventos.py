@@ -0,0 +1,231 @@
+"""Eventos en vivo para las pantallas (Server-Sent Events).
+
+Las vistas llaman a ``publicar``, que guarda el evento en la tabla
+``Evento`` dentro de la transacción en curso: se ve al confirmarla y
+desaparece si se deshace. ``eventos`` es una vista asíncrona que, servida
+por ASGI (``uvicorn Recuperadora.asgi:application``), mantiene una conexión
+abierta por pantalla y le reenvía los eventos de los canales pedidos.
+
+Cada worker atiende a sus propios clientes, pero todos leen la misma tabla:
+un hilo por proceso (``_Sondeo``) la consulta cada ``SONDEO`` segundos y
+reparte lo nuevo entre las conexiones del proceso, así que una pantalla
+inactiva cuesta una conexión, no consultas. Como en el feed de cambios del
+descargue, el sondeo relee los últimos ``SOLAPE`` segundos para no saltarse
+un evento cuyo commit llegó después del de otro con id mayor.
+
+Los ids son los de la tabla, iguales en todos los workers. Cada conexión
+dura como máximo ``DURACION_CONEXION``; el navegador reconecta solo (a
+cualquier worker) y con ``Last-Event-ID`` recibe lo que se perdió, o un
+evento ``reset`` si ya se borró (se guardan ``RETENCION``). Bajo WSGI la
+vista entrega los pendientes y cierra, y el navegador vuelve a preguntar
+tras ``retry``.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DatabaseError, connection
+from django.db.models import Max, Min
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from Aplicaciones.Eventos.models import Evento
+
+CANALES = {'descargue', 'asistencia'}
+CAMPOS = ['id', 'canal', 'tipo', 'datos', 'origen']
+MAXIMO_PENDIENTES = 200  # al reconectar; si se perdieron más, ``reset``
+COLA_POR_CLIENTE = 100
+SONDEO = 1               # segundos entre lecturas de la tabla
+SOLAPE = timedelta(seconds=30)
+RETENCION = timedelta(days=1)
+PURGA = 3600             # segundos entre borrados de eventos vencidos
+LATIDO = 20              # segundos entre comentarios para mantener viva la conexión
+DURACION_CONEXION = 300  # segundos; acota las conexiones que el servidor no ve cerrarse
+REINTENTO_MS = 3000
+REINTENTO_WSGI_MS = 15000
+
+_suscriptores = set()
+_candado = threading.Lock()
+_sondeo = None
+
+
+class _Suscripcion:
+    """Cola de un cliente conectado, atendida en el bucle de eventos de su conexión."""
+
+    def __init__(self, canales):
+        self.canales = canales
+        self.bucle = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=COLA_POR_CLIENTE)
+        self.desbordada = False
+
+    def entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se corta y al reconectar recupera de la tabla
+            self.desbordada = True
+
+
+def publicar(canal, tipo, datos=None, origen=''):
+    """Guarda un evento para las pantallas suscritas a ``canal``; sale al confirmar la transacción."""
+    Evento.objects.create(canal=canal, tipo=tipo, datos=datos or {}, origen=origen[:64])
+
+
+# ── Sondeo de la tabla ──────────────────────────────────────────────────────
+
+def _punto_de_partida():
+    """``(tope, vistos)`` que da por vistos todos los eventos ya guardados."""
+    limite = timezone.now() - SOLAPE
+    tope = Evento.objects.filter(creado__lt=limite).aggregate(m=Max('id'))['m'] or 0
+    return tope, set(Evento.objects.filter(id__gt=tope).values_list('id', flat=True))
+
+
+def _difundir(eventos):
+    with _candado:
+        suscriptores = list(_suscriptores)
+    for evento in eventos:
+        for s in suscriptores:
+            if evento['canal'] in s.canales:
+                s.bucle.call_soon_threadsafe(s.entregar, evento)
+
+
+class _Sondeo(threading.Thread):
+    """Lee los eventos nuevos de la tabla y los reparte entre las conexiones del proceso."""
+
+    def __init__(self):
+        super().__init__(name='eventos', daemon=True)
+        self.candado = threading.Lock()
+        self.tope = None  # sin conexiones abiertas no se sigue la tabla
+        self.vistos = set()
+        self.purga = 0
+
+    def iniciar(self):
+        """Fija el punto de partida si no se está siguiendo la tabla."""
+        with self.candado:
+            if self.tope is None:
+                self.tope, self.vistos = _punto_de_partida()
+
+    def leer(self):
+        """Una vuelta: difunde lo confirmado desde la anterior."""
+        with self.candado:
+            with _candado:
+                activo = bool(_suscriptores)
+            if not activo:
+                self.tope = None
+                return
+            if self.tope is None:
+                self.tope, self.vistos = _punto_de_partida()
+                return
+            limite = timezone.now() - SOLAPE
+            recientes = list(Evento.objects.filter(id__gt=self.tope).order_by('id').values(*CAMPOS, 'creado'))
+            _difundir([e for e in recientes if e['id'] not in self.vistos])
+            asentados = [e['id'] for e in recientes if e['creado'] < limite]
+            self.tope = max(asentados, default=self.tope)
+            self.vistos = {e['id'] for e in recientes if e['id'] > self.tope}
+
+    def purgar(self):
+        if time.monotonic() >= self.purga:
+            Evento.objects.filter(creado__lt=timezone.now() - RETENCION).delete()
+            self.purga = time.monotonic() + PURGA
+
+    def run(self):
+        while True:
+            try:
+                self.leer()
+                self.purgar()
+            except DatabaseError:
+                connection.close()  # se reintenta en la siguiente vuelta con una conexión nueva
+            time.sleep(SONDEO)
+
+
+def _asegurar_sondeo():
+    """Arranca el sondeo del proceso y fija su punto de partida.
+
+    Se llama con la suscripción ya registrada y antes de leer sus
+    pendientes, para que lo confirmado después llegue por la cola.
+    """
+    global _sondeo
+    with _candado:
+        if _sondeo is None or not _sondeo.is_alive():
+            _sondeo = _Sondeo()
+            _sondeo.start()
+        sondeo = _sondeo
+    sondeo.iniciar()
+
+
+# ── Flujo SSE ───────────────────────────────────────────────────────────────
+
+def _formatear(evento):
+    datos = json.dumps(dict(evento['datos'], origen=evento['origen']), default=str)
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {datos}\n\n"
+
+
+def _inicio(canales, ultimo):
+    """Encabezado del flujo: id de partida y lo perdido desde ``ultimo``.
+
+    Devuelve ``(texto, ids enviados)``. Con un ``ultimo`` que ya no está en
+    la tabla (borrado, o de otra base) se envía ``reset`` y el id actual,
+    que va primero para dejar al cliente en ese punto.
+    """
+    ids = Evento.objects.aggregate(primero=Min('id'), ultimo=Max('id'))
+    actual = ids['ultimo'] or 0
+    if ultimo is None:
+        return f"id: {actual}\n\n", set()
+    pendientes = list(Evento.objects.filter(id__gt=ultimo, canal__in=canales)
+                      .order_by('id').values(*CAMPOS)[:MAXIMO_PENDIENTES + 1])
+    if (ultimo > actual or (ids['primero'] or 0) > ultimo + 1
+            or len(pendientes) > MAXIMO_PENDIENTES):
+        return f"id: {actual}\nevent: reset\ndata: {{}}\n\n", set()
+    return ''.join(_formatear(e) for e in pendientes), {e['id'] for e in pendientes}
+
+
+async def _flujo(canales, ultimo):
+    suscripcion = _Suscripcion(canales)
+    with _candado:
+        _suscriptores.add(suscripcion)
+    try:
+        await sync_to_async(_asegurar_sondeo)()
+        inicio, enviados = await sync_to_async(_inicio)(canales, ultimo)
+        yield f"retry: {REINTENTO_MS}\n\n" + inicio
+
+        limite = suscripcion.bucle.time() + DURACION_CONEXION
+        while not suscripcion.desbordada:
+            restante = limite - suscripcion.bucle.time()
+            if restante <= 0:
+                break
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), min(LATIDO, restante))
+            except asyncio.TimeoutError:
+                yield ": latido\n\n"
+                continue
+            if evento['id'] not in enviados:
+                yield _formatear(evento)
+    finally:
+        with _candado:
+            _suscriptores.discard(suscripcion)
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+async def eventos(request):
+    """``GET /eventos/?canales=descargue,asistencia`` como ``text/event-stream``."""
+    canales = {c for c in request.GET.get('canales', '').split(',') if c in CANALES} or CANALES
+    ultimo = _entero(request.headers.get('Last-Event-ID') or request.GET.get('desde'))
+
+    if not isinstance(request, ASGIRequest):
+        inicio, _ = await sync_to_async(_inicio)(canales, ultimo)
+        respuesta = HttpResponse(f"retry: {REINTENTO_WSGI_MS}\n\n" + inicio, content_type='text/event-stream')
+    else:
+        respuesta = StreamingHttpResponse(_flujo(canales, ultimo), content_type='text/event-stream')
+        respuesta['X-Accel-Buffering'] = 'no'
+    respuesta['Cache-Control'] = 'no-cache'
+    return respuesta
@@ -0,0 +1,196 @@
+"""Perfilado ligero por petición, apto para producción.
+
+``PerfiladoMiddleware`` mide en cada petición las consultas SQL (número y
+tiempo), el tiempo de render de plantillas y el tiempo total, y lo envía en
+la cabecera ``Server-Timing``. Además guarda en memoria del proceso una
+ventana de duraciones por nombre de URL para calcular percentiles, y las
+consultas más lentas vistas en cada vista.
+
+Con ``?_profile=1`` un usuario staff recibe, en lugar de la respuesta, el
+informe de cProfile de esa petición (``?_profile=raw`` devuelve el archivo
+binario para snakeviz). ``estadisticas`` muestra el resumen acumulado.
+"""
+import cProfile
+import contextvars
+import heapq
+import io
+import marshal
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.template.backends.django import Template as PlantillaDjango
+
+MUESTRAS_POR_VISTA = getattr(settings, 'PERFILADO_MUESTRAS', 500)
+CONSULTAS_LENTAS_POR_VISTA = 5
+LARGO_SQL = 300
+
+_actual = contextvars.ContextVar('perfilado_actual', default=None)
+
+
+class _Medicion:
+    __slots__ = ('consultas', 'sql_ms', 'plantillas_ms', 'lentas')
+
+    def __init__(self):
+        self.consultas = 0
+        self.sql_ms = 0.0
+        self.plantillas_ms = 0.0
+        self.lentas = []  # heap (ms, sql)
+
+
+class _Estadisticas:
+    """Acumulado por vista, compartido por los hilos del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._duraciones = defaultdict(lambda: deque(maxlen=MUESTRAS_POR_VISTA))
+        self._consultas = defaultdict(lambda: deque(maxlen=MUESTRAS_POR_VISTA))
+        self._lentas = defaultdict(list)
+        self._peticiones = defaultdict(int)
+
+    def registrar(self, vista, total_ms, medicion):
+        with self._lock:
+            self._duraciones[vista].append(total_ms)
+            self._consultas[vista].append(medicion.consultas)
+            self._peticiones[vista] += 1
+            peores = self._lentas[vista]
+            for item in medicion.lentas:
+                if len(peores) < CONSULTAS_LENTAS_POR_VISTA:
+                    heapq.heappush(peores, item)
+                elif item > peores[0]:
+                    heapq.heapreplace(peores, item)
+
+    def resumen(self):
+        with self._lock:
+            vistas = []
+            for vista, duraciones in self._duraciones.items():
+                ordenadas = sorted(duraciones)
+                consultas = self._consultas[vista]
+                vistas.append({
+                    'vista': vista,
+                    'peticiones': self._peticiones[vista],
+                    'p50_ms': _percentil(ordenadas, 50),
+                    'p95_ms': _percentil(ordenadas, 95),
+                    'p99_ms': _percentil(ordenadas, 99),
+                    'max_ms': round(ordenadas[-1], 2),
+                    'consultas_promedio': round(sum(consultas) / len(consultas), 1),
+                    'consultas_lentas': [{'ms': round(ms, 2), 'sql': sql}
+                                         for ms, sql in sorted(self._lentas[vista], reverse=True)],
+                })
+        return sorted(vistas, key=lambda v: v['p95_ms'], reverse=True)
+
+    def reiniciar(self):
+        with self._lock:
+            self._duraciones.clear()
+            self._consultas.clear()
+            self._lentas.clear()
+            self._peticiones.clear()
+
+
+def _percentil(ordenadas, p):
+    if not ordenadas:
+        return 0
+    k = min(len(ordenadas) - 1, max(0, round(p / 100 * len(ordenadas)) - 1))
+    return round(ordenadas[k], 2)
+
+
+estadisticas_globales = _Estadisticas()
+
+
+def _medir_sql(execute, sql, params, many, context):
+    medicion = _actual.get()
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if medicion is not None:
+            ms = (time.perf_counter() - inicio) * 1000
+            medicion.consultas += 1
+            medicion.sql_ms += ms
+            item = (ms, sql[:LARGO_SQL])
+            if len(medicion.lentas) < CONSULTAS_LENTAS_POR_VISTA:
+                heapq.heappush(medicion.lentas, item)
+            elif item > medicion.lentas[0]:
+                heapq.heapreplace(medicion.lentas, item)
+
+
+def _instrumentar_plantillas():
+    """Envuelve una sola vez el render del backend de plantillas de Django."""
+    if getattr(PlantillaDjango.render, '_perfilado', False):
+        return
+    original = PlantillaDjango.render
+
+    def render(self, context=None, request=None):
+        medicion = _actual.get()
+        if medicion is None:
+            return original(self, context, request)
+        inicio = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            medicion.plantillas_ms += (time.perf_counter() - inicio) * 1000
+
+    render._perfilado = True
+    PlantillaDjango.render = render
+
+
+class PerfiladoMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrumentar_plantillas()
+
+    def __call__(self, request):
+        modo_perfil = request.GET.get('_profile')
+        if modo_perfil and getattr(request, 'user', None) is not None and request.user.is_staff:
+            return self._perfil_cprofile(request, modo_perfil)
+
+        medicion = _Medicion()
+        token = _actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_medir_sql))
+                response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        vista = (match.view_name if match else None) or 'sin_ruta'
+        estadisticas_globales.registrar(vista, total_ms, medicion)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={medicion.sql_ms:.1f};desc="{medicion.consultas} consultas"',
+            f'tpl;dur={medicion.plantillas_ms:.1f};desc="plantillas"',
+            f'total;dur={total_ms:.1f};desc="{vista}"',
+        ])
+        return response
+
+    def _perfil_cprofile(self, request, modo):
+        perfil = cProfile.Profile()
+        perfil.runcall(self.get_response, request)
+        if modo == 'raw':
+            perfil.create_stats()
+            response = HttpResponse(marshal.dumps(perfil.stats), content_type='application/octet-stream')
+            response['Content-Disposition'] = 'attachment; filename="peticion.prof"'
+            return response
+        salida = io.StringIO()
+        pstats.Stats(perfil, stream=salida).sort_stats('cumulative').print_stats(60)
+        return HttpResponse(salida.getvalue(), content_type='text/plain; charset=utf-8')
+
+
+@staff_member_required
+def estadisticas(request):
+    if request.method == 'POST' and request.POST.get('reiniciar'):
+        estadisticas_globales.reiniciar()
+    limite = request.GET.get('limite', '20')
+    if not limite.isdigit() or int(limite) < 1:
+        return JsonResponse({'ok': False, 'error': 'limite debe ser un entero mayor que 0.'}, status=400)
+    return JsonResponse({'vistas': estadisticas_globales.resumen()[:int(limite)]})
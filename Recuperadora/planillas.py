@@ -0,0 +1,205 @@
+"""Planillas XLSX/CSV en flujo: lectura para las importaciones masivas y
+escritura de XLSX para las exportaciones.
+
+El archivo se lee fila a fila (openpyxl en modo ``read_only``, ``csv`` sobre
+el flujo), así que la memoria no crece con su tamaño. La primera fila son
+los encabezados, que se reconocen sin tildes ni mayúsculas; cada
+importación pasa su diccionario ``encabezado normalizado -> campo``.
+
+``escribir_xlsx`` arma el ZIP a medida que llegan las filas y lo entrega por
+partes, para un ``StreamingHttpResponse``: la descarga empieza enseguida y
+no hay archivo temporal. openpyxl no sirve para esto: aun en modo
+``write_only`` guarda la hoja entera antes de escribir el ZIP.
+"""
+import codecs
+import csv
+import re
+import unicodedata
+import zipfile
+from itertools import chain
+from xml.sax.saxutils import escape
+
+VERDADEROS = {'si', 's', 'x', '1', 'true', 'verdadero', 'activo'}
+FALSOS = {'no', 'n', '0', 'false', 'falso', 'inactivo'}
+
+
+class ArchivoInvalido(Exception):
+    pass
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni espacios repetidos; ``_`` cuenta como espacio."""
+    texto = unicodedata.normalize('NFKD', str(texto or '').strip().lower())
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).replace('_', ' ').split())
+
+
+def texto(valor):
+    """La celda como texto; los números enteros que Excel guarda como float pierden el ``.0``."""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return '' if valor is None else str(valor).strip()
+
+
+def booleano(valor):
+    """True/False para sí/no, x, 1/0...; None si la celda está vacía. ValueError si no se entiende."""
+    if isinstance(valor, bool):
+        return valor
+    valor = normalizar(texto(valor))
+    if not valor:
+        return None
+    if valor in VERDADEROS or valor in FALSOS:
+        return valor in VERDADEROS
+    raise ValueError
+
+
+def _filas_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    try:
+        wb = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception:
+        raise ArchivoInvalido('No se pudo abrir el archivo XLSX.')
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _filas_csv(archivo):
+    lineas = codecs.iterdecode(archivo, 'utf-8-sig')
+    primera = next(lineas, '')
+    delimitador = ';' if primera.count(';') > primera.count(',') else ','
+    yield from csv.reader(chain([primera], lineas), delimiter=delimitador)
+
+
+def leer(archivo, nombre, encabezados, obligatorios):
+    """Genera ``(número de fila, {campo: valor})`` del archivo, según su extensión.
+
+    Las columnas sin campo se ignoran y las filas vacías se saltan.
+    """
+    extension = nombre.rsplit('.', 1)[-1].lower()
+    if extension == 'xlsx':
+        filas = _filas_xlsx(archivo)
+    elif extension == 'csv':
+        filas = _filas_csv(archivo)
+    else:
+        raise ArchivoInvalido('Formato no soportado, use XLSX o CSV.')
+
+    try:
+        campos = [encabezados.get(normalizar(e)) for e in next(filas, None) or []]
+        faltan = [c for c in obligatorios if c not in campos]
+        if faltan:
+            raise ArchivoInvalido(f'Faltan columnas: {", ".join(faltan)}.')
+        for numero, valores in enumerate(filas, start=2):
+            if any(v not in (None, '') for v in valores):
+                yield numero, {c: v for c, v in zip(campos, valores) if c}
+    except UnicodeDecodeError:
+        raise ArchivoInvalido('El CSV debe estar en UTF-8.')
+
+
+# ── Escritura de XLSX ───────────────────────────────────────────────────────
+
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FILAS_POR_PARTE = 500
+
+_PRINCIPAL = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELACIONES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_CABECERA = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_PARTES_XLSX = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_RELACIONES}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_RELACIONES}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_RELACIONES}/styles" Target="styles.xml"/>'
+        '</Relationships>'),
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{_PRINCIPAL}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'),
+}
+_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')  # caracteres de control que XML no admite
+
+
+class _Partes:
+    """Destino del ZIP: guarda lo escrito hasta que se entrega."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+def _columna(n):
+    letras = ''
+    while n:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(referencia, valor):
+    if valor is None or valor == '':
+        return ''
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c r="{referencia}"><v>{valor}</v></c>'
+    valor = escape(_NO_XML.sub('', str(valor)))
+    return f'<c r="{referencia}" t="inlineStr"><is><t xml:space="preserve">{valor}</t></is></c>'
+
+
+def _fila_xml(numero, valores):
+    celdas = ''.join(_celda(f'{_columna(n)}{numero}', v) for n, v in enumerate(valores, start=1))
+    return f'<row r="{numero}">{celdas}</row>'.encode()
+
+
+def escribir_xlsx(hoja, encabezados, filas):
+    """Genera por partes los bytes de un XLSX de una hoja: ``encabezados`` y luego ``filas``.
+
+    Las celdas son texto o números. Se entrega lo comprimido cada
+    ``FILAS_POR_PARTE`` filas.
+    """
+    salida = _Partes()
+    nombre_hoja = escape(hoja, {'"': '&quot;'})
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in _PARTES_XLSX.items():
+            zf.writestr(nombre, _CABECERA + contenido)
+        zf.writestr('xl/workbook.xml', (
+            f'{_CABECERA}<workbook xmlns="{_PRINCIPAL}" xmlns:r="{_RELACIONES}"><sheets>'
+            f'<sheet name="{nombre_hoja}" sheetId="1" r:id="rId1"/></sheets></workbook>'))
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as xml:
+            xml.write(f'{_CABECERA}<worksheet xmlns="{_PRINCIPAL}"><sheetData>'.encode())
+            for numero, valores in enumerate(chain([encabezados], filas), start=1):
+                xml.write(_fila_xml(numero, valores))
+                if numero % FILAS_POR_PARTE == 0 and salida.partes:
+                    yield salida.vaciar()
+            xml.write(b'</sheetData></worksheet>')
+    yield salida.vaciar()
@@ -0,0 +1,183 @@
+"""Utilidades para las pruebas de rendimiento por vista.
+
+Cada aplicación declara en su tests.py un caso por nombre de URL. Para cada
+caso se mide el número de consultas SQL, el tiempo de respuesta (mejor de
+varias repeticiones) y el pico de memoria asignada (tracemalloc), y se
+compara con la línea base guardada en ``rendimiento_base.json`` junto al
+tests.py. Cada medición se hace dentro de una transacción que se revierte,
+así que las vistas que escriben no alteran los datos de los demás casos.
+
+Las consultas y el código de estado son deterministas y se comparan
+siempre. Tiempo y memoria dependen de la máquina y de su carga, así que
+solo se comparan con ``RENDIMIENTO_ESTRICTO=1`` (en una máquina tranquila)::
+
+    RENDIMIENTO_ESTRICTO=1 python manage.py test
+
+Para regenerar las líneas base tras un cambio intencional::
+
+    ACTUALIZAR_RENDIMIENTO=1 python manage.py test
+"""
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+
+REPETICIONES = 3
+# Holguras frente a la línea base. Las consultas son deterministas; tiempo y
+# memoria dependen de la máquina, por eso llevan factor y margen fijo y solo
+# se vigilan en modo estricto.
+CONSULTAS_EXTRA = 0
+FACTOR_TIEMPO, MARGEN_TIEMPO_MS = 3.0, 50.0
+FACTOR_MEMORIA, MARGEN_MEMORIA_KB = 1.5, 512.0
+
+
+@dataclass
+class Caso:
+    """Una petición a medir. ``kwargs`` son los argumentos de la URL.
+
+    Los valores de ``datos`` que son funciones se llaman en cada petición
+    (archivos subidos, que se consumen al enviarse).
+    """
+    url_name: str
+    metodo: str = 'get'
+    kwargs: dict = field(default_factory=dict)
+    datos: dict = field(default_factory=dict)
+    json: bool = False
+    variante: str = ''
+
+    @property
+    def clave(self):
+        return f'{self.url_name}:{self.variante}' if self.variante else self.url_name
+
+
+def nombres_de_urls(modulo_urls):
+    """Nombres de todas las rutas de un módulo urls.py."""
+    return {p.name for p in get_resolver(modulo_urls).url_patterns if p.name}
+
+
+def _peticion(client, caso, url):
+    if caso.metodo == 'get':
+        return client.get(url, caso.datos)
+    if caso.json:
+        return client.post(url, json.dumps(caso.datos), content_type='application/json')
+    return client.post(url, {k: v() if callable(v) else v for k, v in caso.datos.items()})
+
+
+def _consumir(response):
+    # Las respuestas en streaming solo trabajan cuando se leen.
+    if getattr(response, 'streaming', False):
+        for _ in response.streaming_content:
+            pass
+
+
+def medir(client, caso, url):
+    """Devuelve {'consultas', 'tiempo_ms', 'memoria_kb', 'status'} de un caso."""
+    tiempos = []
+    consultas = status = None
+    for _ in range(REPETICIONES):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                response = _peticion(client, caso, url)
+                _consumir(response)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas, status = len(ctx.captured_queries), response.status_code
+            transaction.set_rollback(True)
+
+    with transaction.atomic():
+        tracemalloc.start()
+        try:
+            _consumir(_peticion(client, caso, url))
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        transaction.set_rollback(True)
+
+    return {
+        'consultas': consultas,
+        'tiempo_ms': round(min(tiempos), 2),
+        'memoria_kb': round(pico / 1024, 1),
+        'status': status,
+    }
+
+
+def regresiones(clave, medido, base, estricto=False):
+    """Lista legible de los límites superados por una medición.
+
+    Sin ``estricto`` solo cuentan las consultas y el código de estado.
+    """
+    if base is None:
+        return [f'{clave}: sin línea base (ejecute con ACTUALIZAR_RENDIMIENTO=1)']
+    fallos = []
+    if medido['consultas'] > base['consultas'] + CONSULTAS_EXTRA:
+        fallos.append(f"{clave}: {medido['consultas']} consultas (base {base['consultas']})")
+    if medido['status'] != base['status']:
+        fallos.append(f"{clave}: respondió {medido['status']} (base {base['status']})")
+    if not estricto:
+        return fallos
+    limite_t = base['tiempo_ms'] * FACTOR_TIEMPO + MARGEN_TIEMPO_MS
+    if medido['tiempo_ms'] > limite_t:
+        fallos.append(f"{clave}: {medido['tiempo_ms']} ms (base {base['tiempo_ms']}, límite {limite_t:.0f})")
+    limite_m = base['memoria_kb'] * FACTOR_MEMORIA + MARGEN_MEMORIA_KB
+    if medido['memoria_kb'] > limite_m:
+        fallos.append(f"{clave}: {medido['memoria_kb']} KB (base {base['memoria_kb']}, límite {limite_m:.0f})")
+    return fallos
+
+
+def cargar_base(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def guardar_base(ruta, mediciones):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(mediciones, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write('\n')
+
+
+def actualizar_base():
+    return os.environ.get('ACTUALIZAR_RENDIMIENTO') == '1'
+
+
+def estricto():
+    return os.environ.get('RENDIMIENTO_ESTRICTO') == '1'
+
+
+class RendimientoMixin:
+    """Mezclar con TestCase. Define ``modulo_urls``, ``ruta_base`` y ``casos()``."""
+    modulo_urls = None
+    ruta_base = None
+
+    def casos(self):
+        raise NotImplementedError
+
+    def test_todas_las_urls_tienen_caso(self):
+        cubiertas = {c.url_name for c in self.casos()}
+        faltan = nombres_de_urls(self.modulo_urls) - cubiertas
+        self.assertFalse(faltan, f'URLs sin caso de rendimiento: {sorted(faltan)}')
+
+    def test_rendimiento(self):
+        from django.urls import reverse
+        base = cargar_base(self.ruta_base)
+        cache.clear()  # la caché no se deshace con el rollback de la clase de prueba anterior
+        mediciones, fallos = {}, []
+        for caso in self.casos():
+            namespace = get_resolver(self.modulo_urls).urlconf_module.app_name
+            url = reverse(f'{namespace}:{caso.url_name}', kwargs=caso.kwargs)
+            medido = medir(self.client, caso, url)
+            self.assertLess(medido['status'], 500, f'{caso.clave} respondió {medido["status"]}')
+            mediciones[caso.clave] = medido
+            fallos += regresiones(caso.clave, medido, base.get(caso.clave), estricto())
+        if actualizar_base():
+            guardar_base(self.ruta_base, mediciones)
+            return
+        self.assertFalse(fallos, 'Regresiones de rendimiento:\n' + '\n'.join(fallos))
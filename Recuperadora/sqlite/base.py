@@ -0,0 +1,35 @@
+"""Backend SQLite con los PRAGMA de cada conexión nueva.
+
+``busy_timeout`` hace esperar a una escritura concurrente en lugar de fallar
+con "database is locked", y ``mmap_size`` lee el archivo mapeado en memoria.
+Una conexión abierta con ``?mode=ro`` (alias ``reportes``) además queda en
+``query_only``.
+
+Con ``SQLITE_WAL = True`` la base pasa además a modo WAL, que deja leer
+mientras otro escribe, con ``synchronous=NORMAL`` (seguro con WAL, ahorra un
+fsync por commit). El modo WAL queda grabado en la cabecera del archivo, por
+eso no se activa por defecto: el db.sqlite3 de desarrollo está versionado.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+WAL = [
+    'PRAGMA journal_mode = WAL',  # persiste en el archivo; en solo lectura no cambia nada
+    'PRAGMA synchronous = NORMAL',
+]
+PRAGMAS = [
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA mmap_size = 268435456',
+]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conexion = super().get_new_connection(conn_params)
+        pragmas = WAL + PRAGMAS if getattr(settings, 'SQLITE_WAL', False) else PRAGMAS
+        for pragma in pragmas:
+            conexion.execute(pragma)
+        if 'mode=ro' in str(conn_params['database']):
+            conexion.execute('PRAGMA query_only = ON')
+        return conexion
@@ -6,10 +6,16 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .eventos import eventos
+from .perfilado import estadisticas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('perfilado/', estadisticas, name='perfilado'),
+    path('eventos/', eventos, name='eventos'),
     path('', include('Aplicaciones.Asistencia.urls')),
      path('descargue/', include('Aplicaciones.Descargue.urls', namespace='Descargue')),
+    path('tareas/', include('Aplicaciones.Tareas.urls', namespace='tareas')),
     
 ]
 